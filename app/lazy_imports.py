@@ -0,0 +1,62 @@
+import importlib
+import logging
+import os
+import threading
+from types import ModuleType
+
+logger = logging.getLogger(__name__)
+
+# Set to warm heavy modules in a background thread at startup instead of on the first request
+PRELOAD_HEAVY_MODULES = os.getenv("PRELOAD_HEAVY_MODULES", "").lower() in ("1", "true", "yes")
+
+_registry = []
+
+
+class LazyModule(ModuleType):
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_name = name
+        self._lazy_module = None
+        self._lazy_lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    self._lazy_module = importlib.import_module(self._lazy_name)
+        return self._lazy_module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_module(name: str, preload: bool = True) -> LazyModule:
+    """Return a proxy for `name` that defers the import until it is first used.
+
+    Modules registered with preload=True are imported by warm_up().
+    """
+    module = LazyModule(name)
+    if preload:
+        _registry.append(module)
+    return module
+
+
+def warm_up():
+    """Import every registered lazy module, logging (not raising) on failure."""
+    for module in _registry:
+        try:
+            module._load()
+        except Exception as e:
+            logger.warning("Failed to preload %s: %s", module._lazy_name, e)
+    logger.info("Preloaded %d heavy modules", len(_registry))
+
+
+def warm_up_in_background() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="module-warmup", daemon=True)
+    thread.start()
+    return thread
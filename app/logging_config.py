@@ -0,0 +1,120 @@
+import atexit
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+from app.services.metrics import LOG_RECORDS_DROPPED
+
+LOG_FILE = os.getenv("LOG_FILE", "uvicorn.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_QUEUE_SIZE = 10000  # Records beyond this are dropped rather than blocking request threads
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any structured `extra` fields attached."""
+
+    RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sample_rate"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in N records that carry a `sample_rate` extra, counted per message template.
+
+    Meant for INFO and WARNING messages on hot paths; errors are always kept.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if not rate or rate >= 1 or record.levelno >= logging.ERROR:
+            return True
+        every = max(1, int(round(1 / rate)))
+        with self._lock:
+            counter = self._counters.get(record.msg)
+            if counter is None:
+                counter = self._counters[record.msg] = itertools.count()
+            return next(counter) % every == 0
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread, dropping (and counting) them when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the args now: the listener formats later, by when a mutable arg may have changed.
+        # Only the message is rendered here; the JSON line is still built on the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(level=record.levelname)
+
+
+def setup_logging():
+    """Route all logging through a queue to a background thread that writes rotating JSON logs."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter())
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(queue_handler)
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
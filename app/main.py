@@ -2,17 +2,68 @@ import os
 from pathlib import Path
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
-from app.routes import bookmarks
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+from app.routes import bookmarks, diagnostics, events, maintenance
+from app.services.icon_manifest import icon_manifest
+from app.services.click_tracker import click_tracker
+from app.services.scheduler import scheduler
+from app.services.scheduled_jobs import register_jobs
+from app.services.enrichment import job_event_relay
+from app.worker import ENRICHMENT_EMBEDDED_WORKERS, Worker
+from app.services.metrics import REQUEST_LATENCY, instrument_engine, render_metrics
+from app.services.profiler import StackSampler, profile_store, profile_trigger
+from app.models import engine
+from app.services.compression import CompressionMiddleware, PrecompressedStaticFiles, precompress_in_background
+from app.logging_config import setup_logging
+from app.lazy_imports import PRELOAD_HEAVY_MODULES, warm_up_in_background
 import logging
-
-app = FastAPI()
+import time
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Index icon directories once so lookups on hot paths skip the filesystem
+    icon_manifest.load()
+    if os.getenv("ICON_MANIFEST_WATCH", "").lower() in ("1", "true", "yes"):
+        icon_manifest.start_watching()
+    # Write clicks in batches instead of one UPDATE per click
+    click_tracker.start()
+    # Periodic maintenance (trash purge, icon and cache cleanup, planner statistics) and one-off
+    # startup work (resuming re-enrichment, backfills); with several workers only the holder of
+    # the database lease runs the cluster-wide jobs
+    register_jobs(scheduler)
+    scheduler.start()
+    # Page fetches run from the job queue; separate `python -m app.worker` processes take the load
+    # off the API, and embedded worker threads keep a single-process setup working without one
+    embedded_worker = (
+        Worker(concurrency=ENRICHMENT_EMBEDDED_WORKERS, embedded=True) if ENRICHMENT_EMBEDDED_WORKERS > 0 else None
+    )
+    if embedded_worker is not None:
+        embedded_worker.start()
+    # Tell this process's clients about jobs finished by any worker
+    job_event_relay.start()
+    # Compress CSS, JS and SVG once now rather than on the requests that first ask for them
+    precompress_in_background(static_dir)
+    if PRELOAD_HEAVY_MODULES:
+        # Pay for scikit-learn, PIL, selenium etc. off the request path instead of on first use
+        warm_up_in_background()
+    yield
+    click_tracker.stop()
+    scheduler.stop()
+    job_event_relay.stop()
+    if embedded_worker is not None:
+        embedded_worker.stop()
+    icon_manifest.save()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Add CORS middleware
@@ -24,10 +75,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip, Brotli or zstd for JSON and HTML responses, negotiated from Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
 # Mount static files
 static_dir = Path(__file__).parent / "static"
 os.makedirs(static_dir, exist_ok=True)
-app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir)), name="static")
 
 # Set up Jinja2 templates
 templates = Jinja2Templates(directory="app/templates")
@@ -39,8 +93,14 @@ def static_url(path: str):
 
 templates.env.globals["static_url"] = static_url
 
+# Time every SQL statement as a db_query stage
+instrument_engine(engine)
+
 # Include routers
 app.include_router(bookmarks.router)
+app.include_router(maintenance.router)
+app.include_router(events.router)
+app.include_router(diagnostics.router)
 
 
 @app.get("/")
@@ -53,10 +113,15 @@ async def favicon():
     return FileResponse("app/static/favicon.ico")
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/website", include_in_schema=False)
 async def serve_website(request: Request):
     try:
-        return templates.TemplateResponse("index.html", {"request": request})
+        return templates.TemplateResponse(request, "index.html")
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Template rendering failed: {str(e)}"
@@ -66,7 +131,51 @@ async def serve_website(request: Request):
 # Log requests and responses
 @app.middleware("http")
 async def log_requests(request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
+    logger.info("Request: %s %s", request.method, request.url)
+    start = time.perf_counter()
     response = await call_next(request)
-    logger.info(f"Response: {response.status_code}")
+    elapsed = time.perf_counter() - start
+    # Label by route template so /bookmarks/1 and /bookmarks/2 share a series
+    route = request.scope.get("route")
+    REQUEST_LATENCY.observe(
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    logger.info(
+        "Response: %s (%.1f ms)", response.status_code, elapsed * 1000,
+        extra={"route": getattr(route, "path", "unmatched"), "duration_ms": round(elapsed * 1000, 1)},
+    )
+    return response
+
+
+# Registered after log_requests so it wraps it; a no-op unless a profile is requested or sampled
+@app.middleware("http")
+async def profile_requests(request, call_next):
+    if request.url.path.startswith("/diagnostics/"):
+        return await call_next(request)
+    trigger = profile_trigger(request.headers, request.query_params)
+    if trigger is None:
+        return await call_next(request)
+    sampler = StackSampler().start()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        stacks = sampler.stop()
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    profile_id = await run_in_threadpool(profile_store.save, stacks, {
+        "method": request.method,
+        "path": request.url.path,
+        "route": getattr(route, "path", "unmatched"),
+        "status": response.status_code,
+        "trigger": trigger,
+        "samples": sampler.samples,
+        "duration_ms": round(elapsed * 1000, 1),
+    })
+    logger.info("Stored %s profile %s of %s %s (%.1f ms)", trigger, profile_id, request.method,
+                request.url.path, elapsed * 1000)
+    response.headers["X-Profile-Id"] = profile_id
     return response
@@ -2,17 +2,22 @@ from sqlalchemy import (
     Column,
     String,
     Integer,
+    Float,
     Boolean,
     DateTime,
     Text,
+    LargeBinary,
     create_engine,
     Index,
+    inspect,
+    text,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional, List
+import os
 
 Base = declarative_base()
 
@@ -22,6 +27,10 @@ class Bookmark(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String, unique=True, nullable=False)
+    # Identity of the page regardless of tracking params, www., scheme etc.; see app/services/url_canonical.py
+    canonical_url = Column(String, nullable=True)
+    # Where redirects or <link rel=canonical> said the page lives; a hint for /duplicates, never used to reject
+    canonical_hint = Column(String, nullable=True)
     title = Column(String, nullable=True)
     description = Column(Text, nullable=True)
     webicon = Column(String, nullable=True)
@@ -33,17 +42,152 @@ class Bookmark(Base):
     tags = Column(Text, nullable=True)  # Comma-separated list
     is_favorite = Column(Boolean, default=False)
     click_count = Column(Integer, default=0)
+    # log of the click weights decayed to a fixed epoch; see app/services/click_tracker.py
+    frecency = Column(Float, nullable=True)
+    # Last online check by a worker or /page-status; API processes relay changes as link_status_changed
+    link_online = Column(Boolean, nullable=True)
+    link_checked_at = Column(DateTime, nullable=True)  # UTC
 
     __table_args__ = (  # type: ignore
         Index("ix_bookmark_title", "title"),
         Index("ix_bookmark_description", "description"),
         Index("ix_bookmark_url", "url"),
+        Index("ix_bookmark_frecency", "frecency"),
+        Index("ix_bookmark_canonical_url", "canonical_url"),
+        Index("ix_bookmark_link_checked_at", "link_checked_at"),
     )
 
 
+class ReenrichJob(Base):
+    __tablename__ = "reenrich_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, nullable=False, default="pending")
+    criteria = Column(Text, nullable=True)  # JSON-encoded selection filters and options
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    succeeded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    last_bookmark_id = Column(Integer, default=0)  # Checkpoint: highest bookmark id written back
+    error = Column(Text, nullable=True)
+    owner = Column(String, nullable=True)  # Process running the job; claimed with a conditional UPDATE
+    lease_expires_at = Column(DateTime, nullable=True)  # UTC; renewed while the job runs
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TrashedBookmark(Base):
+    __tablename__ = "trash"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bookmark_id = Column(Integer, nullable=False, index=True)  # Id the bookmark had, reused on restore if free
+    url = Column(String, nullable=False, index=True)
+    title = Column(String, nullable=True)
+    data = Column(Text, nullable=False)  # JSON snapshot of every bookmark column; icons stay on disk, referenced here
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class PageSnapshot(Base):
+    __tablename__ = "page_snapshots"
+
+    # Keyed by page rather than bookmark id, so a snapshot survives the trash and restores
+    canonical_url = Column(String, primary_key=True)
+    url = Column(String, nullable=False)  # The URL that was fetched
+    text_hash = Column(String, nullable=False)  # snapshot_blobs.hash of the extracted main text
+    html_hash = Column(String, nullable=True)  # Raw HTML, only kept with SNAPSHOT_RAW_HTML
+    text_size = Column(Integer, default=0)
+    captured_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SnapshotBlob(Base):
+    __tablename__ = "snapshot_blobs"
+
+    hash = Column(String, primary_key=True)  # sha256 of the uncompressed content; identical pages share a row
+    kind = Column(String, nullable=False)  # "text" or "html"
+    codec = Column(String, nullable=False)  # "zstd" or "zlib"
+    dictionary_id = Column(Integer, nullable=True)
+    raw_size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+
+class SnapshotDictionary(Base):
+    __tablename__ = "snapshot_dictionaries"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    codec = Column(String, nullable=False)
+    blob_count = Column(Integer, nullable=False)  # Blobs stored when it was trained; retrained as the store grows
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class MetadataPreview(Base):
+    __tablename__ = "metadata_previews"
+
+    # What /fetch-metadata fetched, until POST /bookmarks redeems its token; shared by every worker process
+    id = Column(String, primary_key=True)  # The token handed to the browser
+    url = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed JSON, including the page snapshot
+    expires_at = Column(DateTime, nullable=False, index=True)  # UTC
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    # Leader election: the process holding the unexpired lease runs the cluster-wide scheduled jobs
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)  # host:pid:random of the holder
+    expires_at = Column(DateTime, nullable=False)  # UTC; renewed well before it passes
+
+
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
+
+    # Last run of each job, so a new leader continues the schedule instead of restarting it
+    name = Column(String, primary_key=True)
+    last_run_at = Column(DateTime, nullable=True)  # UTC
+    last_status = Column(String, nullable=True)  # "ok" or "error"
+    last_duration_ms = Column(Float, nullable=True)
+    last_error = Column(Text, nullable=True)
+    last_owner = Column(String, nullable=True)
+
+
+class EnrichmentJob(Base):
+    __tablename__ = "enrichment_jobs"
+
+    # Durable queue: the API enqueues, workers (python -m app.worker) claim jobs under a lease
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # Handler name, e.g. "enrich_bookmark"
+    group_key = Column(String, nullable=True, index=True)  # Jobs queued together, e.g. "reenrich:12" for one re-enrichment
+    bookmark_id = Column(Integer, nullable=True, index=True)
+    payload = Column(Text, nullable=True)  # JSON-encoded handler arguments
+    status = Column(String, nullable=False, default="queued")  # queued, running, done or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # UTC; retries are pushed back here
+    locked_by = Column(String, nullable=True)  # Worker holding the lease
+    lease_expires_at = Column(DateTime, nullable=True)  # Visibility timeout, extended by heartbeats
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True, index=True)
+
+    __table_args__ = (  # type: ignore
+        Index("ix_enrichment_jobs_claim", "status", "run_after"),
+    )
+
+
+class WorkerPresence(Base):
+    __tablename__ = "worker_presence"
+
+    # Standalone workers that are alive; while one is, the API's embedded workers stand by
+    worker_id = Column(String, primary_key=True)  # host:pid:random
+    expires_at = Column(DateTime, nullable=False, index=True)  # UTC; renewed by the worker's heartbeat
+
+
 class BookmarkSchema(BaseModel):
     id: int
     url: str
+    canonical_url: Optional[str] = None
     title: Optional[str] = None
     description: Optional[str] = None
     webicon: Optional[str] = None
@@ -70,12 +214,44 @@ class BookmarkCreate(BaseModel):
     extra_metadata: Optional[dict] = None
     tags: Optional[List[str]] = None
     is_favorite: bool = False
+    preview_token: Optional[str] = None  # From /fetch-metadata; commits the previewed metadata without refetching
 
 
 # SQLite database setup
-DATABASE_URL = "sqlite:///./bookmarks.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./bookmarks.db")
+# SQLite connections are shared with the threadpool; other drivers reject the option
+engine = create_engine(
+    DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Columns added after the first release; create_all does not alter existing tables
+ADDED_COLUMNS = {
+    "bookmarks": {"frecency": "FLOAT", "canonical_url": "VARCHAR", "canonical_hint": "VARCHAR",
+                  "link_online": "BOOLEAN", "link_checked_at": "DATETIME"},
+    "reenrich_jobs": {"owner": "VARCHAR", "lease_expires_at": "DATETIME"},
+    "enrichment_jobs": {"group_key": "VARCHAR"},
+}
+
+
+def add_missing_columns(bind):
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if table not in tables:
+                continue  # create_all makes it with every column
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, sql_type in columns.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bookmark_frecency ON bookmarks (frecency)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bookmark_canonical_url ON bookmarks (canonical_url)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bookmark_link_checked_at ON bookmarks (link_checked_at)"))
+        if "enrichment_jobs" in tables:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_enrichment_jobs_group_key ON enrichment_jobs (group_key)"))
+
+
 # Create tables
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
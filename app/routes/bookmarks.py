@@ -1,24 +1,45 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from app.models import Bookmark, BookmarkSchema, SessionLocal, BookmarkCreate
 from datetime import datetime
 from app.services.metadata_fetcher import fetch_metadata_combined
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, StrictBool, StrictStr, model_validator
 import json
 import logging
 from pathlib import Path
-from typing import List
-import shutil
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.cluster import KMeans
+from typing import List, Literal, Optional
 from collections import defaultdict, Counter
 from urllib.parse import urlparse
 from app.services.network_detector import NetworkDetector
+from app.services.page_status import is_page_online
+from app.services.metrics import stage_timer, record_cache
+from app.services import text_ml
+from app.services.icon_manifest import icon_manifest
+from app.services.preview_store import preview_store
+from app.services.embeddings import embedding_index, bookmark_text, with_page_text
+from app.services.ml_tagger import ml_tagger
+from app.services.domain_rules import domain_rules
+from app.services.click_tracker import click_tracker
+from app.services import exporter
+from app.services import batch_ops
+from app.services import trash
+from app.services import duplicates
+from app.services.url_canonical import canonical_hint, canonicalize, with_scheme
+from app.services.snapshots import snapshot_store
+from app.services.enrichment import enqueue_enrichment, record_link_status
+from app.services.profiler import ProfiledRoute
+from app.services.event_bus import (
+    event_bus,
+    publish_bookmark_event,
+    METADATA_READY,
+    ICON_UPDATED,
+    CATEGORY_CHANGED,
+    BOOKMARK_DELETED,
+)
+
+router = APIRouter(route_class=ProfiledRoute)  # Lets a profiled request's sampler find its thread
 
-router = APIRouter()
-
-logging.basicConfig(level=logging.INFO, filename="uvicorn.log", filemode="a", format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 # Base tag vocabulary
@@ -53,79 +74,27 @@ USER_TAG_VOCAB = [
     "image-generation", "gaming-tools", "open-source", "collaboration"
 ]
 
-# Domain to type mapping for categorization
-DOMAIN_TYPES = {
-    "youtube.com": "video",
-    "youtu.be": "video",
-    "vimeo.com": "video",
-    "news": "news",
-    "blog": "blog",
-    "medium.com": "blog",
-    "twitter.com": "social",
-    "reddit.com": "social",
-    "facebook.com": "social",
-    "linkedin.com": "social",
-    "wikipedia.org": "education",
-    "coursera.org": "education",
-    "edx.org": "education",
-    "spotify.com": "music",
-    "soundcloud.com": "music",
-    "twitch.tv": "gaming",
-    "espn.com": "sports",
-    "allrecipes.com": "food",
-    "epicurious.com": "food",
-    "tripadvisor.com": "travel",
-    "healthline.com": "health",
-    "webmd.com": "health",
-    "bloomberg.com": "finance",
-    "cnbc.com": "finance",
-    "crunchyroll.com": "anime",
-    "theresanaiforthat.com": "AI",
-    "grok.com": "AI",
-    "chatgpt.com": "AI",
-    "gemini.google.com": "AI",
-    "pogs.cafe": "AI",
-    "civitai.com": "AI",
-    "chat.deepseek.com": "AI",
-    "lovable.dev": "AI",
-    "hianimez.to": "anime",
-    "allmanga.to": "manga",
-    "github.com": "coding",
-    "kaggle.com": "data-science",
-    "colab.research.google.com": "machine-learning",
-    "dashboard.ngrok.com": "vpn-server",
-    "tailscale.com": "vpn-server",
-    "pinggy.io": "vpn-server",
-    "riffusion.com": "music-generation",
-    "suno.com": "music-generation",
-    "fcportables.com": "software",
-    "filecr.com": "software",
-    "paimon.moe": "gaming-tools",
-    "instagram.com": "social",
-    "tiktok.com": "social",
-    "netflix.com": "streaming",
-    "hulu.com": "streaming",
-    "amazon.com": "e-commerce",
-    "ebay.com": "e-commerce",
-    "fitbit.com": "fitness",
-    "myfitnesspal.com": "fitness",
-    "stackoverflow.com": "coding",
-    "dev.to": "coding",
-    "huggingface.co": "AI",
-    "openai.com": "AI",
-    "anilist.co": "anime",
-    "mangadex.org": "manga",
-    "bandcamp.com": "music",
-    "steamcommunity.com": "gaming",
-    "patreon.com": "creative",
-    "behance.net": "art",
-    "dribbble.com": "design",
-}
+# Domain to type mapping for categorization lives in app/config/domain_rules.json
 
 # Cache for tag suggestions
 TAG_CACHE = {}
 network_detector = NetworkDetector()
 
+# Orderings for ?sort=; frecency ranks recently and frequently opened bookmarks first
+SORT_ORDERS = {
+    "frecency": (Bookmark.frecency.desc().nullslast(), Bookmark.id),
+    "recent": (Bookmark.last_used.desc().nullslast(), Bookmark.id),
+    "clicks": (Bookmark.click_count.desc(), Bookmark.id),
+    "created": (Bookmark.created_at.desc(), Bookmark.id),
+}
+
+def sort_order(sort: Optional[str]):
+    if sort is None:
+        return ()
+    if sort not in SORT_ORDERS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(SORT_ORDERS)}")
+    return SORT_ORDERS[sort]
+
 def get_db():
     db = SessionLocal()
     try:
@@ -133,26 +102,80 @@ def get_db():
     finally:
         db.close()
 
+def serialize_bookmark(b, include_tags: bool = True) -> dict:
+    return {
+        "id": int(b.id),
+        "url": b.url or "",
+        "title": b.title or "",
+        "description": b.description or "",
+        "webicon": b.webicon or "/static/favicon.ico",
+        "icon_candidates": (
+            b.icon_candidates.split(",")
+            if isinstance(b.icon_candidates, str) and b.icon_candidates
+            else [b.webicon or "/static/favicon.ico"]
+        ),
+        "extra_metadata": json.loads(b.extra_metadata) if b.extra_metadata else {},
+        "tags": (
+            b.tags.split(",") if include_tags and isinstance(b.tags, str) and b.tags else []
+        ),
+        "is_favorite": bool(b.is_favorite),
+        "created_at": b.created_at.isoformat() if b.created_at else None,
+        "updated_at": b.updated_at.isoformat() if b.updated_at else None,
+        "last_used": b.last_used.isoformat() if b.last_used else None,
+        "click_count": int(b.click_count or 0)
+    }
+
+def serialize_bookmarks(bookmarks, include_tags: bool = True) -> list:
+    with stage_timer("serialize"):
+        return [serialize_bookmark(b, include_tags) for b in bookmarks]
+
+def enqueue_unenriched(bookmark_ids: List[int]):
+    """Queue enrichment for bookmarks that never got icon candidates; the response does not wait for it.
+
+    Uses its own session, since callers have already turned the ORM rows' tags into lists.
+    """
+    if not bookmark_ids:
+        return
+    db = SessionLocal()
+    try:
+        enqueue_enrichment(db, bookmark_ids, skip_failed=True)
+    except Exception as e:
+        logger.warning(f"Failed to queue enrichment for {len(bookmark_ids)} bookmarks: {str(e)}")
+    finally:
+        db.close()
+
+def reject_duplicate(db: Session, canonical_url: str, bookmark_id: Optional[int] = None):
+    """409 if another bookmark is the same page; uses the canonical_url index."""
+    query = db.query(Bookmark.id).filter(Bookmark.canonical_url == canonical_url)
+    if bookmark_id is not None:
+        query = query.filter(Bookmark.id != bookmark_id)
+    existing = query.first()
+    if existing:
+        raise HTTPException(status_code=409, detail=f"Already bookmarked as bookmark {existing.id}")
+
 @router.post("/bookmarks", response_model=BookmarkSchema)
 def add_bookmark(bookmark: BookmarkCreate, db: Session = Depends(get_db)):
     try:
-        logger.info(f"Adding bookmark: {bookmark.dict()}")
+        logger.info("Adding bookmark: %s", bookmark.url)
+        # The same page under another spelling (tracking params, www., http) would fetch its icons again
+        canonical_url = canonicalize(bookmark.url)
+        reject_duplicate(db, canonical_url)
         webicon = bookmark.webicon or "/static/favicon.ico"
         icon_candidates = []
-        try:
-            metadata = fetch_metadata_combined(bookmark.url)
-            if "error" not in metadata:
-                webicon = metadata.get("webicon", "/static/favicon.ico")
-                icon_candidates = metadata.get("icon_candidates", [])
-                icon_candidates = [ic for ic in icon_candidates if (Path("app") / ic.lstrip("/")).exists()]
-                for ic in icon_candidates:
-                    logger.info(f"Validating icon {ic}: {'valid' if (Path('app') / ic.lstrip('/')).exists() else 'invalid'}")
-            else:
-                logger.warning(f"Metadata fetch failed for {bookmark.url}: {metadata['error']}")
-        except Exception as e:
-            logger.error(f"Metadata fetch exception for {bookmark.url}: {str(e)}")
-            webicon = "/static/favicon.ico"
-            icon_candidates = []
+        snapshot = None
+        metadata = None
+        hint = None
+        if bookmark.preview_token:
+            # Commit what /fetch-metadata already fetched instead of fetching again
+            metadata = preview_store.redeem(bookmark.preview_token, bookmark.url)
+            record_cache("preview", metadata is not None)
+        if metadata is not None and "error" not in metadata:
+            icon_candidates = [ic for ic in metadata.get("icon_candidates", []) if icon_manifest.exists(ic)]
+            webicon = bookmark.webicon if bookmark.webicon in icon_candidates else metadata.get("webicon", webicon)
+            # Redirects or <link rel=canonical> can reveal a page we already have; only /duplicates reports it
+            hint = canonical_hint(bookmark.url, metadata.get("canonical_url"))
+            snapshot = metadata.get("snapshot")
+        enrich = metadata is None or "error" in metadata
 
         # Add network tag for IP-based URLs
         tags = bookmark.tags or []
@@ -163,6 +186,8 @@ def add_bookmark(bookmark: BookmarkCreate, db: Session = Depends(get_db)):
 
         bookmark_instance = Bookmark(
             url=bookmark.url,
+            canonical_url=canonical_url,
+            canonical_hint=hint,
             title=bookmark.title,
             description=bookmark.description,
             webicon=webicon,
@@ -181,21 +206,65 @@ def add_bookmark(bookmark: BookmarkCreate, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(bookmark_instance)
         logger.info(f"Bookmark added successfully: ID {bookmark_instance.id}")
+        if snapshot:
+            # Before the event, so the search index picks up the page text with the bookmark
+            with stage_timer("snapshot_store"):
+                snapshot_store.save_fetched(db, canonical_url, bookmark.url, snapshot)
+        if enrich:
+            # Fetching the page is a worker's job; the bookmark shows the fallback icon until it is done
+            enqueue_enrichment(db, [bookmark_instance.id])
+        publish_bookmark_event(METADATA_READY, bookmark_instance)
         bookmark_instance.tags = bookmark_instance.tags.split(",") if bookmark_instance.tags else []
         bookmark_instance.icon_candidates = (
             bookmark_instance.icon_candidates.split(",") if bookmark_instance.icon_candidates else []
         )
         return bookmark_instance
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding bookmark: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to add bookmark: {str(e)}")
 
+@router.get("/bookmarks/export")
+def export_bookmarks(format: str = "jsonl", compression: Optional[str] = None):
+    if format not in exporter.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(exporter.FORMATS)}")
+    if compression is not None and compression not in exporter.COMPRESSIONS:
+        raise HTTPException(status_code=400, detail=f"compression must be one of: {', '.join(exporter.COMPRESSIONS)}")
+    try:
+        # Rows are read from a server-side cursor while the response is sent, not loaded up front
+        stream = exporter.export_stream(format, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type, extension = exporter.FORMATS[format]
+    filename = f"bookmarks.{extension}"
+    if compression:
+        media_type, suffix = exporter.COMPRESSIONS[compression]
+        filename += f".{suffix}"
+    logger.info("Exporting bookmarks as %s (compression=%s)", format, compression)
+    return StreamingResponse(
+        stream, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+MAX_PAGE_SIZE = 1000
+
 @router.get("/bookmarks", response_model=List[BookmarkSchema])
-def get_bookmarks(db: Session = Depends(get_db)):
+def get_bookmarks(response: Response, sort: Optional[str] = None, limit: Optional[int] = None, offset: int = 0,
+                  db: Session = Depends(get_db)):
+    order = sort_order(sort)
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
     try:
-        logger.info("Fetching all bookmarks")
-        bookmarks = db.query(Bookmark).all()
-        logger.info(f"Fetched {len(bookmarks)} bookmarks")
+        query = db.query(Bookmark)
+        if limit is None:
+            logger.info("Fetching all bookmarks", extra={"sample_rate": 0.1})
+            bookmarks = query.order_by(*order).all()
+        else:
+            # One page for the web UI's incremental loading; the id tie-break keeps pages stable
+            logger.info("Fetching %d bookmarks from offset %d", limit, offset, extra={"sample_rate": 0.1})
+            response.headers["X-Total-Count"] = str(query.count())
+            bookmarks = query.order_by(*order, Bookmark.id).limit(limit).offset(max(offset, 0)).all()
+        logger.info("Fetched %d bookmarks", len(bookmarks), extra={"sample_rate": 0.1})
         result = []
         for bookmark in bookmarks:
             try:
@@ -208,31 +277,12 @@ def get_bookmarks(db: Session = Depends(get_db)):
                     else []
                 )
                 if not bookmark.icon_candidates:
-                    try:
-                        logger.info(f"Fetching metadata for bookmark {bookmark.id} with URL {bookmark.url}")
-                        metadata = fetch_metadata_combined(bookmark.url)
-                        if "error" not in metadata:
-                            bookmark.icon_candidates = metadata.get("icon_candidates", [bookmark.webicon])
-                            bookmark.icon_candidates = bookmark.icon_candidates or [bookmark.webicon]
-                            bookmark.icon_candidates = [
-                                str(ic) for ic in bookmark.icon_candidates if (Path("app") / str(ic).lstrip("/")).exists()
-                            ]
-                            bookmark_instance = db.query(Bookmark).filter(Bookmark.id == bookmark.id).first()
-                            bookmark_instance.icon_candidates = ",".join(bookmark.icon_candidates) if bookmark.icon_candidates else bookmark.webicon
-                            db.commit()
-                            logger.info(f"Updated icon_candidates for bookmark {bookmark.id}: {bookmark.icon_candidates}")
-                        else:
-                            logger.warning(f"Metadata fetch failed for {bookmark.url}: {metadata['error']}")
-                            bookmark.icon_candidates = [bookmark.webicon or "/static/favicon.ico"]
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch metadata for {bookmark.url}: {str(e)}")
-                        bookmark.icon_candidates = [bookmark.webicon or "/static/favicon.ico"]
-                if not bookmark.icon_candidates:
-                    logger.info(f"Using fallback icon /static/favicon.ico for {bookmark.url}")
+                    # The enrichment_sweep job queues these; a page load must not write to the queue
+                    logger.info("Using fallback icon for %s", bookmark.url, extra={"sample_rate": 0.01})
                     bookmark.icon_candidates = [bookmark.webicon or "/static/favicon.ico"]
                 result.append(bookmark)
             except Exception as e:
-                logger.warning(f"Skipping bookmark {bookmark.id} due to error: {str(e)}")
+                logger.warning("Skipping bookmark %s due to error: %s", bookmark.id, e, extra={"sample_rate": 0.1})
                 continue
         return result
     except Exception as e:
@@ -268,36 +318,22 @@ def categorize_bookmarks(db: Session = Depends(get_db)):
             untagged_data = {
                 "category_id": -1,
                 "label": "Untagged",
-                "bookmarks": [
-                    {
-                        "id": int(b.id),
-                        "url": b.url or "",
-                        "title": b.title or "",
-                        "description": b.description or "",
-                        "webicon": b.webicon or "/static/favicon.ico",
-                        "icon_candidates": (
-                            b.icon_candidates.split(",")
-                            if isinstance(b.icon_candidates, str) and b.icon_candidates
-                            else [b.webicon or "/static/favicon.ico"]
-                        ),
-                        "extra_metadata": json.loads(b.extra_metadata) if b.extra_metadata else {},
-                        "tags": [],
-                        "is_favorite": bool(b.is_favorite),
-                        "created_at": b.created_at.isoformat() if b.created_at else None,
-                        "updated_at": b.updated_at.isoformat() if b.updated_at else None,
-                        "last_used": b.last_used.isoformat() if b.last_used else None,
-                        "click_count": int(b.click_count or 0)
-                    }
-                    for b in untagged_bookmarks
-                ]
+                "bookmarks": serialize_bookmarks(untagged_bookmarks, include_tags=False)
             }
             result.append(untagged_data)
 
         # Categorize IP-based bookmarks
         ip_categories = defaultdict(list)
-        for bookmark in ip_bookmarks:
-            classification, _ = network_detector.classify_url(bookmark.url)
-            ip_categories[classification].append(bookmark)
+        ranges = network_detector.classify_many([bookmark.url for bookmark in ip_bookmarks])
+        for bookmark, (classification, network_range) in zip(ip_bookmarks, ranges):
+            if network_range is not None and network_range.label:
+                # User-defined ranges (e.g. "homelab") get their own category
+                ip_categories[network_range.label].append(bookmark)
+            elif classification == "Local":
+                classification, _ = network_detector.with_accessibility(bookmark.url, classification)
+                ip_categories[classification].append(bookmark)
+            else:
+                ip_categories[classification].append(bookmark)
 
         for classification, bookmarks in ip_categories.items():
             try:
@@ -305,37 +341,16 @@ def categorize_bookmarks(db: Session = Depends(get_db)):
                     "Local": "Local Servers",
                     "Local (Offline)": "Local Servers (Offline)",
                     "VPN": "VPN Servers",
+                    "Loopback": "Loopback Servers",
+                    "Link-Local": "Link-Local Servers",
                     "Remote": "Remote Servers",
                     "Unknown": "Unknown Servers",
                     "Invalid": "Invalid Servers"
-                }.get(classification, "Unknown Servers")
+                }.get(classification, classification)
                 category_data = {
                     "category_id": len(result),
                     "label": label,
-                    "bookmarks": [
-                        {
-                            "id": int(b.id),
-                            "url": b.url or "",
-                            "title": b.title or "",
-                            "description": b.description or "",
-                            "webicon": b.webicon or "/static/favicon.ico",
-                            "icon_candidates": (
-                                b.icon_candidates.split(",")
-                                if isinstance(b.icon_candidates, str) and b.icon_candidates
-                                else [b.webicon or "/static/favicon.ico"]
-                            ),
-                            "extra_metadata": json.loads(b.extra_metadata) if b.extra_metadata else {},
-                            "tags": (
-                                b.tags.split(",") if isinstance(b.tags, str) and b.tags else []
-                            ),
-                            "is_favorite": bool(b.is_favorite),
-                            "created_at": b.created_at.isoformat() if b.created_at else None,
-                            "updated_at": b.updated_at.isoformat() if b.updated_at else None,
-                            "last_used": b.last_used.isoformat() if b.last_used else None,
-                            "click_count": int(b.click_count or 0)
-                        }
-                        for b in bookmarks
-                    ]
+                    "bookmarks": serialize_bookmarks(bookmarks)
                 }
                 result.append(category_data)
             except Exception as e:
@@ -347,17 +362,12 @@ def categorize_bookmarks(db: Session = Depends(get_db)):
             tag_categories = defaultdict(list)
             uncategorized_bookmarks = []
             combined_vocab = TAG_VOCAB + USER_TAG_VOCAB
+            domain_types = domain_rules.classify_many(b.url for b in tagged_bookmarks)
 
-            for bookmark in tagged_bookmarks:
+            for bookmark, domain_type in zip(tagged_bookmarks, domain_types):
                 try:
                     tags = bookmark.tags.split(",") if isinstance(bookmark.tags, str) and bookmark.tags else []
                     tags = [t.strip() for t in tags if t.strip()]
-                    domain = urlparse(bookmark.url).netloc
-                    domain_type = None
-                    for key, value in DOMAIN_TYPES.items():
-                        if key in domain:
-                            domain_type = value
-                            break
                     if domain_type and domain_type not in tags:
                         tags.append(domain_type)
 
@@ -382,30 +392,7 @@ def categorize_bookmarks(db: Session = Depends(get_db)):
                     category_data = {
                         "category_id": len(result),
                         "label": tag.capitalize(),
-                        "bookmarks": [
-                            {
-                                "id": int(b.id),
-                                "url": b.url or "",
-                                "title": b.title or "",
-                                "description": b.description or "",
-                                "webicon": b.webicon or "/static/favicon.ico",
-                                "icon_candidates": (
-                                    b.icon_candidates.split(",")
-                                    if isinstance(b.icon_candidates, str) and b.icon_candidates
-                                    else [b.webicon or "/static/favicon.ico"]
-                                ),
-                                "extra_metadata": json.loads(b.extra_metadata) if b.extra_metadata else {},
-                                "tags": (
-                                    b.tags.split(",") if isinstance(b.tags, str) and b.tags else []
-                                ),
-                                "is_favorite": bool(b.is_favorite),
-                                "created_at": b.created_at.isoformat() if b.created_at else None,
-                                "updated_at": b.updated_at.isoformat() if b.updated_at else None,
-                                "last_used": b.last_used.isoformat() if b.last_used else None,
-                                "click_count": int(b.click_count or 0)
-                            }
-                            for b in bookmarks
-                        ]
+                        "bookmarks": serialize_bookmarks(bookmarks)
                     }
                     result.append(category_data)
                 except Exception as e:
@@ -437,7 +424,7 @@ def categorize_bookmarks(db: Session = Depends(get_db)):
 
                 if texts:
                     try:
-                        vectorizer = TfidfVectorizer(max_features=1000, stop_words="english")
+                        vectorizer = text_ml.tfidf_vectorizer(max_features=1000, stop_words="english")
                         X = vectorizer.fit_transform(texts)
                         logger.info(f"Vectorized {len(texts)} texts with {X.shape[1]} features")
                     except Exception as e:
@@ -448,9 +435,9 @@ def categorize_bookmarks(db: Session = Depends(get_db)):
                     else:
                         n_categories = min(max(3, len(valid_bookmarks) // 5), 5, len(texts))
                         try:
-                            kmeans = KMeans(n_clusters=n_categories, random_state=42)
+                            kmeans = text_ml.kmeans(n_clusters=n_categories, random_state=42)
                             labels = [int(label) for label in kmeans.fit_predict(X)]
-                            logger.info(f"K-Means categorization with labels: {labels}")
+                            logger.debug("K-Means categorization with labels: %s", labels)
                         except Exception as e:
                             logger.error(f"K-Means categorization failed: {str(e)}")
                             labels = [0] * len(valid_bookmarks)
@@ -470,9 +457,9 @@ def categorize_bookmarks(db: Session = Depends(get_db)):
                                 all_tags.extend(tags)
                                 domain = urlparse(bookmark.url).netloc
                                 domains.append(domain)
-                                for key, value in DOMAIN_TYPES.items():
-                                    if key in domain and value not in all_tags:
-                                        all_tags.append(value)
+                                domain_type = domain_rules.classify(domain)
+                                if domain_type and domain_type not in all_tags:
+                                    all_tags.append(domain_type)
                             tag_counts = Counter(all_tags).most_common(2)
                             domain_counts = Counter([d.split('.')[0] for d in domains]).most_common(1)
                             label_parts = [tag for tag, _ in tag_counts]
@@ -482,30 +469,7 @@ def categorize_bookmarks(db: Session = Depends(get_db)):
                             category_data = {
                                 "category_id": len(result),
                                 "label": label,
-                                "bookmarks": [
-                                    {
-                                        "id": int(b.id),
-                                        "url": b.url or "",
-                                        "title": b.title or "",
-                                        "description": b.description or "",
-                                        "webicon": b.webicon or "/static/favicon.ico",
-                                        "icon_candidates": (
-                                            b.icon_candidates.split(",")
-                                            if isinstance(b.icon_candidates, str) and b.icon_candidates
-                                            else [b.webicon or "/static/favicon.ico"]
-                                        ),
-                                        "extra_metadata": json.loads(b.extra_metadata) if b.extra_metadata else {},
-                                        "tags": (
-                                            b.tags.split(",") if isinstance(b.tags, str) and b.tags else []
-                                        ),
-                                        "is_favorite": bool(b.is_favorite),
-                                        "created_at": b.created_at.isoformat() if b.created_at else None,
-                                        "updated_at": b.updated_at.isoformat() if b.updated_at else None,
-                                        "last_used": b.last_used.isoformat() if b.last_used else None,
-                                        "click_count": int(b.click_count or 0)
-                                    }
-                                    for b in bookmarks
-                                ]
+                                "bookmarks": serialize_bookmarks(bookmarks)
                             }
                             result.append(category_data)
                         except Exception as e:
@@ -539,7 +503,11 @@ def update_bookmark(bookmark_id: int, data: dict, db: Session = Depends(get_db))
                     logger.info(f"Added user tag to USER_TAG_VOCAB: {tag}")
         if "is_favorite" in data:
             bookmark_instance.is_favorite = data["is_favorite"]
+        category_changed = "tags" in data or "url" in data
         if "url" in data:
+            bookmark_instance.canonical_url = canonicalize(data["url"])
+            reject_duplicate(db, bookmark_instance.canonical_url, bookmark_id)
+            bookmark_instance.canonical_hint = None  # Was about the old page; enrichment finds the new one
             bookmark_instance.url = data["url"]
             # Update network tag for IP-based URLs
             if network_detector.is_ip_url(data["url"]):
@@ -552,6 +520,9 @@ def update_bookmark(bookmark_id: int, data: dict, db: Session = Depends(get_db))
         bookmark_instance.updated_at = datetime.now()
 
         db.commit()
+        if "url" in data:
+            # Icons and page text belong to the old page; a worker fetches the new one
+            enqueue_enrichment(db, [bookmark_id])
         db.refresh(bookmark_instance)
         bookmark_instance.tags = (
             bookmark_instance.tags.split(",") if isinstance(bookmark_instance.tags, str) and bookmark_instance.tags else []
@@ -562,25 +533,13 @@ def update_bookmark(bookmark_id: int, data: dict, db: Session = Depends(get_db))
             else []
         )
         if not bookmark_instance.icon_candidates:
-            try:
-                metadata = fetch_metadata_combined(bookmark_instance.url)
-                if "error" not in metadata:
-                    bookmark_instance.icon_candidates = metadata.get("icon_candidates", [bookmark_instance.webicon])
-                    bookmark_instance.icon_candidates = bookmark_instance.icon_candidates or [bookmark_instance.webicon]
-                    bookmark_instance.icon_candidates = [
-                        str(ic) for ic in bookmark_instance.icon_candidates if (Path("app") / str(ic).lstrip("/")).exists()
-                    ]
-                    bookmark_instance.icon_candidates = ",".join(bookmark_instance.icon_candidates) if bookmark_instance.icon_candidates else bookmark_instance.webicon
-                    db.commit()
-                    logger.info(f"Updated icon_candidates for bookmark {bookmark_id}: {bookmark_instance.icon_candidates}")
-                else:
-                    logger.warning(f"Metadata fetch failed for {bookmark_instance.url}: {metadata['error']}")
-                    bookmark_instance.icon_candidates = [bookmark_instance.webicon or "/static/favicon.ico"]
-            except Exception as e:
-                logger.warning(f"Failed to fetch metadata for {bookmark_instance.url}: {str(e)}")
-                bookmark_instance.icon_candidates = [bookmark_instance.webicon or "/static/favicon.ico"]
+            enqueue_unenriched([bookmark_id])
+            bookmark_instance.icon_candidates = [bookmark_instance.webicon or "/static/favicon.ico"]
         logger.info(f"Updated bookmark {bookmark_id}")
+        publish_bookmark_event(CATEGORY_CHANGED if category_changed else METADATA_READY, bookmark_instance)
         return bookmark_instance
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating bookmark {bookmark_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to update bookmark: {str(e)}")
@@ -599,7 +558,7 @@ def update_bookmark_webicon(bookmark_id: int, data: dict, db: Session = Depends(
             raise HTTPException(status_code=400, detail="Webicon path required")
 
         icon_path = Path("app") / new_webicon.lstrip("/")
-        if not icon_path.exists() or not icon_path.is_file():
+        if not icon_manifest.exists(new_webicon):
             logger.error(f"Invalid webicon path: {new_webicon}")
             raise HTTPException(status_code=400, detail="Invalid webicon path")
 
@@ -623,24 +582,10 @@ def update_bookmark_webicon(bookmark_id: int, data: dict, db: Session = Depends(
             else []
         )
         if not bookmark_instance.icon_candidates:
-            try:
-                metadata = fetch_metadata_combined(bookmark_instance.url)
-                if "error" not in metadata:
-                    bookmark_instance.icon_candidates = metadata.get("icon_candidates", [bookmark_instance.webicon])
-                    bookmark_instance.icon_candidates = bookmark_instance.icon_candidates or [bookmark_instance.webicon]
-                    bookmark_instance.icon_candidates = [
-                        str(ic) for ic in bookmark_instance.icon_candidates if (Path("app") / str(ic).lstrip("/")).exists()
-                    ]
-                    bookmark_instance.icon_candidates = ",".join(bookmark_instance.icon_candidates) if bookmark_instance.icon_candidates else bookmark_instance.webicon
-                    db.commit()
-                    logger.info(f"Updated icon_candidates for bookmark {bookmark_id}: {bookmark_instance.icon_candidates}")
-                else:
-                    logger.warning(f"Metadata fetch failed for {bookmark_instance.url}: {metadata['error']}")
-                    bookmark_instance.icon_candidates = [bookmark_instance.webicon or "/static/favicon.ico"]
-            except Exception as e:
-                logger.warning(f"Failed to fetch metadata for {bookmark_instance.url}: {str(e)}")
-                bookmark_instance.icon_candidates = [bookmark_instance.webicon or "/static/favicon.ico"]
+            enqueue_unenriched([bookmark_id])
+            bookmark_instance.icon_candidates = [bookmark_instance.webicon or "/static/favicon.ico"]
         logger.info(f"Updated webicon for bookmark {bookmark_id} to {new_webicon}")
+        publish_bookmark_event(ICON_UPDATED, bookmark_instance)
         return bookmark_instance
     except Exception as e:
         logger.error(f"Error updating webicon for bookmark {bookmark_id}: {str(e)}", exc_info=True)
@@ -654,115 +599,105 @@ def delete_bookmark(bookmark_id: int, db: Session = Depends(get_db)):
             logger.error(f"Bookmark {bookmark_id} not found")
             raise HTTPException(status_code=404, detail="Bookmark not found")
 
-        # Serialize bookmark metadata to JSON
-        bookmark_data = {
-            "id": bookmark_instance.id,
-            "url": bookmark_instance.url or "",
-            "title": bookmark_instance.title or "",
-            "description": bookmark_instance.description or "",
-            "webicon": bookmark_instance.webicon or "/static/favicon.ico",
-            "icon_candidates": (
-                bookmark_instance.icon_candidates.split(",")
-                if isinstance(bookmark_instance.icon_candidates, str) and bookmark_instance.icon_candidates
-                else [bookmark_instance.webicon or "/static/favicon.ico"]
-            ),
-            "extra_metadata": json.loads(bookmark_instance.extra_metadata) if bookmark_instance.extra_metadata else {},
-            "tags": (
-                bookmark_instance.tags.split(",") if isinstance(bookmark_instance.tags, str) and bookmark_instance.tags else []
-            ),
-            "is_favorite": bool(bookmark_instance.is_favorite),
-            "created_at": bookmark_instance.created_at.isoformat() if bookmark_instance.created_at else None,
-            "updated_at": bookmark_instance.updated_at.isoformat() if bookmark_instance.updated_at else None,
-            "last_used": bookmark_instance.last_used.isoformat() if bookmark_instance.last_used else None,
-            "click_count": int(bookmark_instance.click_count or 0),
-            "deleted_at": datetime.now().isoformat(),
-            "network_classification": network_detector.classify_url(bookmark_instance.url)[0] if network_detector.is_ip_url(bookmark_instance.url) else "N/A"
-        }
-
-        # Save metadata to JSON file
-        recycled_bookmarks_dir = Path("app/static/recycled_bookmarks")
-        recycled_bookmarks_dir.mkdir(parents=True, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"{bookmark_id}_{timestamp}.json"
-        backup_path = recycled_bookmarks_dir / backup_filename
-        try:
-            with backup_path.open("w") as f:
-                json.dump(bookmark_data, f, indent=2)
-            logger.info(f"Saved deleted bookmark metadata to {backup_path}")
-        except Exception as e:
-            logger.error(f"Failed to save deleted bookmark metadata to {backup_path}: {str(e)}")
-            # Continue with deletion even if backup fails
-
-        # Move associated icons to recycled_icons
-        domain = urlparse(bookmark_instance.url).netloc.replace(".", "_")
-        recycle_dir = Path("app/static/recycled_icons") / domain
-        recycle_dir.mkdir(parents=True, exist_ok=True)
-
-        icons_to_move = []
-        if bookmark_instance.webicon and bookmark_instance.webicon != "/static/favicon.ico":
-            icons_to_move.append(bookmark_instance.webicon)
-        if bookmark_instance.icon_candidates:
-            icon_candidates = (
-                bookmark_instance.icon_candidates.split(",")
-                if isinstance(bookmark_instance.icon_candidates, str)
-                else []
-            )
-            icons_to_move.extend([ic for ic in icon_candidates if ic != "/static/favicon.ico"])
-
-        for icon_path in set(icons_to_move):
-            try:
-                src_path = Path("app") / icon_path.lstrip("/")
-                if src_path.exists() and src_path.is_file():
-                    dest_path = recycle_dir / src_path.name
-                    shutil.move(str(src_path), str(dest_path))
-                    logger.info(f"Moved icon {src_path} to {dest_path}")
-                else:
-                    logger.warning(f"Icon {src_path} does not exist or is not a file")
-            except Exception as e:
-                logger.warning(f"Failed to move icon {icon_path}: {str(e)}")
-
-        # Delete bookmark from database
+        # Move to the trash in the same transaction; icons stay in place until the entry is purged
+        trash.trash_bookmarks(db, [trash.snapshot(bookmark_instance)])
         db.delete(bookmark_instance)
         db.commit()
-        logger.info(f"Deleted bookmark {bookmark_id} from database")
+        logger.info(f"Moved bookmark {bookmark_id} to the trash")
+        event_bus.publish(BOOKMARK_DELETED, bookmark_id)
         return {"message": "Bookmark deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting bookmark {bookmark_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to delete bookmark: {str(e)}")
 
+@router.get("/trash")
+def list_trash(limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
+    limit = max(1, min(limit, 500))
+    offset = max(offset, 0)
+    total, items = trash.list_trash(db, limit, offset)
+    return {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "items": [
+            {
+                "id": item.id,
+                "bookmark_id": item.bookmark_id,
+                "url": item.url,
+                "title": item.title or "",
+                "deleted_at": item.deleted_at.isoformat(),
+            }
+            for item in items
+        ],
+    }
+
+@router.post("/trash/{trash_id}/restore")
+def restore_bookmark(trash_id: int, db: Session = Depends(get_db)):
+    try:
+        bookmark = trash.restore(db, trash_id)
+        if bookmark is None:
+            raise HTTPException(status_code=404, detail="Trash entry not found")
+        db.commit()
+    except trash.TrashConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error restoring trash entry {trash_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to restore bookmark: {str(e)}")
+    logger.info(f"Restored bookmark {bookmark.id} from trash entry {trash_id}")
+    publish_bookmark_event(METADATA_READY, bookmark)
+    return serialize_bookmark(bookmark)
+
+@router.get("/page-status")
+def page_status(url: Optional[str] = None, bookmark_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """Check a URL, or a bookmark's own URL; only the latter is stored and announced as its link status."""
+    if bookmark_id is None:
+        if not url:
+            raise HTTPException(status_code=400, detail="url or bookmark_id is required")
+        return {"url": url, "online": is_page_online(url)}
+    bookmark = db.query(Bookmark.url).filter(Bookmark.id == bookmark_id).first()
+    if bookmark is None:
+        raise HTTPException(status_code=404, detail="Bookmark not found")
+    url = bookmark.url  # Never the client's URL, so nobody can announce another page's status for it
+    online = is_page_online(url)
+    record_link_status(db.get_bind(), bookmark_id, online)
+    event_bus.record_link_status(bookmark_id, url, online)
+    return {"url": url, "online": online}
+
 class MetadataRequest(BaseModel):
     url: str
 
+def preview_response(url: str, metadata: dict, snapshot: Optional[dict] = None) -> dict:
+    """Attach a preview token so POST /bookmarks can commit this metadata without refetching.
+
+    The page snapshot is kept with the preview but not sent to the browser.
+    """
+    stored = {**metadata, "snapshot": snapshot} if snapshot else metadata
+    return {**metadata, "preview_token": preview_store.issue(url, stored)}
+
 @router.post("/fetch-metadata")
 def get_metadata(request: MetadataRequest, db: Session = Depends(get_db)):
     try:
         logger.info(f"Fetching metadata for URL: {request.url}")
         existing_bookmark = db.query(Bookmark).filter(Bookmark.url == request.url).first()
         if existing_bookmark and existing_bookmark.webicon:
-            icon_path = Path("app") / existing_bookmark.webicon.lstrip("/")
-            if icon_path.exists() and icon_path.stat().st_size > 0:
+            if icon_manifest.size(existing_bookmark.webicon):
+                # The stored bookmark already has everything a preview needs; skip the network
                 logger.info(f"Reusing existing favicon for {request.url}: {existing_bookmark.webicon}")
-                metadata = fetch_metadata_combined(request.url)
-                if "error" in metadata:
-                    logger.warning(f"Metadata fetch failed for {request.url}: {metadata['error']}")
-                    return {
-                        "title": existing_bookmark.title or "No title",
-                        "description": existing_bookmark.description or "",
-                        "webicon": existing_bookmark.webicon,
-                        "icon_candidates": [existing_bookmark.webicon],
-                        "extra_metadata": {}
-                    }
-                icon_candidates = metadata.get("icon_candidates", [existing_bookmark.webicon])
-                icon_candidates = [ic for ic in icon_candidates if (Path("app") / ic.lstrip("/")).exists()]
-                for ic in icon_candidates:
-                    logger.info(f"Validating icon {ic}: {'valid' if (Path('app') / ic.lstrip('/')).exists() else 'invalid'}")
-                return {
-                    "title": existing_bookmark.title,
-                    "description": existing_bookmark.description,
+                icon_candidates = (existing_bookmark.icon_candidates or "").split(",")
+                icon_candidates = [ic for ic in icon_candidates if icon_manifest.exists(ic)]
+                return preview_response(request.url, {
+                    "title": existing_bookmark.title or "No title",
+                    "description": existing_bookmark.description or "",
                     "webicon": existing_bookmark.webicon,
                     "icon_candidates": icon_candidates or [existing_bookmark.webicon],
-                    "extra_metadata": metadata.get("extra_metadata", {})
-                }
+                    "extra_metadata": json.loads(existing_bookmark.extra_metadata) if existing_bookmark.extra_metadata else {}
+                })
 
         metadata = fetch_metadata_combined(request.url)
         if "error" in metadata:
@@ -775,38 +710,112 @@ def get_metadata(request: MetadataRequest, db: Session = Depends(get_db)):
                 "extra_metadata": {}
             }
         icon_candidates = metadata.get("icon_candidates", [metadata.get("webicon", "/static/favicon.ico")])
-        icon_candidates = [ic for ic in icon_candidates if (Path("app") / ic.lstrip("/")).exists()]
-        for ic in icon_candidates:
-            logger.info(f"Validating icon {ic}: {'valid' if (Path('app') / ic.lstrip('/')).exists() else 'invalid'}")
+        icon_candidates = [ic for ic in icon_candidates if icon_manifest.exists(ic)]
         if not icon_candidates:
-            logger.info(f"Using fallback icon /static/favicon.ico for {request.url}")
+            logger.debug("Using fallback icon for %s", request.url)
             icon_candidates = [metadata.get("webicon", "/static/favicon.ico")]
         logger.info(f"Metadata fetched successfully for {request.url}: webicon={metadata.get('webicon')}, candidates={icon_candidates}")
-        return {
+        return preview_response(request.url, {
             "title": metadata.get("title", "No title"),
             "description": metadata.get("description", ""),
             "webicon": metadata.get("webicon", "/static/favicon.ico"),
             "icon_candidates": icon_candidates,
             "extra_metadata": metadata.get("extra_metadata", {})
-        }
+        }, snapshot=metadata.get("snapshot"))
     except Exception as e:
         logger.error(f"Error in fetch-metadata for {request.url}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to fetch metadata: {str(e)}")
 
+def bookmarks_by_ids(db: Session, ids: List[int]) -> list:
+    """Load bookmarks keeping the order of `ids` (e.g. a ranking)."""
+    by_id = {b.id: b for b in db.query(Bookmark).filter(Bookmark.id.in_(ids)).all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+@router.get("/duplicates")
+def duplicate_report(distance: int = duplicates.DEFAULT_MAX_DISTANCE, limit: int = 100, db: Session = Depends(get_db)):
+    if not 0 <= distance <= 16:
+        raise HTTPException(status_code=400, detail="distance must be between 0 and 16 bits")
+    try:
+        with stage_timer("duplicates"):
+            return duplicates.find_duplicates(db, max_distance=distance, limit=limit)
+    except Exception as e:
+        logger.error(f"Error finding duplicates: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to find duplicates: {str(e)}")
+
+@router.get("/bookmarks/{bookmark_id}/snapshot")
+def get_snapshot(bookmark_id: int, format: str = "text", db: Session = Depends(get_db)):
+    if format not in ("text", "html"):
+        raise HTTPException(status_code=400, detail="format must be 'text' or 'html'")
+    bookmark = db.query(Bookmark.canonical_url, Bookmark.url).filter(Bookmark.id == bookmark_id).first()
+    if not bookmark:
+        raise HTTPException(status_code=404, detail="Bookmark not found")
+    try:
+        snapshot = snapshot_store.get(db, bookmark.canonical_url or canonicalize(bookmark.url))
+        content = None
+        if snapshot is not None:
+            with stage_timer("snapshot_read"):
+                content = snapshot_store.read(db, snapshot.text_hash if format == "text" else snapshot.html_hash)
+    except Exception as e:
+        logger.error(f"Error reading snapshot of bookmark {bookmark_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to read snapshot: {str(e)}")
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"No {format} snapshot for this bookmark")
+    headers = {"X-Snapshot-Captured-At": snapshot.captured_at.isoformat()}
+    if format == "text":
+        return PlainTextResponse(content, headers=headers)
+    # The saved page is served from our origin, so it must not run its scripts here
+    headers.update({"Content-Security-Policy": "sandbox", "X-Content-Type-Options": "nosniff"})
+    return HTMLResponse(content, headers=headers)
+
+@router.get("/bookmarks/{bookmark_id}/similar")
+def similar_bookmarks(bookmark_id: int, limit: int = 10, db: Session = Depends(get_db)):
+    bookmark = db.query(Bookmark).filter(Bookmark.id == bookmark_id).first()
+    if not bookmark:
+        raise HTTPException(status_code=404, detail="Bookmark not found")
+    try:
+        with stage_timer("semantic_search"):
+            ranked = embedding_index.similar(bookmark_id, limit)
+            if ranked is None:
+                # Not embedded yet (the leader's sync is behind); embed it for this query only
+                [(_, text)] = with_page_text([(bookmark.id, bookmark_text(bookmark.title, bookmark.description, bookmark.tags, bookmark.url))])
+                ranked = embedding_index.search(embedding_index.encode([text])[0], limit, exclude=(bookmark_id,))
+        scores = dict(ranked)
+        result = serialize_bookmarks(bookmarks_by_ids(db, [i for i, _ in ranked]))
+        for item in result:
+            item["score"] = round(scores[item["id"]], 4)
+        return result
+    except Exception as e:
+        logger.error(f"Error finding bookmarks similar to {bookmark_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to find similar bookmarks: {str(e)}")
+
 @router.get("/search", response_model=List[BookmarkSchema])
-def search_bookmarks(query: str, db: Session = Depends(get_db)):
+def search_bookmarks(query: str, mode: str = "substring", limit: int = 20, sort: Optional[str] = None,
+                     db: Session = Depends(get_db)):
+    if mode not in ("substring", "semantic"):
+        raise HTTPException(status_code=400, detail="mode must be 'substring' or 'semantic'")
+    order = sort_order(sort)
     try:
-        logger.info(f"Searching bookmarks with query: {query}")
-        bookmarks = (
-            db.query(Bookmark)
-            .filter(
-                (Bookmark.title.ilike(f"%{query}%"))
-                | (Bookmark.description.ilike(f"%{query}%"))
-                | (Bookmark.url.ilike(f"%{query}%"))
+        logger.info("Searching bookmarks with query: %s (mode=%s)", query, mode, extra={"sample_rate": 0.1})
+        if mode == "semantic":
+            with stage_timer("semantic_search"):
+                ranked = embedding_index.query(query, limit)
+            if order:
+                # Re-rank the semantic top hits, e.g. most used first
+                bookmarks = db.query(Bookmark).filter(Bookmark.id.in_([i for i, _ in ranked])).order_by(*order).all()
+            else:
+                bookmarks = bookmarks_by_ids(db, [i for i, _ in ranked])
+        else:
+            bookmarks = (
+                db.query(Bookmark)
+                .filter(
+                    (Bookmark.title.ilike(f"%{query}%"))
+                    | (Bookmark.description.ilike(f"%{query}%"))
+                    | (Bookmark.url.ilike(f"%{query}%"))
+                )
+                .order_by(*order)
+                .all()
             )
-            .all()
-        )
-        logger.info(f"Search query '{query}' returned {len(bookmarks)} results")
+        logger.info("Search query '%s' returned %d results", query, len(bookmarks), extra={"sample_rate": 0.1})
         result = []
         for bookmark in bookmarks:
             try:
@@ -819,59 +828,121 @@ def search_bookmarks(query: str, db: Session = Depends(get_db)):
                     else []
                 )
                 if not bookmark.icon_candidates:
-                    try:
-                        metadata = fetch_metadata_combined(bookmark.url)
-                        if "error" not in metadata:
-                            bookmark.icon_candidates = metadata.get("icon_candidates", [bookmark.webicon])
-                            bookmark.icon_candidates = bookmark.icon_candidates or [bookmark.webicon]
-                            bookmark.icon_candidates = [
-                                str(ic) for ic in bookmark.icon_candidates if (Path("app") / str(ic).lstrip("/")).exists()
-                            ]
-                            bookmark_instance = db.query(Bookmark).filter(Bookmark.id == bookmark.id).first()
-                            bookmark_instance.icon_candidates = ",".join(bookmark.icon_candidates) if bookmark.icon_candidates else bookmark.webicon
-                            db.commit()
-                            logger.info(f"Updated icon_candidates for bookmark {bookmark.id}: {bookmark.icon_candidates}")
-                        else:
-                            logger.warning(f"Metadata fetch failed for {bookmark.url}: {metadata['error']}")
-                            bookmark.icon_candidates = [bookmark.webicon or "/static/favicon.ico"]
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch metadata for {bookmark.url}: {str(e)}")
-                        bookmark.icon_candidates = [bookmark.webicon or "/static/favicon.ico"]
-                if not bookmark.icon_candidates:
-                    logger.info(f"Using fallback icon /static/favicon.ico for {bookmark.url}")
+                    # The enrichment_sweep job queues these; a page load must not write to the queue
+                    logger.info("Using fallback icon for %s", bookmark.url, extra={"sample_rate": 0.01})
                     bookmark.icon_candidates = [bookmark.webicon or "/static/favicon.ico"]
                 result.append(bookmark)
             except Exception as e:
-                logger.warning(f"Skipping bookmark {bookmark.id} due to error: {str(e)}")
+                logger.warning("Skipping bookmark %s due to error: %s", bookmark.id, e, extra={"sample_rate": 0.1})
                 continue
         return result
     except Exception as e:
         logger.error(f"Error searching bookmarks: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to search bookmarks: {str(e)}")
 
+@router.post("/bookmarks/{bookmark_id}/click")
+def record_click(bookmark_id: int, db: Session = Depends(get_db)):
+    if not db.query(Bookmark.id).filter(Bookmark.id == bookmark_id).first():
+        raise HTTPException(status_code=404, detail="Bookmark not found")
+    # Buffered; click_count, last_used and frecency are written on the next flush
+    click_tracker.record(bookmark_id)
+    return {"status": "recorded"}
+
+@router.get("/go/{bookmark_id}")
+def go_to_bookmark(bookmark_id: int, db: Session = Depends(get_db)):
+    bookmark = db.query(Bookmark.url).filter(Bookmark.id == bookmark_id).first()
+    if not bookmark:
+        raise HTTPException(status_code=404, detail="Bookmark not found")
+    click_tracker.record(bookmark_id)
+    logger.info("Redirecting to bookmark %s", bookmark_id, extra={"sample_rate": 0.01})
+    # A stored "example.com/page" would otherwise redirect relative to this server
+    return RedirectResponse(with_scheme(bookmark.url), status_code=307)
+
+class BatchFields(BaseModel):
+    # Strict types: a tags string or a numeric title is rejected with 422 rather than coerced
+    model_config = ConfigDict(extra="forbid")
+
+    title: Optional[StrictStr] = None
+    description: Optional[StrictStr] = None
+    tags: Optional[List[StrictStr]] = None
+    is_favorite: Optional[StrictBool] = None
+
+class BatchOperation(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    op: Literal["update", "add_tags", "remove_tags", "favorite", "unfavorite", "delete"]
+    ids: List[int]
+    fields: Optional[BatchFields] = None  # For update
+    tags: Optional[List[StrictStr]] = None  # For add_tags / remove_tags
+
+    @model_validator(mode="after")
+    def check_operands(self):
+        if self.op == "update" and not (self.fields and self.fields.model_fields_set):
+            raise ValueError("update needs at least one of fields.title, description, tags or is_favorite")
+        if self.op in ("add_tags", "remove_tags") and not self.tags:
+            raise ValueError(f"{self.op} needs a non-empty tags list")
+        return self
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+@router.post("/bookmarks/batch")
+def batch_bookmarks(request: BatchRequest, db: Session = Depends(get_db)):
+    operations = [operation.model_dump(exclude_unset=True) for operation in request.operations]
+    try:
+        batch_ops.validate(operations)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        outcome = batch_ops.apply_batch(db, operations, trash.snapshot)
+        trash.trash_bookmarks(db, outcome.deleted)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error applying bookmark batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to apply batch: {str(e)}")
+
+    # Side effects only once the transaction has committed
+    for tag in outcome.new_tags:
+        if tag not in USER_TAG_VOCAB and tag not in TAG_VOCAB:
+            USER_TAG_VOCAB.append(tag)
+            logger.info(f"Added user tag to USER_TAG_VOCAB: {tag}")
+    if outcome.changed:
+        for bookmark in bookmarks_by_ids(db, sorted(outcome.changed)):
+            publish_bookmark_event(CATEGORY_CHANGED if outcome.changed[bookmark.id] else METADATA_READY, bookmark)
+    for item in outcome.deleted:
+        event_bus.publish(BOOKMARK_DELETED, item["id"])
+    return {
+        "updated": len(outcome.changed),
+        "deleted": len(outcome.deleted),
+        "results": outcome.results,
+    }
+
 class TagSuggestionRequest(BaseModel):
     title: str
     description: str = ""
     url: str
+    bookmark_id: Optional[int] = None  # Adds the saved page text, if there is a snapshot
 
 @router.post("/suggest-tags")
 def suggest_tags(request: TagSuggestionRequest):
     try:
-        cache_key = f"{request.title}:{request.description}:{request.url}"
+        cache_key = f"{request.title}:{request.description}:{request.url}:{request.bookmark_id}"
+        record_cache("tags", cache_key in TAG_CACHE)
         if cache_key in TAG_CACHE:
-            logger.info(f"Returning cached tags for {cache_key[:50]}...")
+            logger.debug("Returning cached tags for %.50s...", cache_key, extra={"sample_rate": 0.01})
             return {"tags": TAG_CACHE[cache_key]}
 
         text = f"{request.title} {request.description} {request.url}"
-        logger.info(f"Suggesting tags for text: {text[:100]}...")
+        if request.bookmark_id is not None:
+            text += " " + snapshot_store.excerpts([request.bookmark_id]).get(request.bookmark_id, "")
+        logger.debug("Suggesting tags for text: %.100s...", text)
 
         # Add domain-based type or network tag
-        domain = urlparse(request.url).netloc
         tags = []
-        for key, value in DOMAIN_TYPES.items():
-            if key in domain:
-                tags.append(value)
-                break
+        domain_type = domain_rules.classify(request.url)
+        if domain_type:
+            tags.append(domain_type)
         if network_detector.is_ip_url(request.url):
             network_tag = network_detector.get_network_tag(request.url)
             tags.append(network_tag)
@@ -879,14 +950,22 @@ def suggest_tags(request: TagSuggestionRequest):
 
         # Combine base and user-provided tags
         combined_vocab = TAG_VOCAB + USER_TAG_VOCAB
-        vectorizer = TfidfVectorizer(stop_words="english")
-        X = vectorizer.fit_transform([text] + combined_vocab)
-        similarities = cosine_similarity(X[0:1], X[1:])[0]
-        logger.info(f"Similarity scores: {dict(zip(combined_vocab, similarities))}")
-        suggested_tags = [
-            combined_vocab[i] for i, sim in sorted(enumerate(similarities), key=lambda x: x[1], reverse=True)
-            if sim > 0.1
-        ][:3]
+        suggested_tags = None
+        if ml_tagger.enabled:
+            with stage_timer("tag_zero_shot"):
+                suggested_tags = ml_tagger.suggest(text, combined_vocab)
+        if suggested_tags is None:
+            # TF-IDF overlap with the literal tag words; fast fallback when no model is available
+            with stage_timer("tag_similarity"):
+                vectorizer = text_ml.tfidf_vectorizer(stop_words="english")
+                X = vectorizer.fit_transform([text] + combined_vocab)
+                similarities = text_ml.cosine_similarity(X[0:1], X[1:])[0]
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Similarity scores: %s", dict(zip(combined_vocab, similarities)))
+            suggested_tags = [
+                combined_vocab[i] for i, sim in sorted(enumerate(similarities), key=lambda x: x[1], reverse=True)
+                if sim > 0.1
+            ][:3]
 
         # Ensure network tag is included for IP-based URLs
         if network_detector.is_ip_url(request.url) and network_tag not in suggested_tags:
@@ -896,7 +975,7 @@ def suggest_tags(request: TagSuggestionRequest):
         if len(TAG_CACHE) > 1000:
             TAG_CACHE.pop(next(iter(TAG_CACHE)))
 
-        logger.info(f"Suggested tags: {suggested_tags}")
+        logger.debug("Suggested tags: %s", suggested_tags)
         return {"tags": suggested_tags}
     except Exception as e:
         logger.error(f"Error suggesting tags: {str(e)}", exc_info=True)
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+import logging
+
+from app.services import profiler
+from app.services.job_queue import job_queue
+from app.services.scheduler import scheduler
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+def _check_access(request: Request):
+    # Profiles show code paths, URLs and timings, so they are never public
+    if not profiler.PROFILE_TOKEN:
+        raise HTTPException(status_code=403, detail="Profile endpoints are disabled; set PROFILE_TOKEN to enable them")
+    if not profiler.is_authorized(request.headers, request.query_params):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required")
+
+
+@router.get("/diagnostics/profiles")
+def list_profiles(request: Request):
+    _check_access(request)
+    return {"profiles": profiler.profile_store.list()}
+
+
+@router.get("/diagnostics/profiles/{profile_id}")
+def get_profile(profile_id: str, request: Request):
+    """Collapsed stacks for flamegraph.pl, speedscope or inferno."""
+    _check_access(request)
+    path = profiler.profile_store.folded_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+
+@router.get("/diagnostics/scheduler")
+def scheduler_status():
+    """Scheduled jobs, when they run next and how their last run went, as seen by this process."""
+    return scheduler.status()
+
+
+@router.get("/diagnostics/jobs")
+def job_queue_status():
+    """Enrichment queue depth by status and how long the oldest due job has waited."""
+    return job_queue.stats()
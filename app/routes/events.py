@@ -0,0 +1,40 @@
+from fastapi import APIRouter
+from fastapi.requests import Request
+from fastapi.responses import StreamingResponse
+import asyncio
+import logging
+
+from app.services.event_bus import event_bus, format_sse
+from app.services.profiler import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_INTERVAL = 15.0  # Seconds between SSE comments that keep idle proxies from closing the stream
+
+
+@router.get("/events")
+async def stream_events(request: Request):
+    subscription = event_bus.subscribe()
+    logger.info("Client subscribed to bookmark events")
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(subscription)
+            logger.info("Client unsubscribed from bookmark events")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
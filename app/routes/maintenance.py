@@ -0,0 +1,118 @@
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+from datetime import datetime
+import asyncio
+import json
+import logging
+
+from app.models import ReenrichJob, SessionLocal
+from app.routes.bookmarks import get_db
+from app.services.profiler import ProfiledRoute
+from app.services.reenrich import (
+    create_job,
+    start_job,
+    cancel_job,
+    serialize_job,
+    DEFAULT_WORKERS,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_HOST_DELAY,
+    TERMINAL_STATUSES,
+)
+
+router = APIRouter(route_class=ProfiledRoute)
+
+logger = logging.getLogger(__name__)
+
+SSE_POLL_INTERVAL = 1.0
+
+
+class ReenrichRequest(BaseModel):
+    older_than_days: Optional[int] = None
+    tag: Optional[str] = None
+    domain: Optional[str] = None
+    workers: int = Field(DEFAULT_WORKERS, ge=1, le=32)
+    batch_size: int = Field(DEFAULT_BATCH_SIZE, ge=1, le=1000)
+    per_host_delay: float = Field(DEFAULT_HOST_DELAY, ge=0, le=60)
+
+
+def _get_job_or_404(db: Session, job_id: int) -> ReenrichJob:
+    job = db.query(ReenrichJob).filter(ReenrichJob.id == job_id).first()
+    if not job:
+        logger.error(f"Re-enrichment job {job_id} not found")
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/maintenance/reenrich")
+def start_reenrich(request: ReenrichRequest, db: Session = Depends(get_db)):
+    try:
+        job = create_job(db, request.model_dump())
+        start_job(job.id)
+        return serialize_job(job)
+    except Exception as e:
+        logger.error(f"Error starting re-enrichment job: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to start re-enrichment: {str(e)}")
+
+
+@router.get("/maintenance/reenrich/{job_id}")
+def get_reenrich_job(job_id: int, db: Session = Depends(get_db)):
+    return serialize_job(_get_job_or_404(db, job_id))
+
+
+@router.post("/maintenance/reenrich/{job_id}/resume")
+def resume_reenrich_job(job_id: int, db: Session = Depends(get_db)):
+    job = _get_job_or_404(db, job_id)
+    if job.status == "completed":
+        raise HTTPException(status_code=400, detail="Job already completed")
+    job.status = "pending"
+    job.error = None
+    db.commit()
+    start_job(job.id)
+    logger.info(f"Resuming re-enrichment job {job.id} from bookmark {job.last_bookmark_id}")
+    return serialize_job(job)
+
+
+@router.post("/maintenance/reenrich/{job_id}/cancel")
+def cancel_reenrich_job(job_id: int, db: Session = Depends(get_db)):
+    job = _get_job_or_404(db, job_id)
+    if job.status not in TERMINAL_STATUSES:
+        # A runner in another process sees this after its current batch
+        job.status = "cancelled"
+        job.updated_at = datetime.now()
+        db.commit()
+    cancel_job(job.id)
+    return serialize_job(job)
+
+
+def _load_job(job_id: int) -> Optional[Dict]:
+    session = SessionLocal()
+    try:
+        job = session.query(ReenrichJob).filter(ReenrichJob.id == job_id).first()
+        return serialize_job(job) if job else None
+    finally:
+        session.close()
+
+
+@router.get("/maintenance/reenrich/{job_id}/events")
+def stream_reenrich_progress(job_id: int, request: Request, db: Session = Depends(get_db)):
+    _get_job_or_404(db, job_id)
+
+    async def event_stream():
+        last_payload = None
+        while not await request.is_disconnected():
+            payload = await run_in_threadpool(_load_job, job_id)
+            if payload is None:
+                break
+            if payload != last_payload:
+                yield f"event: progress\ndata: {json.dumps(payload)}\n\n"
+                last_payload = payload
+            if payload["status"] in TERMINAL_STATUSES:
+                yield f"event: done\ndata: {json.dumps(payload)}\n\n"
+                break
+            await asyncio.sleep(SSE_POLL_INTERVAL)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
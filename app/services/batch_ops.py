@@ -0,0 +1,163 @@
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Bookmark
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("update", "add_tags", "remove_tags", "favorite", "unfavorite", "delete")
+UPDATE_FIELDS = ("title", "description", "tags", "is_favorite")
+IN_CLAUSE_CHUNK = 500  # Ids per IN (...) list, well under SQLite's bound-parameter limit
+
+
+class BatchOutcome(NamedTuple):
+    results: List[Dict]  # One entry per (operation, id) in request order
+    changed: Dict[int, bool]  # Updated bookmark id -> whether its tags changed
+    deleted: List[Dict]  # Serialized bookmarks as they were before deletion
+    new_tags: List[str]  # Tags set or added by the batch
+
+
+def _chunks(ids: List[int]) -> Iterable[List[int]]:
+    for start in range(0, len(ids), IN_CLAUSE_CHUNK):
+        yield ids[start:start + IN_CLAUSE_CHUNK]
+
+
+def _split_tags(tags: Optional[str]) -> List[str]:
+    return tags.split(",") if tags else []
+
+
+def _clean_tags(tags: Iterable[str]) -> List[str]:
+    seen = []
+    for tag in tags:
+        tag = tag.strip()
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+def _is_str_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def validate(operations: List[Dict]):
+    """Raise ValueError for a malformed batch before anything is written.
+
+    The route's request model already rejects these with 422; this guards other callers, since
+    a tags string would be split into characters and a non-string title fail mid-transaction.
+    """
+    for index, operation in enumerate(operations):
+        op = operation.get("op")
+        if op not in OPERATIONS:
+            raise ValueError(f"Operation {index}: op must be one of {', '.join(OPERATIONS)}")
+        ids = operation.get("ids")
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ValueError(f"Operation {index}: ids must be a list of integers")
+        if op == "update":
+            fields = operation.get("fields") or {}
+            unknown = sorted(set(fields) - set(UPDATE_FIELDS))
+            if not fields or unknown:
+                raise ValueError(f"Operation {index}: update fields must be among {', '.join(UPDATE_FIELDS)}")
+            for name in ("title", "description"):
+                if fields.get(name) is not None and not isinstance(fields[name], str):
+                    raise ValueError(f"Operation {index}: {name} must be a string")
+            if fields.get("tags") is not None and not _is_str_list(fields["tags"]):
+                raise ValueError(f"Operation {index}: tags must be a list of strings")
+            if fields.get("is_favorite") is not None and not isinstance(fields["is_favorite"], bool):
+                raise ValueError(f"Operation {index}: is_favorite must be true or false")
+        if op in ("add_tags", "remove_tags") and not (operation.get("tags") and _is_str_list(operation["tags"])):
+            raise ValueError(f"Operation {index}: {op} needs a non-empty list of tag strings")
+
+
+def apply_batch(db: Session, operations: List[Dict], serialize: Callable[[Bookmark], Dict]) -> BatchOutcome:
+    """Apply operations in order within the caller's transaction; the caller commits.
+
+    Field and favorite changes are one UPDATE ... WHERE id IN (...) per operation. Tag edits are
+    combined in memory and written with a single executemany UPDATE, and deletes are one DELETE,
+    so the statement count depends on the number of operations rather than bookmarks.
+    """
+    validate(operations)
+    table = Bookmark.__table__
+    all_ids = sorted({bookmark_id for operation in operations for bookmark_id in operation["ids"]})
+    tags: Dict[int, List[str]] = {}
+    for chunk in _chunks(all_ids):
+        for bookmark_id, bookmark_tags in db.execute(select(table.c.id, table.c.tags).where(table.c.id.in_(chunk))):
+            tags[bookmark_id] = _split_tags(bookmark_tags)
+
+    now = datetime.now()
+    results: List[Dict] = []
+    changed: Dict[int, bool] = {}
+    tags_dirty = set()
+    to_delete: List[int] = []
+    deleted_ids = set()
+    new_tags: List[str] = []
+    for index, operation in enumerate(operations):
+        op = operation["op"]
+        live = []
+        for bookmark_id in operation["ids"]:
+            if bookmark_id not in tags or bookmark_id in deleted_ids:
+                results.append({"operation": index, "id": bookmark_id, "status": "not_found"})
+            else:
+                live.append(bookmark_id)
+                results.append({"operation": index, "id": bookmark_id,
+                                "status": "deleted" if op == "delete" else "updated"})
+        if not live:
+            continue
+
+        values = {}
+        if op == "update":
+            fields = dict(operation["fields"])
+            if "tags" in fields:
+                replacement = _clean_tags(fields.pop("tags") or [])
+                new_tags.extend(replacement)
+                for bookmark_id in live:
+                    tags[bookmark_id] = list(replacement)
+                tags_dirty.update(live)
+            values = fields
+        elif op in ("favorite", "unfavorite"):
+            values = {"is_favorite": op == "favorite"}
+        elif op in ("add_tags", "remove_tags"):
+            operand = _clean_tags(operation["tags"])
+            if op == "add_tags":
+                new_tags.extend(operand)
+            for bookmark_id in live:
+                current = tags[bookmark_id]
+                if op == "add_tags":
+                    tags[bookmark_id] = current + [tag for tag in operand if tag not in current]
+                else:
+                    tags[bookmark_id] = [tag for tag in current if tag not in operand]
+            tags_dirty.update(live)
+        elif op == "delete":
+            to_delete.extend(live)
+            deleted_ids.update(live)
+            continue
+
+        if values:
+            for chunk in _chunks(live):
+                db.execute(update(table).where(table.c.id.in_(chunk)).values(**values, updated_at=now))
+        tags_changed = op in ("add_tags", "remove_tags") or (op == "update" and "tags" in operation["fields"])
+        for bookmark_id in live:
+            changed[bookmark_id] = changed.get(bookmark_id, False) or tags_changed
+
+    tag_rows = [
+        {"b_id": bookmark_id, "b_tags": ",".join(tags[bookmark_id]) or None, "b_now": now}
+        for bookmark_id in sorted(tags_dirty - deleted_ids)
+    ]
+    if tag_rows:
+        db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(tags=bindparam("b_tags"), updated_at=bindparam("b_now")),
+            tag_rows,
+        )
+
+    deleted = []
+    for chunk in _chunks(to_delete):
+        deleted.extend(serialize(b) for b in db.query(Bookmark).filter(Bookmark.id.in_(chunk)).populate_existing())
+        db.execute(delete(table).where(table.c.id.in_(chunk)))
+    for bookmark_id in deleted_ids:
+        changed.pop(bookmark_id, None)
+    logger.info("Batch applied %d operations: %d bookmarks updated, %d deleted",
+                len(operations), len(changed), len(deleted))
+    return BatchOutcome(results, changed, deleted, _clean_tags(new_tags))
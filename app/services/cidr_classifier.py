@@ -0,0 +1,227 @@
+import ipaddress
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Union
+
+from app.lazy_imports import lazy_module
+
+logger = logging.getLogger(__name__)
+
+np = lazy_module("numpy")
+
+NETWORK_RANGES_PATH = Path(os.getenv("NETWORK_RANGES_PATH", "app/config/network_ranges.json"))
+RELOAD_CHECK_INTERVAL = 2.0  # Seconds between checks of the ranges file's mtime
+CATEGORIES = ("Local", "VPN", "Loopback", "Link-Local")
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+class NetworkRange(NamedTuple):
+    network: Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+    category: str
+    label: Optional[str]
+
+    @property
+    def tag(self) -> Optional[str]:
+        """User label as a tag, e.g. "office VPN" -> "office-vpn"."""
+        if not self.label:
+            return None
+        return re.sub(r"[^a-z0-9]+", "-", self.label.lower()).strip("-") or None
+
+
+def normalize_ip(address: IPAddress) -> IPAddress:
+    """Treat IPv4-mapped IPv6 addresses (::ffff:a.b.c.d) as the IPv4 address."""
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        return address.ipv4_mapped
+    return address
+
+
+class RadixTrie:
+    """Binary trie over address bits; lookups return the longest matching prefix's value."""
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self._root = [None, None, None]  # [zero child, one child, value]
+
+    def insert(self, network, value):
+        node = self._root
+        address = int(network.network_address)
+        for i in range(network.prefixlen):
+            bit = (address >> (self.bits - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = value
+
+    def lookup(self, address: IPAddress):
+        node = self._root
+        match = node[2]
+        value = int(address)
+        for i in range(self.bits):
+            node = node[(value >> (self.bits - 1 - i)) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                match = node[2]
+        return match
+
+
+class _PrefixTable:
+    """Per-prefix-length sorted network arrays for vectorized longest-prefix matching.
+
+    Addresses are split into two uint64 halves (IPv4 uses only the high half), so each level is
+    a masked searchsorted over machine integers rather than a Python loop per address.
+    """
+
+    def __init__(self, ranges: List[NetworkRange], bits: int):
+        self.bits = bits
+        by_length: Dict[int, List[int]] = {}
+        for index, entry in enumerate(ranges):
+            by_length.setdefault(entry.network.prefixlen, []).append(index)
+        self.levels = []
+        for prefixlen in sorted(by_length, reverse=True):
+            indices = np.asarray(by_length[prefixlen])
+            hi, lo = self.split([int(ranges[i].network.network_address) for i in indices])
+            order = np.lexsort((lo, hi))
+            hi_mask, lo_mask = self.split([self._mask(prefixlen)])
+            unique = len(np.unique(hi)) == len(hi)
+            self.levels.append((hi_mask[0], lo_mask[0], hi[order], lo[order], indices[order], unique))
+
+    def _mask(self, prefixlen: int) -> int:
+        return ((1 << prefixlen) - 1) << (self.bits - prefixlen)
+
+    def split(self, values: List[int]):
+        if self.bits <= 64:
+            return np.asarray(values, dtype=np.uint64), np.zeros(len(values), dtype=np.uint64)
+        low = (1 << 64) - 1
+        return (np.asarray([v >> 64 for v in values], dtype=np.uint64),
+                np.asarray([v & low for v in values], dtype=np.uint64))
+
+    def match(self, hi, lo) -> "np.ndarray":
+        """Index into ranges of the longest match per address, -1 if none."""
+        result = np.full(len(hi), -1, dtype=np.int64)
+        for hi_mask, lo_mask, keys_hi, keys_lo, indices, unique in self.levels:
+            unmatched = result < 0
+            if not unmatched.any():
+                break
+            masked_hi, masked_lo = hi & hi_mask, lo & lo_mask
+            left = np.searchsorted(keys_hi, masked_hi, side="left")
+            if unique:
+                candidate = np.minimum(left, len(keys_hi) - 1)
+                hit = unmatched & (keys_hi[candidate] == masked_hi) & (keys_lo[candidate] == masked_lo)
+                result[hit] = indices[candidate[hit]]
+                continue
+            right = np.searchsorted(keys_hi, masked_hi, side="right")
+            # Networks longer than /64 can share a high half; step through those few candidates
+            for offset in range(int((right - left).max(initial=0))):
+                candidate = np.minimum(left + offset, len(keys_hi) - 1)
+                hit = unmatched & (left + offset < right) & (keys_lo[candidate] == masked_lo)
+                result[hit] = indices[candidate[hit]]
+                unmatched &= ~hit
+        return result
+
+
+class CidrClassifier:
+    """Longest-prefix CIDR matcher for IPv4 and IPv6, loaded from a JSON ranges file.
+
+    More specific ranges win, so a user range like 192.168.1.0/24 labelled "homelab" overrides
+    the generic 192.168.0.0/16 Local range. The file is reloaded when it changes; with
+    path=None, ranges come only from load(config).
+    """
+
+    def __init__(self, path: Optional[Path] = NETWORK_RANGES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._compile([])
+
+    def _compile(self, ranges: List[NetworkRange]):
+        # A later entry for the same network replaces an earlier one
+        ranges = list({entry.network: entry for entry in ranges}.values())
+        tries = {4: RadixTrie(32), 6: RadixTrie(128)}
+        for entry in ranges:
+            tries[entry.network.version].insert(entry.network, entry)
+        by_version = {v: [r for r in ranges if r.network.version == v] for v in (4, 6)}
+        with self._lock:
+            self.ranges = ranges
+            self._tries = tries
+            self._by_version = by_version
+            self._tables = {}  # Built on first batch call
+
+    def load(self, config: Optional[Dict] = None):
+        """Compile ranges from a dict, or from the ranges file."""
+        if config is None:
+            config = json.loads(self.path.read_text())
+        ranges = []
+        for item in config.get("ranges", []):
+            category = item.get("category", "Local")
+            if category not in CATEGORIES:
+                raise ValueError(f"Unknown category {category!r} for {item.get('cidr')}; expected one of {CATEGORIES}")
+            ranges.append(NetworkRange(ipaddress.ip_network(item["cidr"], strict=False), category, item.get("label")))
+        self._compile(ranges)
+        logger.info("Loaded %d network ranges", len(ranges))
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if self.path is None or now < self._next_check:
+            return
+        self._next_check = now + RELOAD_CHECK_INTERVAL
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError as e:
+            if self._mtime is None:
+                logger.warning("Network ranges file %s unavailable: %s", self.path, e)
+                self._mtime = 0
+            return
+        if mtime != self._mtime:
+            try:
+                self.load()
+                self._mtime = mtime
+            except Exception as e:
+                logger.error("Failed to reload network ranges from %s, keeping previous ranges: %s", self.path, e)
+
+    def match(self, address: IPAddress) -> Optional[NetworkRange]:
+        """Most specific configured range containing the address, or None."""
+        self.reload_if_changed()
+        address = normalize_ip(address)
+        return self._tries[address.version].lookup(address)
+
+    def _table(self, version: int):
+        with self._lock:
+            table = self._tables.get(version)
+            if table is None:
+                table = self._tables[version] = _PrefixTable(self._by_version[version], 32 if version == 4 else 128)
+            return table, self._by_version[version]
+
+    def match_many(self, addresses: Iterable[Optional[IPAddress]]) -> List[Optional[NetworkRange]]:
+        """Vectorized match() for many addresses; None entries stay None."""
+        self.reload_if_changed()
+        results: List[Optional[NetworkRange]] = []
+        by_version = {4: ([], []), 6: ([], [])}  # version -> (positions, integer addresses)
+        for position, address in enumerate(addresses):
+            results.append(None)
+            if address is not None:
+                address = normalize_ip(address)
+                positions, values = by_version[address.version]
+                positions.append(position)
+                values.append(int(address))
+        for version, (positions, values) in by_version.items():
+            if not positions:
+                continue
+            table, ranges = self._table(version)
+            if not ranges:
+                continue
+            hi, lo = table.split(values)
+            for position, index in zip(positions, table.match(hi, lo).tolist()):
+                if index >= 0:
+                    results[position] = ranges[index]
+        return results
+
+
+cidr_classifier = CidrClassifier()
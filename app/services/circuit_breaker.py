@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from app.services.metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 3))  # Consecutive failures that open a host
+CIRCUIT_BASE_DELAY = float(os.getenv("CIRCUIT_BASE_DELAY", 30))  # Seconds a host stays open the first time
+CIRCUIT_MAX_DELAY = float(os.getenv("CIRCUIT_MAX_DELAY", 3600))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # circuit_breaker_state gauge values
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a host whose circuit is open."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuit open for {host}; retrying in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def is_failure_status(status: int) -> bool:
+    """Server errors and rate limiting mean the host is unhealthy; other statuses mean it answered."""
+    return status >= 500 or status == 429
+
+
+def _host_answered(error: Exception) -> bool:
+    response = getattr(error, "response", None)  # requests.HTTPError from raise_for_status()
+    status = getattr(response, "status_code", None)
+    return status is not None and not is_failure_status(status)
+
+
+class _HostState:
+    __slots__ = ("state", "failures", "trips", "open_until", "probing")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0  # Times opened since the host last recovered; drives the backoff
+        self.open_until = 0.0
+        self.probing = False
+
+
+class Call:
+    """Handed out by CircuitBreaker.guard; set `status` for responses that do not raise."""
+
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status: Optional[int] = None
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker shared by every outbound fetcher.
+
+    After `threshold` consecutive failures a host opens and calls fail fast with
+    CircuitOpenError. Once the open period passes, one probe is let through (half-open):
+    success closes the circuit, failure reopens it for twice as long, up to `max_delay`.
+    """
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, base_delay: float = CIRCUIT_BASE_DELAY,
+                 max_delay: float = CIRCUIT_MAX_DELAY, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self._hosts: Dict[str, _HostState] = {}  # Only hosts with recent failures
+        self._lock = threading.Lock()
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            entry = self._hosts.get(host.lower())
+            return entry.state if entry else CLOSED
+
+    def _set_state(self, host: str, entry: _HostState, state: str):
+        entry.state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state], host=host)
+
+    def allow(self, host: str) -> bool:
+        """Whether a request to the host may go ahead; claims the probe slot when half-open."""
+        host = host.lower()
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None or entry.state == CLOSED:
+                return True
+            if entry.state == OPEN and self.clock() >= entry.open_until:
+                self._set_state(host, entry, HALF_OPEN)
+            if entry.state == HALF_OPEN and not entry.probing:
+                entry.probing = True
+                return True
+        CIRCUIT_REJECTIONS.inc(host=host)
+        return False
+
+    def retry_in(self, host: str) -> float:
+        with self._lock:
+            entry = self._hosts.get(host.lower())
+            return max(0.0, entry.open_until - self.clock()) if entry else 0.0
+
+    def record_success(self, host: str):
+        host = host.lower()
+        with self._lock:
+            entry = self._hosts.pop(host, None)
+            if entry is not None and entry.state != CLOSED:
+                self._set_state(host, entry, CLOSED)
+                logger.info("Circuit for %s closed", host)
+
+    def record_failure(self, host: str):
+        host = host.lower()
+        with self._lock:
+            entry = self._hosts.setdefault(host, _HostState())
+            if entry.state == OPEN:
+                # A call that started before the circuit opened; the open period already covers it
+                return
+            entry.probing = False
+            entry.failures += 1
+            if entry.state == CLOSED and entry.failures < self.threshold:
+                return
+            # Reopen only when the threshold is crossed or the half-open probe failed
+            delay = min(self.max_delay, self.base_delay * 2 ** entry.trips)
+            entry.trips += 1
+            entry.open_until = self.clock() + delay
+            self._set_state(host, entry, OPEN)
+        logger.warning("Circuit for %s opened for %.0fs after %d consecutive failures", host, delay, entry.failures)
+
+    def _release_probe(self, host: str):
+        with self._lock:
+            entry = self._hosts.get(host.lower())
+            if entry is not None:
+                entry.probing = False
+
+    @contextmanager
+    def guard(self, host: str):
+        """Run one request to `host`, failing fast while its circuit is open.
+
+        Exceptions count as failures unless they carry a response with a healthy status,
+        as raise_for_status() does for a 404.
+        """
+        if not self.allow(host):
+            raise CircuitOpenError(host, self.retry_in(host))
+        call = Call()
+        try:
+            yield call
+        except Exception as e:
+            if _host_answered(e):
+                self.record_success(host)
+            else:
+                self.record_failure(host)
+            raise
+        except BaseException:
+            self._release_probe(host)
+            raise
+        if call.status is not None and is_failure_status(call.status):
+            self.record_failure(host)
+        else:
+            self.record_success(host)
+
+
+circuit_breaker = CircuitBreaker()
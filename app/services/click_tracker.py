@@ -0,0 +1,164 @@
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+
+from app.models import Bookmark, engine
+
+logger = logging.getLogger(__name__)
+
+CLICK_FLUSH_INTERVAL = float(os.getenv("CLICK_FLUSH_INTERVAL", 5))  # Seconds between batched click writes
+CLICK_FLUSH_MAX = int(os.getenv("CLICK_FLUSH_MAX", 1000))  # Buffered bookmarks that trigger an early flush
+FRECENCY_HALF_LIFE_DAYS = float(os.getenv("FRECENCY_HALF_LIFE_DAYS", 30))
+FRECENCY_EPOCH = datetime(2020, 1, 1)
+
+# Decay rate per second: a click is worth half as much after one half-life
+DECAY_RATE = math.log(2) / (FRECENCY_HALF_LIFE_DAYS * 86400)
+
+
+def _logaddexp(a: Optional[float], b: float) -> float:
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def click_weight(when: datetime) -> float:
+    """Log weight of one click, relative to the fixed epoch.
+
+    The decayed score at time t is sum(exp(-DECAY_RATE * (t - t_click))), which factors into
+    exp(-DECAY_RATE * (t - epoch)) * sum(exp(DECAY_RATE * (t_click - epoch))). The first factor
+    is shared by every bookmark, so storing log(sum) keeps ordering correct without ever
+    rewriting old rows, and the frecency column can be indexed.
+    """
+    return DECAY_RATE * (when - FRECENCY_EPOCH).total_seconds()
+
+
+def add_click(frecency: Optional[float], when: datetime) -> float:
+    """Stored frecency after one more click at `when`."""
+    return _logaddexp(frecency, click_weight(when))
+
+
+def frecency_score(frecency: Optional[float], now: Optional[datetime] = None) -> float:
+    """Decayed score at `now`, roughly the number of clicks in the last half-life or so."""
+    if frecency is None:
+        return 0.0
+    now = now or datetime.utcnow()
+    return math.exp(frecency - click_weight(now))
+
+
+class ClickTracker:
+    """Buffers clicks in memory and writes them in one batched UPDATE per flush.
+
+    A burst of clicks on the same bookmark costs one row update instead of a write per click.
+    Each process has its own buffer. Shutdown flushes it, but clicks from the last interval
+    are lost if the process is killed without one (SIGKILL, OOM).
+    """
+
+    def __init__(self, bind=None, interval: float = CLICK_FLUSH_INTERVAL, max_pending: int = CLICK_FLUSH_MAX):
+        self.bind = bind if bind is not None else engine
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        # bookmark id -> (clicks, last click, log-sum of click weights)
+        self._pending: Dict[int, Tuple[int, datetime, float]] = {}
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def record(self, bookmark_id: int, when: Optional[datetime] = None):
+        when = when or datetime.utcnow()
+        with self._lock:
+            clicks, last, weight = self._pending.get(bookmark_id, (0, when, None))
+            self._pending[bookmark_id] = (clicks + 1, max(last, when), add_click(weight, when))
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write buffered clicks; returns the number of bookmarks updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        table = Bookmark.__table__
+        try:
+            with self.bind.begin() as conn:
+                current = dict(conn.execute(
+                    select(table.c.id, table.c.frecency).where(table.c.id.in_(list(pending)))
+                ).all())
+                rows = [
+                    {
+                        "b_id": bookmark_id,
+                        "b_clicks": clicks,
+                        "b_last_used": last,
+                        "b_frecency": _logaddexp(current[bookmark_id], weight),
+                    }
+                    for bookmark_id, (clicks, last, weight) in pending.items()
+                    if bookmark_id in current  # Deleted since the click
+                ]
+                if rows:
+                    conn.execute(
+                        update(table)
+                        .where(table.c.id == bindparam("b_id"))
+                        .values(
+                            click_count=func.coalesce(table.c.click_count, 0) + bindparam("b_clicks"),
+                            last_used=bindparam("b_last_used"),
+                            frecency=bindparam("b_frecency"),
+                            # A click is not an edit; without this onupdate would bump it and the
+                            # embedding sync, metadata refresh and export would see the bookmark as changed
+                            updated_at=table.c.updated_at,
+                        ),
+                        rows,
+                    )
+        except Exception:
+            # Put the clicks back so the next flush retries them
+            with self._lock:
+                for bookmark_id, (clicks, last, weight) in pending.items():
+                    if bookmark_id in self._pending:
+                        more, later, other = self._pending[bookmark_id]
+                        self._pending[bookmark_id] = (clicks + more, max(last, later), _logaddexp(other, weight))
+                    else:
+                        self._pending[bookmark_id] = (clicks, last, weight)
+            raise
+        logger.debug("Flushed clicks for %d bookmarks", len(rows))
+        return len(rows)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Failed to flush clicks: %s", e, exc_info=True)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="click-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write whatever is still buffered."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error("Failed to flush clicks on shutdown: %s", e, exc_info=True)
+
+
+click_tracker = ClickTracker()
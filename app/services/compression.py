@@ -0,0 +1,290 @@
+import gzip
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.services.metrics import COMPRESSION_BYTES
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))  # Smaller bodies gain less than the headers cost
+STATIC_CACHE_DIR = Path(os.getenv("STATIC_CACHE_DIR", "data/static_precompressed"))
+OFFLOAD_SIZE = 256 * 1024  # Larger bodies are compressed in a worker thread instead of on the event loop
+
+# Cheap levels for per-request compression, the slowest ones for files compressed once. gzip -1
+# shrinks a 10k-bookmark list 5x in a third of the time -6 takes for 7x
+DYNAMIC_LEVELS = {"zstd": 3, "br": 4, "gzip": 1}
+STATIC_LEVELS = {"zstd": 19, "br": 11, "gzip": 9}
+# Preferred encoding among those the client accepts equally: zstd is fastest per request,
+# Brotli at its top level gives the smallest files
+DYNAMIC_PREFERENCE = ("zstd", "br", "gzip")
+STATIC_PREFERENCE = ("br", "zstd", "gzip")
+SUFFIXES = {"gzip": ".gz", "br": ".br", "zstd": ".zst"}
+STAMP_SUFFIX = ".source"  # Size and mtime of the file the variants were made from
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+STATIC_EXTENSIONS = {".css", ".js", ".mjs", ".svg", ".html", ".json", ".txt", ".xml", ".map"}
+
+
+@lru_cache(maxsize=None)
+def _optional(module: str):
+    """brotli and zstandard are optional; without them only gzip is offered."""
+    try:
+        return __import__(module)
+    except ImportError:
+        return None
+
+
+def available_encodings() -> List[str]:
+    encodings = ["gzip"]
+    if _optional("brotli") is not None:
+        encodings.append("br")
+    if _optional("zstandard") is not None:
+        encodings.append("zstd")
+    return encodings
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps the output byte-identical for identical input
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == "br":
+        return _optional("brotli").compress(data, quality=level)
+    if encoding == "zstd":
+        return _optional("zstandard").ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unknown encoding {encoding!r}")
+
+
+def negotiate(accept_encoding: Optional[str], preference: Tuple[str, ...] = DYNAMIC_PREFERENCE) -> Optional[str]:
+    """Best available encoding for an Accept-Encoding header, or None to send the body as is.
+
+    The client's q-values decide first; among equally weighted encodings the server's
+    preference wins. "*" covers encodings the header does not name, and q=0 refuses one.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+    available = set(available_encodings())
+    candidates = [
+        (weights.get(encoding, weights.get("*", 0.0)), -rank, encoding)
+        for rank, encoding in enumerate(preference) if encoding in available
+    ]
+    best = max(candidates, default=None)
+    return best[2] if best and best[0] > 0 else None
+
+
+def _compressible(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Compresses dynamic responses (the JSON bookmark lists above all) with gzip, Brotli or zstd.
+
+    Only bodies sent in one piece are compressed; streamed responses such as server-sent
+    events and exports pass through untouched, so nothing is buffered or delayed. Responses
+    that already carry a Content-Encoding (precompressed static files) are left alone.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            passthrough = True
+            headers = MutableHeaders(scope=start_message)
+            if "content-encoding" in headers or not _compressible(headers.get("content-type", "")):
+                await send(start_message)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if encoding is None or message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start_message)
+                await send(message)
+                return
+            if len(body) >= OFFLOAD_SIZE:
+                compressed = await anyio.to_thread.run_sync(compress, body, encoding, DYNAMIC_LEVELS[encoding])
+            else:
+                compressed = compress(body, encoding, DYNAMIC_LEVELS[encoding])
+            COMPRESSION_BYTES.inc(len(body), encoding=encoding, stage="raw")
+            COMPRESSION_BYTES.inc(len(compressed), encoding=encoding, stage="sent")
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            if "etag" in headers and not headers["etag"].startswith("W/"):
+                headers["ETag"] = "W/" + headers["etag"]  # The bytes differ from the uncompressed entity
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _variant_path(cache_dir: Path, relative: str, encoding: str) -> Path:
+    return cache_dir / (relative + SUFFIXES[encoding])
+
+
+def _source_stamp(stat_result: os.stat_result) -> str:
+    # Exact values rather than "variant newer than source": a file restored from a backup or
+    # swapped in by a deploy can be older than its stale variants
+    return f"{stat_result.st_size} {stat_result.st_mtime_ns}"
+
+
+def _read_stamp(path: Path) -> Optional[str]:
+    try:
+        return path.read_text()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def precompress_file(source: Path, relative: str, cache_dir: Path = STATIC_CACHE_DIR) -> int:
+    """Write a compressed copy of `source` for every available encoding that is missing or stale.
+
+    The variants are stale unless the source still has the exact size and mtime recorded when
+    they were written.
+    """
+    if source.suffix.lower() not in STATIC_EXTENSIONS:
+        return 0
+    stat_result = source.stat()
+    if stat_result.st_size < COMPRESSION_MIN_SIZE:
+        return 0
+    stamp = _source_stamp(stat_result)
+    stamp_path = cache_dir / (relative + STAMP_SUFFIX)
+    current = _read_stamp(stamp_path) == stamp
+    data = None
+    written = 0
+    for encoding in available_encodings():
+        variant = _variant_path(cache_dir, relative, encoding)
+        if current and variant.exists():
+            continue
+        if data is None:
+            data = source.read_bytes()
+        _write_atomic(variant, compress(data, encoding, STATIC_LEVELS[encoding]))
+        written += 1
+    if not current:
+        # Written last and from the stat taken before reading, so a change mid-way is caught next time
+        _write_atomic(stamp_path, stamp.encode())
+    return written
+
+
+def precompress_tree(directory: Path, cache_dir: Path = STATIC_CACHE_DIR) -> int:
+    """Precompress every text asset under `directory`; files already up to date are skipped."""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            source = Path(root) / name
+            try:
+                written += precompress_file(source, source.relative_to(directory).as_posix(), cache_dir)
+            except OSError as e:
+                logger.warning("Could not precompress %s: %s", source, e)
+    if written:
+        logger.info("Precompressed %d static file variants into %s", written, cache_dir)
+    return written
+
+
+def precompress_in_background(directory: Path, cache_dir: Path = STATIC_CACHE_DIR) -> threading.Thread:
+    thread = threading.Thread(target=precompress_tree, args=(directory, cache_dir), name="static-precompress", daemon=True)
+    thread.start()
+    return thread
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves a precompressed copy chosen from Accept-Encoding.
+
+    Copies live under STATIC_CACHE_DIR, mirroring the static tree. They are written at startup
+    and, for files added later (generated icons), on the first request, so each file is
+    compressed once per change rather than on every request.
+    """
+
+    def __init__(self, *args, cache_dir: Path = STATIC_CACHE_DIR, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_dir = Path(cache_dir)
+
+    def _relative(self, full_path) -> Optional[str]:
+        try:
+            return Path(full_path).relative_to(Path(self.directory).resolve()).as_posix()
+        except ValueError:
+            return None
+
+    def _prepare(self, path: str):
+        try:
+            full_path, stat_result = self.lookup_path(path)
+        except (OSError, ValueError):
+            return  # get_response turns these into the right error
+        relative = self._relative(Path(full_path).resolve()) if stat_result else None
+        if relative is not None:
+            try:
+                precompress_file(Path(full_path), relative, self.cache_dir)
+            except OSError as e:
+                logger.warning("Could not precompress %s: %s", full_path, e)
+
+    async def get_response(self, path: str, scope):
+        if COMPRESSION_ENABLED and scope["method"] in ("GET", "HEAD") and Path(path).suffix.lower() in STATIC_EXTENSIONS:
+            await anyio.to_thread.run_sync(self._prepare, path)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        relative = self._relative(Path(full_path).resolve())
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), STATIC_PREFERENCE)
+        if not COMPRESSION_ENABLED or relative is None or encoding is None or Path(relative).suffix.lower() not in STATIC_EXTENSIONS:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        variant = _variant_path(self.cache_dir, relative, encoding)
+        try:
+            variant_stat = variant.stat()
+        except FileNotFoundError:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers.add_vary_header("Accept-Encoding")
+            return response
+        response = super().file_response(variant, variant_stat, scope, status_code)
+        if "content-type" in response.headers:  # Not on a 304
+            media_type = mimetypes.guess_type(relative)[0] or "text/plain"
+            response.headers["Content-Type"] = f"{media_type}; charset=utf-8" if media_type.startswith("text/") else media_type
+        response.headers["Content-Encoding"] = encoding
+        response.headers.add_vary_header("Accept-Encoding")
+        return response
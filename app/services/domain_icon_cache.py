@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are serialized within a process only
+    fcntl = None
+
+from app.services.icon_manifest import icon_manifest
+
+logger = logging.getLogger(__name__)
+
+DOMAIN_CACHE_PATH = Path("data/domain_icon_cache.json")
+DOMAIN_ICON_TTL = int(os.getenv("DOMAIN_ICON_TTL", 7 * 24 * 3600))  # Seconds before a domain's icons are refetched
+
+# Icon types that are the same for every page of a domain; og:image is page-specific
+DOMAIN_ICON_TYPES = ("apple-touch-icon", "favicon", "duckduckgo", "google")
+
+
+class DomainIconCache:
+    """Per-domain memo of downloaded icons, persisted to a JSON file and expired by TTL.
+
+    The file is shared by every API and worker process: changes re-read it and merge under a
+    file lock, and reads pick up other processes' writes when its mtime moves.
+    """
+
+    def __init__(self, path: Path = DOMAIN_CACHE_PATH, ttl: int = DOMAIN_ICON_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._loaded_mtime: Optional[int] = None
+        self._loaded = False
+
+    def _load(self):
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._loaded and mtime == self._loaded_mtime:
+            return
+        self._loaded, self._loaded_mtime = True, mtime
+        try:
+            self._entries = json.loads(self.path.read_text()) if mtime is not None else {}
+        except Exception as e:
+            logger.warning(f"Failed to load domain icon cache {self.path}: {e}")
+            self._entries = {}
+
+    @contextmanager
+    def _file_lock(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _update(self, change: Callable[[Dict[str, Dict]], bool]):
+        """Apply `change` to the latest file contents and write them back if it returns True."""
+        try:
+            with self._lock, self._file_lock():
+                self._load()
+                if not change(self._entries):
+                    return
+                fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}-")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp, self.path)
+                self._loaded_mtime = self.path.stat().st_mtime_ns
+        except Exception as e:
+            logger.warning(f"Failed to save domain icon cache {self.path}: {e}")
+
+    def get(self, domain: str) -> Optional[List[Tuple[str, str]]]:
+        """Return cached (icon_type, static_path) pairs for a domain, or None on miss/expiry."""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(domain)
+        if not entry:
+            return None
+        if time.time() - entry.get("fetched_at", 0) > self.ttl:
+            self.invalidate(domain)
+            return None
+        icons = [(icon_type, path) for icon_type, path in entry.get("icons", [])]
+        if not icons or not all(icon_manifest.exists(path) for _, path in icons):
+            self.invalidate(domain)
+            return None
+        return icons
+
+    def put(self, domain: str, icons: List[Tuple[str, str]]):
+        if not icons:
+            return
+        entry = {"icons": [list(icon) for icon in icons], "fetched_at": time.time()}
+        self._update(lambda entries: entries.update({domain: entry}) or True)
+
+    def invalidate(self, domain: str):
+        self._update(lambda entries: entries.pop(domain, None) is not None)
+
+    def evict_expired(self) -> int:
+        """Drop entries past their TTL; get() would skip them anyway, but the file keeps growing."""
+        now = time.time()
+        expired: List[str] = []
+
+        def drop_expired(entries: Dict[str, Dict]) -> bool:
+            expired.extend(domain for domain, entry in entries.items() if now - entry.get("fetched_at", 0) > self.ttl)
+            for domain in expired:
+                del entries[domain]
+            return bool(expired)
+
+        self._update(drop_expired)
+        return len(expired)
+
+    def icon_paths(self) -> Set[str]:
+        """Static paths of every cached icon, so icon garbage collection keeps them."""
+        with self._lock:
+            self._load()
+            return {path for entry in self._entries.values() for _, path in entry.get("icons", [])}
+
+    def clear(self):
+        self._update(lambda entries: entries.clear() or True)
+
+
+domain_icon_cache = DomainIconCache()
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+DOMAIN_RULES_PATH = Path(os.getenv("DOMAIN_RULES_PATH", "app/config/domain_rules.json"))
+RELOAD_CHECK_INTERVAL = 2.0  # Seconds between checks of the rules file's mtime
+HOST_CACHE_SIZE = 10000
+KEYWORD_BOUNDARIES = ".-"  # Keywords must match whole host labels or hyphen-separated words
+
+
+class SuffixTrie:
+    """Host rules keyed by reversed labels, so "github.com" matches github.com and any subdomain."""
+
+    def __init__(self):
+        self._root: Dict = {}
+
+    def add(self, host: str, value: str):
+        node = self._root
+        for label in reversed(host.lower().strip(".").split(".")):
+            node = node.setdefault(label, {})
+        node[None] = value
+
+    def longest_match(self, host: str) -> Optional[str]:
+        """Value of the most specific rule that is the host itself or one of its parent domains."""
+        node = self._root
+        match = None
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            match = node.get(None, match)
+        return match
+
+
+class AhoCorasick:
+    """Multi-keyword matcher: one pass over the host finds every keyword occurrence."""
+
+    def __init__(self, keywords: Dict[str, str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str]]] = [[]]
+        for keyword, value in keywords.items():
+            self._insert(keyword.lower(), value)
+        self._build()
+
+    def _insert(self, keyword: str, value: str):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((keyword, value))
+
+    def _build(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find(self, text: str) -> List[Tuple[int, str, str]]:
+        """All (start, keyword, value) matches in text."""
+        matches = []
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for keyword, value in self._out[state]:
+                matches.append((end - len(keyword) + 1, keyword, value))
+        return matches
+
+
+def normalize_host(url_or_host: str) -> str:
+    """Lower-cased hostname without port, credentials or trailing dot."""
+    if "//" not in url_or_host:
+        url_or_host = "//" + url_or_host
+    return (urlparse(url_or_host).hostname or "").strip(".")
+
+
+class DomainRules:
+    """Classifies hosts into domain types from a JSON rules file, reloading it when it changes.
+
+    Exact host and parent-domain rules ("hosts") take precedence, most specific first; keyword
+    rules ("keywords") then match whole labels or hyphenated words, earliest and longest first.
+    """
+
+    def __init__(self, path: Path = DOMAIN_RULES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._hosts = SuffixTrie()
+        self._keywords = AhoCorasick({})
+        self._classify_host = lru_cache(maxsize=HOST_CACHE_SIZE)(self._match)
+
+    def load(self, rules: Optional[Dict] = None):
+        """Compile rules from a dict, or from the rules file."""
+        if rules is None:
+            rules = json.loads(self.path.read_text())
+        hosts = SuffixTrie()
+        for host, value in rules.get("hosts", {}).items():
+            hosts.add(host, value)
+        keywords = AhoCorasick(rules.get("keywords", {}))
+        with self._lock:
+            self._hosts, self._keywords = hosts, keywords
+            self._classify_host.cache_clear()
+        logger.info("Loaded %d host and %d keyword domain rules",
+                    len(rules.get("hosts", {})), len(rules.get("keywords", {})))
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + RELOAD_CHECK_INTERVAL
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError as e:
+            if self._mtime is None:
+                logger.warning("Domain rules file %s unavailable: %s", self.path, e)
+                self._mtime = 0
+            return
+        if mtime != self._mtime:
+            try:
+                self.load()
+                self._mtime = mtime
+            except Exception as e:
+                logger.error("Failed to reload domain rules from %s, keeping previous rules: %s", self.path, e)
+
+    def _match(self, host: str) -> Optional[str]:
+        value = self._hosts.longest_match(host)
+        if value is not None:
+            return value
+        best = None
+        for start, keyword, keyword_value in self._keywords.find(host):
+            end = start + len(keyword)
+            if start > 0 and host[start - 1] not in KEYWORD_BOUNDARIES:
+                continue
+            if end < len(host) and host[end] not in KEYWORD_BOUNDARIES:
+                continue
+            if best is None or (start, -len(keyword)) < (best[0], -len(best[1])):
+                best = (start, keyword, keyword_value)
+        return best[2] if best else None
+
+    def classify(self, url_or_host: str) -> Optional[str]:
+        """Domain type for a URL or host, or None if no rule matches."""
+        self.reload_if_changed()
+        host = normalize_host(url_or_host or "")
+        return self._classify_host(host) if host else None
+
+    def classify_many(self, urls: Iterable[str]) -> List[Optional[str]]:
+        """Domain types for many URLs; each distinct host is matched once."""
+        self.reload_if_changed()
+        results = {}
+        classified = []
+        for url in urls:
+            host = normalize_host(url or "")
+            if host not in results:
+                results[host] = self._classify_host(host) if host else None
+            classified.append(results[host])
+        return classified
+
+
+domain_rules = DomainRules()
@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.lazy_imports import lazy_module
+from app.models import Bookmark
+
+np = lazy_module("numpy")
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+DEFAULT_MAX_DISTANCE = 3  # Differing bits for two pages to count as near-duplicates
+MIN_TOKENS = 4  # Shorter texts ("Home", "Login") collide by accident
+_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def _tokens(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1]
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of words and word pairs; similar texts differ in few bits."""
+    return _simhash_tokens(_tokens(text))
+
+
+def _simhash_tokens(tokens: List[str]) -> int:
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not features:
+        return 0
+    digests = b"".join(hashlib.blake2b(feature.encode(), digest_size=8).digest() for feature in features)
+    # One row of 64 bits per feature, bit i of the little-endian hash in column i
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0) * 2 > len(features)
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _bands(value: int, count: int) -> Iterable[Tuple[int, int]]:
+    width = SIMHASH_BITS // count
+    mask = (1 << width) - 1
+    for band in range(count):
+        # The last band takes any leftover bits
+        bits = value >> (band * width) if band == count - 1 else value >> (band * width) & mask
+        yield band, bits
+
+
+def near_duplicate_pairs(hashes: Dict[int, int], max_distance: int = DEFAULT_MAX_DISTANCE) -> List[Tuple[int, int, int]]:
+    """(id, id, distance) for ids whose hashes differ in at most max_distance bits.
+
+    Banded LSH: with max_distance + 1 bands, two hashes within the distance agree exactly on
+    at least one band (pigeonhole), so only ids sharing a band bucket are compared. Ids with
+    identical hashes are grouped first so repeated boilerplate costs one comparison.
+    """
+    by_hash: Dict[int, List[int]] = defaultdict(list)
+    for bookmark_id, value in hashes.items():
+        by_hash[value].append(bookmark_id)
+    pairs = []
+    for ids in by_hash.values():
+        pairs.extend((ids[0], other, 0) for other in ids[1:])
+
+    band_count = min(max_distance + 1, SIMHASH_BITS)
+    buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for value in by_hash:
+        for key in _bands(value, band_count):
+            buckets[key].append(value)
+    seen = set()
+    for values in buckets.values():
+        for i, a in enumerate(values):
+            for b in values[i + 1:]:
+                if (a, b) in seen:
+                    continue
+                seen.add((a, b))
+                distance = hamming(a, b)
+                if distance <= max_distance:
+                    pairs.append((by_hash[a][0], by_hash[b][0], distance))
+    return pairs
+
+
+def _groups(pairs: Iterable[Tuple[int, int, int]]) -> List[Tuple[List[int], int]]:
+    """Connected components of the pairs (union-find), each with its largest pair distance."""
+    parent: Dict[int, int] = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    pairs = list(pairs)
+    for a, b, _ in pairs:
+        parent[find(a)] = find(b)
+    members: Dict[int, List[int]] = defaultdict(list)
+    for x in list(parent):
+        members[find(x)].append(x)
+    distance: Dict[int, int] = defaultdict(int)
+    for a, _, d in pairs:
+        root = find(a)
+        distance[root] = max(distance[root], d)
+    return [(sorted(ids), distance[root]) for root, ids in members.items()]
+
+
+def _summaries(db: Session, ids: Iterable[int]) -> Dict[int, Dict]:
+    ids = list(ids)
+    rows = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        for b in db.query(Bookmark.id, Bookmark.url, Bookmark.canonical_url, Bookmark.canonical_hint,
+                          Bookmark.title).filter(Bookmark.id.in_(chunk)):
+            rows[b.id] = {"id": b.id, "url": b.url, "canonical_url": b.canonical_url,
+                          "canonical_hint": b.canonical_hint, "title": b.title}
+    return rows
+
+
+def _grouped(db: Session, key, shared, limit: int) -> Tuple[List[str], Dict[str, List[int]]]:
+    """Values of `key` for which the `shared` condition holds, most bookmarks first, and their bookmark ids."""
+    table = Bookmark.__table__
+    urls = [
+        url for (url,) in db.execute(
+            select(key)
+            .where(table.c.canonical_url.is_not(None))
+            .group_by(key)
+            .having(shared)
+            .order_by(func.count().desc())
+            .limit(limit)
+        )
+    ]
+    members: Dict[str, List[int]] = defaultdict(list)
+    for chunk_start in range(0, len(urls), 500):
+        chunk = urls[chunk_start:chunk_start + 500]
+        for bookmark_id, url in db.execute(select(table.c.id, key).where(key.in_(chunk)).order_by(table.c.id)):
+            members[url].append(bookmark_id)
+    return urls, members
+
+
+def find_duplicates(db: Session, max_distance: int = DEFAULT_MAX_DISTANCE, limit: int = 100) -> Dict:
+    """Exact duplicates share a canonical URL; hinted ones were redirected or rel=canonical'd to the
+    same page; near duplicates have similar title and description."""
+    table = Bookmark.__table__
+    exact_urls, exact_members = _grouped(db, table.c.canonical_url, func.count() > 1, limit)
+    # Bookmarks of different pages whose fetch pointed at the same one, or at another bookmark's page
+    hinted_urls, hinted_members = _grouped(
+        db, func.coalesce(table.c.canonical_hint, table.c.canonical_url),
+        func.count(func.distinct(table.c.canonical_url)) > 1, limit,
+    )
+
+    hashes: Dict[int, int] = {}
+    canonical: Dict[int, str] = {}
+    rows = db.execute(
+        select(table.c.id, table.c.canonical_url, table.c.title, table.c.description)
+        .execution_options(stream_results=True, yield_per=5000)
+    )
+    for bookmark_id, canonical_url, title, description in rows:
+        tokens = _tokens(f"{title or ''} {description or ''}")
+        if len(tokens) >= MIN_TOKENS:
+            hashes[bookmark_id] = _simhash_tokens(tokens)
+            canonical[bookmark_id] = canonical_url
+    near = [
+        (ids, distance) for ids, distance in _groups(near_duplicate_pairs(hashes, max_distance))
+        if len({canonical[i] for i in ids}) > 1  # Same canonical URL is already an exact duplicate
+    ]
+    near.sort(key=lambda group: (-len(group[0]), group[1]))
+    near = near[:limit]
+
+    summaries = _summaries(db, {i for ids in exact_members.values() for i in ids}
+                           | {i for ids in hinted_members.values() for i in ids} | {i for ids, _ in near for i in ids})
+    logger.info("Found %d exact and %d near-duplicate groups among %d bookmarks", len(exact_members), len(near), len(hashes))
+    return {
+        "exact": [
+            {"canonical_url": url, "bookmarks": [summaries[i] for i in exact_members[url]]} for url in exact_urls
+        ],
+        "hinted": [
+            {"canonical_url": url, "bookmarks": [summaries[i] for i in hinted_members[url]]} for url in hinted_urls
+        ],
+        "near": [
+            {"max_distance": distance, "bookmarks": [summaries[i] for i in ids]} for ids, distance in near
+        ],
+    }
@@ -0,0 +1,395 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from app.lazy_imports import lazy_module
+from app.services import text_ml
+
+logger = logging.getLogger(__name__)
+
+np = lazy_module("numpy")
+# Only needed when EMBEDDING_MODEL_PATH is set, so not preloaded at startup
+torch = lazy_module("torch", preload=False)
+transformers = lazy_module("transformers", preload=False)
+
+EMBEDDING_DIR = Path("data/embeddings")
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH")  # Local sentence-embedding model directory
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_SYNC_INTERVAL = float(os.getenv("EMBEDDING_SYNC_INTERVAL", 10))  # Seconds between index updates on the leader
+HASHING_DIM = 384
+INITIAL_CAPACITY = 1024
+SCAN_CHUNK_ROWS = 65536  # Rows upcast from float16 per dot-product chunk
+# Upcasting float16 dominates search time; keep a float32 copy in RAM (~150 MB per 100k x 384)
+EMBEDDING_FLOAT32_CACHE = os.getenv("EMBEDDING_FLOAT32_CACHE", "1").lower() in ("1", "true", "yes")
+
+
+def bookmark_text(title: Optional[str], description: Optional[str], tags, url: Optional[str]) -> str:
+    """Text that represents a bookmark for embedding."""
+    if isinstance(tags, str):
+        tags = tags.split(",") if tags else []
+    domain = urlparse(url or "").netloc
+    return " ".join(part for part in (title, description, " ".join(tags or []), domain) if part)
+
+
+def with_page_text(items: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """Append the start of each bookmark's saved page text, for bookmarks with a snapshot."""
+    from app.services.snapshots import snapshot_store
+
+    try:
+        excerpts = snapshot_store.excerpts([bookmark_id for bookmark_id, _ in items])
+    except Exception as e:
+        logger.warning("Failed to read page snapshots for embedding: %s", e)
+        return items
+    return [(bookmark_id, f"{text} {excerpts[bookmark_id]}" if bookmark_id in excerpts else text) for bookmark_id, text in items]
+
+
+class HashingEncoder:
+    """Dependency-light fallback: L2-normalised hashed word and bigram counts."""
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+        self._vectorizer = None
+
+    def encode(self, texts: Sequence[str]):
+        if self._vectorizer is None:
+            self._vectorizer = text_ml.hashing_vectorizer(
+                n_features=self.dim, ngram_range=(1, 2), stop_words="english", norm="l2"
+            )
+        return self._vectorizer.transform(list(texts)).toarray().astype(np.float32)
+
+
+class TransformerEncoder:
+    """Mean-pooled sentence embeddings from a locally stored transformers model, on CPU."""
+
+    def __init__(self, model_path: str, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        self.model = transformers.AutoModel.from_pretrained(model_path, local_files_only=True).eval()
+        self.batch_size = batch_size
+        self.dim = self.model.config.hidden_size
+        self.name = f"transformer:{Path(model_path).name}-{self.dim}"
+
+    def encode(self, texts: Sequence[str]):
+        batches = []
+        with torch.no_grad():
+            for start in range(0, len(texts), self.batch_size):
+                batch = list(texts[start:start + self.batch_size])
+                tokens = self.tokenizer(batch, padding=True, truncation=True, max_length=256, return_tensors="pt")
+                hidden = self.model(**tokens).last_hidden_state
+                mask = tokens["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+                batches.append(torch.nn.functional.normalize(pooled, dim=1).numpy())
+        if not batches:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.concatenate(batches).astype(np.float32)
+
+
+def get_encoder():
+    """Use the local transformer model when configured and loadable, else the hashing fallback."""
+    if EMBEDDING_MODEL_PATH and Path(EMBEDDING_MODEL_PATH).is_dir():
+        try:
+            return TransformerEncoder(EMBEDDING_MODEL_PATH)
+        except Exception as e:
+            logger.warning("Failed to load embedding model %s, using hashing encoder: %s", EMBEDDING_MODEL_PATH, e)
+    return HashingEncoder()
+
+
+class EmbeddingIndex:
+    """Per-bookmark vectors in a memory-mapped float16 matrix plus a JSON id map.
+
+    Rows freed by deletes are reused; the matrix doubles in capacity when full. Top-k is an
+    exact dot product over the matrix (vectors are L2-normalised, so this is cosine similarity).
+
+    Every process maps the same files, but only one writes them: the writable instance
+    (see `EmbeddingUpdater.sync`, run by the scheduler leader). The others map the matrix
+    read-only and reload it whenever the writer has saved a newer id map.
+    """
+
+    def __init__(self, directory: Path = EMBEDDING_DIR, encoder_factory=get_encoder,
+                 float32_cache: bool = EMBEDDING_FLOAT32_CACHE, writable: bool = False):
+        self.directory = directory
+        self.encoder_factory = encoder_factory
+        self.float32_cache = float32_cache
+        self.writable = writable
+        self._cache = None  # float32 copy of the used rows, built on first search
+        self.encoder = None
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._meta_version = None  # (mtime, inode, size) of the id map this process has loaded
+        self._rows: Dict[int, int] = {}
+        self._stamps: Optional[Dict[int, str]] = {}  # bookmark id -> updated_at it was embedded at
+        self._free: List[int] = []
+        self._size = 0  # High-water mark of used rows
+        self._row_ids = None  # row -> bookmark id, -1 for free rows
+
+    @property
+    def _matrix_path(self) -> Path:
+        return self.directory / "vectors.f16"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / "index.json"
+
+    def _current_version(self) -> Optional[Tuple[int, int, int]]:
+        # The id map is replaced (new inode) on every save; mtime alone can repeat within a clock tick
+        try:
+            stat = self._meta_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+    def _ensure_loaded(self):
+        if self._matrix is not None:
+            if self._current_version() == self._meta_version:
+                return
+            # Another process saved the index since we mapped it
+            self._matrix, self._cache = None, None
+        if self.encoder is None:
+            self.encoder = self.encoder_factory()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        version = self._current_version()
+        meta = None
+        try:
+            if version is not None and self._matrix_path.exists():
+                meta = json.loads(self._meta_path.read_text())
+        except Exception as e:
+            logger.warning("Failed to read embedding index %s: %s", self._meta_path, e)
+        if meta and meta.get("model") == self.encoder.name and meta.get("dim") == self.encoder.dim:
+            self._matrix = np.memmap(
+                self._matrix_path, dtype=np.float16, mode="r+" if self.writable else "r",
+                shape=(meta["capacity"], self.encoder.dim),
+            )
+            self._rows = {int(k): v for k, v in meta["rows"].items()}
+            stamps = meta.get("stamps")
+            self._stamps = None if stamps is None else {int(k): v for k, v in stamps.items()}
+            self._free = meta.get("free", [])
+            self._size = meta["size"]
+            self._meta_version = version
+        elif self.writable:
+            if meta:
+                logger.info("Embedding model changed (%s -> %s); rebuilding index", meta.get("model"), self.encoder.name)
+            self._matrix = np.memmap(
+                self._matrix_path, dtype=np.float16, mode="w+", shape=(INITIAL_CAPACITY, self.encoder.dim)
+            )
+            self._rows, self._stamps, self._free, self._size = {}, {}, [], 0
+            self._save_meta()
+        else:
+            # Nothing written for this model yet; search finds nothing until the writer has built it
+            self._matrix = np.zeros((0, self.encoder.dim), dtype=np.float16)
+            self._rows, self._stamps, self._free, self._size = {}, {}, [], 0
+            self._meta_version = version
+        self._row_ids = np.full(self._matrix.shape[0], -1, dtype=np.int64)
+        for bookmark_id, row in self._rows.items():
+            self._row_ids[row] = bookmark_id
+
+    def open_for_writing(self):
+        """Make this process the index's writer; only the scheduler leader should call this."""
+        with self._lock:
+            if not self.writable:
+                self.writable = True
+                self._matrix, self._cache = None, None
+
+    def _check_writable(self):
+        if not self.writable:
+            raise RuntimeError("This process has the embedding index open read-only; the scheduler leader writes it")
+
+    def _save_meta(self):
+        meta = {
+            "model": self.encoder.name,
+            "dim": self.encoder.dim,
+            "capacity": self._matrix.shape[0],
+            "size": self._size,
+            "rows": self._rows,
+            "stamps": self._stamps,
+            "free": self._free,
+        }
+        temp_path = self._meta_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(meta))
+        temp_path.replace(self._meta_path)
+        self._meta_version = self._current_version()
+
+    def _grow(self):
+        capacity = self._matrix.shape[0] * 2
+        temp_path = self._matrix_path.with_suffix(".tmp")
+        grown = np.memmap(temp_path, dtype=np.float16, mode="w+", shape=(capacity, self.encoder.dim))
+        grown[: self._size] = self._matrix[: self._size]
+        grown.flush()
+        del grown
+        self._matrix = None  # Release the old mapping before replacing its file
+        temp_path.replace(self._matrix_path)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float16, mode="r+", shape=(capacity, self.encoder.dim))
+        row_ids = np.full(capacity, -1, dtype=np.int64)
+        row_ids[: len(self._row_ids)] = self._row_ids
+        self._row_ids = row_ids
+        self._cache = None
+
+    def _allocate_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._size >= self._matrix.shape[0]:
+            self._grow()
+        self._size += 1
+        return self._size - 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._rows)
+
+    def __contains__(self, bookmark_id: int) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            return bookmark_id in self._rows
+
+    def encode(self, texts: Sequence[str]):
+        with self._lock:
+            self._ensure_loaded()
+        return self.encoder.encode(texts)
+
+    def upsert(self, items: Iterable[Tuple[int, str]], stamps: Optional[Dict[int, str]] = None):
+        """Embed and store (bookmark_id, text) pairs, replacing existing vectors."""
+        items = list(items)
+        if not items:
+            return
+        self.upsert_vectors([bookmark_id for bookmark_id, _ in items], self.encode([text for _, text in items]), stamps)
+
+    def upsert_vectors(self, bookmark_ids: Sequence[int], vectors, stamps: Optional[Dict[int, str]] = None):
+        """Store precomputed L2-normalised vectors, with the bookmark version each was computed from."""
+        with self._lock:
+            self._check_writable()
+            self._ensure_loaded()
+            if self._stamps is None:
+                self._stamps = {}
+            for bookmark_id, vector in zip(bookmark_ids, vectors):
+                row = self._rows.get(bookmark_id)
+                if row is None:
+                    row = self._allocate_row()
+                    self._rows[bookmark_id] = row
+                    self._row_ids[row] = bookmark_id
+                self._matrix[row] = vector
+                if self._cache is not None:
+                    self._cache[row] = vector
+                self._stamps[bookmark_id] = (stamps or {}).get(bookmark_id, "")
+            self._matrix.flush()
+            self._save_meta()
+
+    def changes(self, current: Dict[int, str]) -> Tuple[List[int], List[int]]:
+        """Compare with {bookmark_id: version}: ids to (re)embed and ids to remove."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._stamps is None:
+                # Written before versions were kept; take the vectors there are as current
+                self._stamps = {bookmark_id: current[bookmark_id] for bookmark_id in self._rows if bookmark_id in current}
+            stale = [bookmark_id for bookmark_id, stamp in current.items()
+                     if bookmark_id not in self._rows or self._stamps.get(bookmark_id) != stamp]
+            removed = [bookmark_id for bookmark_id in self._rows if bookmark_id not in current]
+        return stale, removed
+
+    def remove(self, bookmark_ids: Iterable[int]):
+        with self._lock:
+            self._check_writable()
+            self._ensure_loaded()
+            removed = False
+            for bookmark_id in bookmark_ids:
+                row = self._rows.pop(bookmark_id, None)
+                if self._stamps is not None:
+                    self._stamps.pop(bookmark_id, None)
+                if row is not None:
+                    self._matrix[row] = 0
+                    if self._cache is not None:
+                        self._cache[row] = 0
+                    self._row_ids[row] = -1
+                    self._free.append(row)
+                    removed = True
+            if removed:
+                self._matrix.flush()
+                self._save_meta()
+
+    def vector(self, bookmark_id: int):
+        with self._lock:
+            self._ensure_loaded()
+            row = self._rows.get(bookmark_id)
+            return None if row is None else np.asarray(self._matrix[row], dtype=np.float32)
+
+    def search(self, query_vector, k: int = 10, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Top-k (bookmark_id, score) by dot product with an L2-normalised query vector."""
+        with self._lock:
+            self._ensure_loaded()
+            size = self._size
+            matrix = self._matrix
+            if self.float32_cache:
+                if self._cache is None:
+                    self._cache = np.zeros(matrix.shape, dtype=np.float32)
+                    self._cache[:size] = matrix[:size]
+                matrix = self._cache
+            row_ids = self._row_ids[:size].copy()
+            excluded_rows = [self._rows[b] for b in exclude if b in self._rows]
+        if size == 0 or k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = np.empty(size, dtype=np.float32)
+        for start in range(0, size, SCAN_CHUNK_ROWS):
+            end = min(start + SCAN_CHUNK_ROWS, size)
+            scores[start:end] = np.asarray(matrix[start:end], dtype=np.float32) @ query
+        scores[row_ids < 0] = -np.inf
+        scores[[row for row in excluded_rows if row < size]] = -np.inf
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row_ids[row]), float(scores[row])) for row in top if np.isfinite(scores[row])]
+
+    def query(self, text: str, k: int = 10) -> List[Tuple[int, float]]:
+        return self.search(self.encode([text])[0], k)
+
+    def similar(self, bookmark_id: int, k: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """Bookmarks most similar to an indexed one, or None if it has no vector yet."""
+        vector = self.vector(bookmark_id)
+        if vector is None:
+            return None
+        return self.search(vector, k, exclude=(bookmark_id,))
+
+
+class EmbeddingUpdater:
+    """Keeps the index in step with the bookmarks table, embedding changed bookmarks in batches.
+
+    Bookmarks change in whichever process served the request, so instead of listening for
+    events the updater compares each bookmark's updated_at with the version its vector was
+    computed from. It runs as a scheduler job on the leader, which makes the leader the
+    index's only writer.
+    """
+
+    def __init__(self, index: EmbeddingIndex, batch_size: int = EMBEDDING_BATCH_SIZE, session_factory=None):
+        self.index = index
+        self.batch_size = batch_size
+        self.session_factory = session_factory
+
+    def sync(self) -> int:
+        """Embed new and changed bookmarks and drop deleted ones; returns how many changed."""
+        from app.models import Bookmark, SessionLocal
+
+        self.index.open_for_writing()
+        db = (self.session_factory or SessionLocal)()
+        try:
+            current = {
+                bookmark_id: updated_at.isoformat() if updated_at else ""
+                for bookmark_id, updated_at in db.query(Bookmark.id, Bookmark.updated_at)
+            }
+            stale, removed = self.index.changes(current)
+            self.index.remove(removed)
+            for start in range(0, len(stale), self.batch_size):
+                chunk = db.query(Bookmark).filter(Bookmark.id.in_(stale[start:start + self.batch_size])).all()
+                items = [(b.id, bookmark_text(b.title, b.description, b.tags, b.url)) for b in chunk]
+                self.index.upsert(with_page_text(items), stamps={b.id: current[b.id] for b in chunk})
+        finally:
+            db.close()
+        if stale or removed:
+            logger.info("Embedding index updated: %d embedded, %d removed", len(stale), len(removed))
+        return len(stale) + len(removed)
+
+
+embedding_index = EmbeddingIndex()
+embedding_updater = EmbeddingUpdater(embedding_index)
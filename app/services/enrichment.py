@@ -0,0 +1,281 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from sqlalchemy import and_, exists, or_, select, update
+
+from app.models import Bookmark, EnrichmentJob, SessionLocal, engine
+from app.services.event_bus import event_bus, publish_bookmark_event, METADATA_READY
+from app.services.icon_manifest import icon_manifest
+from app.services.job_queue import DONE, FAILED, QUEUED, RUNNING, job_queue
+from app.services.metadata_fetcher import fetch_metadata_combined, DEFAULT_FAVICON
+from app.services.page_status import is_page_online
+from app.services.reenrich import REENRICH_BOOKMARK, apply_metadata
+from app.services.snapshots import snapshot_store
+from app.services.url_canonical import canonical_hint, canonicalize
+
+logger = logging.getLogger(__name__)
+
+ENRICH_BOOKMARK = "enrich_bookmark"
+CHECK_LINK = "check_link"
+RELAY_POLL_INTERVAL = float(os.getenv("ENRICHMENT_EVENT_POLL", 1.0))
+RELAY_MAX_POLL_INTERVAL = float(os.getenv("ENRICHMENT_EVENT_MAX_POLL", 10.0))  # Idle polls back off up to this
+ENRICHMENT_SWEEP_INTERVAL = int(os.getenv("ENRICHMENT_SWEEP_INTERVAL", 300))  # Seconds between sweeps
+ENRICHMENT_SWEEP_BATCH = int(os.getenv("ENRICHMENT_SWEEP_BATCH", 200))  # Bookmarks queued per sweep at most
+LINK_CHECK_INTERVAL = int(os.getenv("LINK_CHECK_INTERVAL", 3600))  # Seconds between link check sweeps; 0 disables
+LINK_CHECK_BATCH = int(os.getenv("LINK_CHECK_BATCH", 100))  # Least recently checked bookmarks queued per sweep
+RELAY_OVERLAP = timedelta(seconds=30)  # Rereads recent jobs in case a slow commit lands behind the cursor
+PLACEHOLDER_TITLES = ("No title", "Reused bookmark")
+
+
+class EnrichmentError(Exception):
+    """The page could not be fetched; the job is retried with backoff."""
+
+
+def enrich_bookmark(job: Dict):
+    """Fetch a bookmark's page and store its icons, missing title and description, and snapshot.
+
+    Runs in a worker. It is safe to run twice for the same bookmark, since a job whose worker
+    died is handed to another one.
+    """
+    db = SessionLocal()
+    try:
+        bookmark = db.query(Bookmark).filter(Bookmark.id == job["bookmark_id"]).first()
+        if bookmark is None:
+            logger.info("Bookmark %s was deleted before enrichment", job["bookmark_id"])
+            return
+        url = bookmark.url
+        metadata = fetch_metadata_combined(url)
+        if "error" in metadata:
+            raise EnrichmentError(metadata["error"])
+        db.refresh(bookmark)
+        if bookmark.url != url:
+            logger.info("Bookmark %s changed URL during enrichment; its new job will fetch it", bookmark.id)
+            return
+        icon_candidates = [str(ic) for ic in metadata.get("icon_candidates", []) if icon_manifest.exists(str(ic))]
+        if bookmark.webicon not in icon_candidates:
+            bookmark.webicon = metadata.get("webicon") or DEFAULT_FAVICON
+        # A bookmark without candidates is fetched again from the list endpoints, so fall back to its icon
+        bookmark.icon_candidates = ",".join(icon_candidates) if icon_candidates else bookmark.webicon
+        title = metadata.get("title")
+        if not bookmark.title and title and title not in PLACEHOLDER_TITLES:
+            bookmark.title = title
+        if not bookmark.description and metadata.get("description"):
+            bookmark.description = metadata["description"]
+        # A redirect or rel=canonical pointing at a page we already have shows up in /duplicates;
+        # canonical_url stays the bookmark's own, so it never turns into a 409 or a shared snapshot
+        bookmark.canonical_hint = canonical_hint(url, metadata.get("canonical_url"))
+        bookmark.link_online, bookmark.link_checked_at = True, datetime.utcnow()  # It just answered
+        bookmark.updated_at = datetime.now()
+        db.commit()
+        if metadata.get("snapshot"):
+            snapshot_store.save_fetched(db, bookmark.canonical_url or canonicalize(url), url, metadata["snapshot"])
+        logger.info("Enriched bookmark %s with %d icon candidates", bookmark.id, len(icon_candidates))
+    finally:
+        db.close()
+
+
+def record_link_status(bind, bookmark_id: int, online: bool) -> bool:
+    """Store a link check; the job event relay in each API process turns changes into events."""
+    table = Bookmark.__table__
+    with bind.begin() as conn:
+        return conn.execute(
+            update(table)
+            .where(table.c.id == bookmark_id)
+            # A check is not an edit, so updated_at stays put
+            .values(link_online=online, link_checked_at=datetime.utcnow(), updated_at=table.c.updated_at)
+        ).rowcount == 1
+
+
+def check_link(job: Dict):
+    """Check whether a bookmark's page is online. Runs in a worker."""
+    db = SessionLocal()
+    try:
+        url = db.execute(select(Bookmark.url).where(Bookmark.id == job["bookmark_id"])).scalar_one_or_none()
+    finally:
+        db.close()
+    if url is None:
+        return
+    record_link_status(engine, job["bookmark_id"], is_page_online(url))
+
+
+def reenrich_bookmark(job: Dict):
+    """Refresh a bookmark picked by a re-enrichment job, overwriting its title, description and icons.
+
+    Runs in a worker; the job's runner (app/services/reenrich.py) counts the outcome.
+    """
+    db = SessionLocal()
+    try:
+        bookmark = db.query(Bookmark).filter(Bookmark.id == job["bookmark_id"]).first()
+        if bookmark is None:
+            logger.info("Bookmark %s was deleted before re-enrichment", job["bookmark_id"])
+            return
+        url = bookmark.url
+        metadata = fetch_metadata_combined(url)
+        if "error" in metadata:
+            raise EnrichmentError(metadata["error"])
+        db.refresh(bookmark)
+        if bookmark.url != url:
+            logger.info("Bookmark %s changed URL during re-enrichment; its enrichment job will fetch it", bookmark.id)
+            return
+        apply_metadata(bookmark, metadata)
+        bookmark.link_online, bookmark.link_checked_at = True, datetime.utcnow()
+        db.commit()
+        if metadata.get("snapshot"):
+            snapshot_store.save_fetched(db, bookmark.canonical_url or canonicalize(url), url, metadata["snapshot"])
+    finally:
+        db.close()
+
+
+HANDLERS: Dict[str, Callable[[Dict], None]] = {
+    ENRICH_BOOKMARK: enrich_bookmark,
+    CHECK_LINK: check_link,
+    REENRICH_BOOKMARK: reenrich_bookmark,
+}
+
+
+def enqueue_enrichment(db, bookmark_ids: List[int], skip_failed: bool = False) -> List[int]:
+    return job_queue.enqueue_many(db, ENRICH_BOOKMARK, bookmark_ids, skip_failed=skip_failed)
+
+
+def sweep_unenriched(limit: int = ENRICHMENT_SWEEP_BATCH) -> int:
+    """Queue enrichment for up to `limit` bookmarks that never got icon candidates; returns how many.
+
+    Bookmarks with a pending job, or whose last one failed for good, are skipped in the query
+    itself, so a batch of hopeless pages cannot hold back the rest.
+    """
+    jobs = EnrichmentJob.__table__
+    db = SessionLocal()
+    try:
+        ids = [
+            row[0] for row in db.query(Bookmark.id).filter(
+                or_(Bookmark.icon_candidates.is_(None), Bookmark.icon_candidates == ""),
+                ~exists().where(and_(
+                    jobs.c.bookmark_id == Bookmark.id,
+                    jobs.c.kind == ENRICH_BOOKMARK,
+                    jobs.c.status.in_([QUEUED, RUNNING, FAILED]),
+                )),
+            ).order_by(Bookmark.id).limit(limit)
+        ]
+        return len(enqueue_enrichment(db, ids, skip_failed=True))
+    finally:
+        db.close()
+
+
+def sweep_link_checks(limit: int = LINK_CHECK_BATCH) -> int:
+    """Queue link checks for the `limit` bookmarks checked longest ago (never-checked first); returns how many."""
+    db = SessionLocal()
+    try:
+        ids = [
+            row[0] for row in db.query(Bookmark.id)
+            .order_by(Bookmark.link_checked_at.asc().nulls_first(), Bookmark.id).limit(limit)
+        ]
+        return len(job_queue.enqueue_many(db, CHECK_LINK, ids))
+    finally:
+        db.close()
+
+
+class JobEventRelay:
+    """Publishes events for jobs that workers finished, so this process's clients see the results.
+
+    Workers may run in other processes, where the in-process event bus does not reach, so every
+    API process polls the queue for newly finished jobs instead. It only polls while it has SSE
+    subscribers, and backs off from poll_interval to max_poll_interval while nothing finishes.
+    The icon manifest learns about icons the workers wrote the same way, or from its refresh job.
+    """
+
+    def __init__(self, poll_interval: float = RELAY_POLL_INTERVAL, bind=engine, clock=datetime.utcnow,
+                 max_poll_interval: float = RELAY_MAX_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(max_poll_interval, poll_interval)
+        self.bind = bind
+        self.clock = clock
+        self.cursor = clock()
+        self.link_cursor = self.cursor
+        self._seen: "OrderedDict[int, datetime]" = OrderedDict()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def poll(self) -> int:
+        """Publish events for jobs finished and link status changes since the last poll; returns how many."""
+        return self._poll_jobs() + self._poll_link_status()
+
+    def _poll_link_status(self) -> int:
+        table = Bookmark.__table__
+        with self.bind.connect() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.url, table.c.link_online, table.c.link_checked_at)
+                .where(table.c.link_checked_at > self.link_cursor - RELAY_OVERLAP)
+                .order_by(table.c.link_checked_at)
+            ).all()
+        if rows:
+            self.link_cursor = max(self.link_cursor, rows[-1].link_checked_at)
+        # The bus remembers the last status per bookmark, so rows reread in the overlap publish nothing
+        return sum(event_bus.record_link_status(row.id, row.url, bool(row.link_online)) for row in rows)
+
+    def _poll_jobs(self) -> int:
+        table = EnrichmentJob.__table__
+        with self.bind.connect() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.bookmark_id, table.c.finished_at)
+                .where(table.c.status == DONE, table.c.kind.in_([ENRICH_BOOKMARK, REENRICH_BOOKMARK]),
+                       table.c.finished_at > self.cursor - RELAY_OVERLAP)
+                .order_by(table.c.finished_at)
+            ).all()
+        fresh = [row for row in rows if row.id not in self._seen]
+        if not fresh:
+            return 0
+        for row in fresh:
+            self._seen[row.id] = row.finished_at
+        self.cursor = max(self.cursor, fresh[-1].finished_at)
+        while self._seen and next(iter(self._seen.values())) < self.cursor - RELAY_OVERLAP:
+            self._seen.popitem(last=False)
+        db = SessionLocal()
+        try:
+            ids = {row.bookmark_id for row in fresh}
+            for bookmark in db.query(Bookmark).filter(Bookmark.id.in_(ids)):
+                for icon in (bookmark.icon_candidates or "").split(","):
+                    if icon.startswith("/static/icons/") and not icon_manifest.exists(icon):
+                        icon_manifest.add(Path("app") / icon.lstrip("/"))
+                publish_bookmark_event(METADATA_READY, bookmark)
+        finally:
+            db.close()
+        return len(fresh)
+
+    def next_interval(self, current: float) -> float:
+        """Poll once and return how long to wait before the next poll."""
+        if not event_bus.has_subscribers():
+            # Nobody to tell; skip what finishes meanwhile instead of replaying it to a later client
+            self.cursor = self.link_cursor = max(self.cursor, self.link_cursor, self.clock())
+            return self.poll_interval
+        try:
+            published = self.poll()
+        except Exception as e:
+            logger.warning("Job event relay poll failed: %s", e)
+            published = 0
+        return self.poll_interval if published else min(current * 2, self.max_poll_interval)
+
+    def _run(self):
+        interval = self.poll_interval
+        while not self._stopped.wait(interval):
+            interval = self.next_interval(interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="job-event-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+job_event_relay = JobEventRelay()
@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Event types pushed to clients
+METADATA_READY = "metadata_ready"
+ICON_UPDATED = "icon_updated"
+LINK_STATUS_CHANGED = "link_status_changed"
+CATEGORY_CHANGED = "category_changed"
+BOOKMARK_DELETED = "bookmark_deleted"
+
+MAX_QUEUE_SIZE = 1000  # Per subscriber; slow clients drop events instead of blocking workers
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUE_SIZE)
+
+    def _put(self, event: Dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping event for slow subscriber")
+
+
+class EventBus:
+    """In-process pub/sub that lets worker threads push events to async SSE subscribers."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._link_status: Dict[int, bool] = {}
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def has_subscribers(self) -> bool:
+        with self._lock:
+            return bool(self._subscribers)
+
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """Register an in-process callback run on the publishing thread; it must return quickly."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Dict], None]):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def publish(self, event_type: str, bookmark_id: Optional[int] = None, **data):
+        """Publish an event; safe to call from any thread."""
+        event = {"id": next(self._ids), "type": event_type, "bookmark_id": bookmark_id, "data": data}
+        with self._lock:
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning("Event listener failed for %s: %s", event_type, e)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # Event loop already closed; the subscriber is gone
+                self.unsubscribe(subscription)
+
+    def record_link_status(self, bookmark_id: int, url: str, online: bool) -> bool:
+        """Publish a link status event only when the status differs from the last one seen; True if it did."""
+        with self._lock:
+            previous = self._link_status.get(bookmark_id)
+            self._link_status[bookmark_id] = online
+        if previous is online:
+            return False
+        self.publish(LINK_STATUS_CHANGED, bookmark_id, url=url, online=online)
+        return True
+
+
+def _as_list(value) -> List[str]:
+    if isinstance(value, list):
+        return value
+    return value.split(",") if isinstance(value, str) and value else []
+
+
+def publish_bookmark_event(event_type: str, bookmark):
+    """Push a bookmark's current fields so clients can patch a single card."""
+    event_bus.publish(
+        event_type,
+        bookmark.id,
+        url=bookmark.url,
+        title=bookmark.title or "",
+        description=bookmark.description or "",
+        webicon=bookmark.webicon or "/static/favicon.ico",
+        icon_candidates=_as_list(bookmark.icon_candidates),
+        tags=_as_list(bookmark.tags),
+        is_favorite=bool(bookmark.is_favorite),
+    )
+
+
+def format_sse(event: Dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+event_bus = EventBus()
@@ -0,0 +1,183 @@
+import csv
+import html
+import io
+import json
+import logging
+import zlib
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.models import Bookmark, engine
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000  # Rows read per query; each page is its own short read
+CHUNK_SIZE = 64 * 1024  # Bytes buffered before a chunk is sent
+
+FORMATS = {
+    "html": ("text/html; charset=utf-8", "html"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+COMPRESSIONS = {
+    "gzip": ("application/gzip", "gz"),
+    "zstd": ("application/zstd", "zst"),
+}
+CSV_COLUMNS = [
+    "id", "url", "title", "description", "tags", "is_favorite", "webicon",
+    "created_at", "updated_at", "last_used", "click_count",
+]
+
+_COLUMNS = [getattr(Bookmark.__table__.c, name) for name in CSV_COLUMNS]
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _unix(value) -> str:
+    return str(int(value.timestamp())) if value else ""
+
+
+def iter_batches(bind=None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[list]:
+    """Lists of bookmark rows in id order, paged by keyset (`id > last`).
+
+    Each page is read on its own connection, which is returned before the batch is yielded:
+    on SQLite an open read transaction blocks writers, so a slow client downloading a large
+    export must not hold one for the whole response. Plain Core tuples are used instead of
+    ORM objects so nothing accumulates in an identity map, and each renderer formats a whole
+    batch per yielded string.
+    """
+    bind = bind if bind is not None else engine
+    id_column = Bookmark.__table__.c.id
+    last_id = None
+    while True:
+        query = select(*_COLUMNS).order_by(id_column).limit(batch_size)
+        if last_id is not None:
+            query = query.where(id_column > last_id)
+        with bind.connect() as conn:
+            batch = conn.execute(query).all()
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1].id
+
+
+def render_html(batches: Iterable[list]) -> Iterator[str]:
+    """Netscape bookmark file, as read by browsers' "Import bookmarks" dialogs."""
+    escape = html.escape
+    yield (
+        "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+        '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+        "<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n"
+    )
+    for batch in batches:
+        lines = []
+        for _, url, title, description, tags, _, _, created_at, updated_at, last_used, _ in batch:
+            attrs = f'HREF="{escape(url or "")}" ADD_DATE="{_unix(created_at)}"'
+            if updated_at:
+                attrs += f' LAST_MODIFIED="{_unix(updated_at)}"'
+            if last_used:
+                attrs += f' LAST_VISIT="{_unix(last_used)}"'
+            if tags:
+                attrs += f' TAGS="{escape(tags)}"'
+            lines.append(f"    <DT><A {attrs}>{escape(title or url or '')}</A>\n")
+            if description:
+                lines.append(f"    <DD>{escape(description)}\n")
+        yield "".join(lines)
+    yield "</DL><p>\n"
+
+
+def render_jsonl(batches: Iterable[list]) -> Iterator[str]:
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for batch in batches:
+        yield "".join(
+            dumps({
+                "id": bookmark_id,
+                "url": url,
+                "title": title,
+                "description": description,
+                "tags": tags.split(",") if tags else [],
+                "is_favorite": bool(is_favorite),
+                "webicon": webicon,
+                "created_at": _isoformat(created_at),
+                "updated_at": _isoformat(updated_at),
+                "last_used": _isoformat(last_used),
+                "click_count": click_count or 0,
+            }) + "\n"
+            for (bookmark_id, url, title, description, tags, is_favorite, webicon,
+                 created_at, updated_at, last_used, click_count) in batch
+        )
+
+
+def render_csv(batches: Iterable[list]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for batch in batches:
+        writer.writerows(
+            (bookmark_id, url, title, description, tags, int(bool(is_favorite)), webicon,
+             _isoformat(created_at), _isoformat(updated_at), _isoformat(last_used), click_count or 0)
+            for (bookmark_id, url, title, description, tags, is_favorite, webicon,
+                 created_at, updated_at, last_used, click_count) in batch
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+RENDERERS = {"html": render_html, "jsonl": render_jsonl, "csv": render_csv}
+
+
+def _compressor(compression: Optional[str]) -> Optional[Tuple[Callable, Callable]]:
+    """(compress, flush) pair for streaming compression, or None for plain output."""
+    if compression is None:
+        return None
+    if compression == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+        return compressor.compress, compressor.flush
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression requires the optional zstandard package")
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        return compressor.compress, compressor.flush
+    raise ValueError(f"Unknown compression {compression!r}")
+
+
+def export_stream(fmt: str, compression: Optional[str] = None, bind=None) -> Iterator[bytes]:
+    """Encoded (and optionally compressed) export in chunks of about CHUNK_SIZE bytes.
+
+    Raises ValueError up front for an unknown format or unavailable compression, before any
+    rows are read.
+    """
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    codec = _compressor(compression)
+    return _chunks(RENDERERS[fmt](iter_batches(bind)), codec)
+
+
+def _chunks(pieces: Iterable[str], codec) -> Iterator[bytes]:
+    pending = []
+    size = 0
+    for piece in pieces:
+        data = piece.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            chunk = b"".join(pending)
+            pending, size = [], 0
+            if codec is not None:
+                chunk = codec[0](chunk)
+            if chunk:
+                yield chunk
+    tail = b"".join(pending)
+    if codec is not None:
+        tail = codec[0](tail) + codec[1]()
+    if tail:
+        yield tail
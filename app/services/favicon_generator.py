@@ -4,11 +4,14 @@ import requests
 import logging
 from urllib.parse import urlparse, urlunparse
 from typing import Optional
-from PIL import Image, ImageDraw
+from app.lazy_imports import lazy_module
+from app.services.icon_manifest import icon_manifest
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+Image = lazy_module("PIL.Image")
+ImageDraw = lazy_module("PIL.ImageDraw")
+
 ICON_DIR = Path("app/static/icons")
 DEFAULT_FAVICON = "/static/favicon.ico"
 MAX_ICON_SIZE = 1 * 1024 * 1024  # 1MB
@@ -95,6 +98,7 @@ def download_and_validate_icon(icon_url: str, local_path: Path, referer: str, sc
                 except Exception as e:
                     logger.warning(f"PIL could not verify image {local_path}: {e} (keeping file anyway)")
             # For .ico, .svg, etc., just keep the file
+            icon_manifest.add(local_path)
             return f"/static/icons/{local_path.name}"
         else:
             logger.warning(f"Downloaded icon is empty or missing: {local_path}")
@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = Path("app")
+STATIC_DIR = APP_DIR / "static"
+# Directories whose immediate subdirectories (one per domain) hold icons
+ICON_ROOTS = (STATIC_DIR / "icons", STATIC_DIR / "recycled_icons")
+SNAPSHOT_PATH = Path("data/icon_manifest.json")
+
+
+def _dir_key(directory: Path) -> str:
+    return directory.as_posix()
+
+
+def _static_to_fs(static_path: str) -> Path:
+    return APP_DIR / static_path.split("?")[0].lstrip("/")
+
+
+def _fs_to_static(fs_path: Path) -> str:
+    return "/" + fs_path.relative_to(APP_DIR).as_posix()
+
+
+class IconManifest:
+    """In-memory index of icon files answering existence and size lookups without stat calls.
+
+    Kept current by the code paths that write, move or delete icons. A JSON snapshot lets a
+    restart skip rescanning; only directories whose mtime changed since the snapshot are rescanned.
+    Other processes (API workers, enrichment workers) write and delete icons too, so a miss is
+    checked against the filesystem before it is reported, and `refresh` periodically rescans
+    directories whose mtime changed. Callers only ask whether an icon exists and is non-empty; a
+    file overwritten in place keeps its directory's mtime, so its cached size may be stale, but
+    a cached size of 0 is always rechecked.
+    """
+
+    def __init__(self, roots=ICON_ROOTS, snapshot_path: Path = SNAPSHOT_PATH):
+        self.roots = tuple(roots)
+        self.snapshot_path = snapshot_path
+        # directory key -> {"mtime": float, "files": {filename: size}}
+        self._dirs: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dirty = False
+
+    def _tracked_dirs(self) -> List[Path]:
+        dirs = [STATIC_DIR]
+        for root in self.roots:
+            dirs.append(root)
+            if root.is_dir():
+                dirs.extend(Path(entry.path) for entry in os.scandir(root) if entry.is_dir())
+        return dirs
+
+    def _scan_dir(self, directory: Path):
+        files = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        files[entry.name] = entry.stat().st_size
+            mtime = directory.stat().st_mtime
+        except FileNotFoundError:
+            self._dirs.pop(_dir_key(directory), None)
+            return
+        self._dirs[_dir_key(directory)] = {"mtime": mtime, "files": files}
+        self._dirty = True
+
+    def _rescan_changed(self) -> int:
+        current = set()
+        rescanned = 0
+        for directory in self._tracked_dirs():
+            key = _dir_key(directory)
+            current.add(key)
+            entry = self._dirs.get(key)
+            try:
+                mtime = directory.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if entry is None or entry.get("mtime") != mtime:
+                self._scan_dir(directory)
+                rescanned += 1
+        for key in set(self._dirs) - current:
+            del self._dirs[key]
+            self._dirty = True
+        return rescanned
+
+    def load(self):
+        """Load the snapshot and rescan only directories that changed since it was written."""
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                if self.snapshot_path.exists():
+                    self._dirs = json.loads(self.snapshot_path.read_text()).get("dirs", {})
+            except Exception as e:
+                logger.warning("Failed to load icon manifest snapshot %s: %s", self.snapshot_path, e)
+                self._dirs = {}
+            rescanned = self._rescan_changed()
+            self._loaded = True
+            logger.info("Icon manifest loaded: %d directories, %d rescanned", len(self._dirs), rescanned)
+
+    def refresh(self) -> int:
+        """Rescan directories changed since they were indexed, e.g. by another process; returns how many."""
+        with self._lock:
+            if not self._loaded:
+                self.load()
+                return 0
+            rescanned = self._rescan_changed()
+        if rescanned:
+            logger.info("Icon manifest refreshed %d changed directories", rescanned)
+        return rescanned
+
+    def _entry(self, directory: Path) -> Optional[Dict]:
+        if not self._loaded:
+            self.load()
+        return self._dirs.get(_dir_key(directory))
+
+    def size(self, static_path: str) -> Optional[int]:
+        """Size in bytes of the file behind a /static path, or None if it does not exist."""
+        if not static_path:
+            return None
+        fs_path = _static_to_fs(static_path)
+        with self._lock:
+            entry = self._entry(fs_path.parent)
+            if entry is not None:
+                size = entry["files"].get(fs_path.name)
+                if size:
+                    return size
+        # Unknown here (another process may have written it), empty, or not an indexed directory
+        # such as /static/css: ask the filesystem
+        try:
+            size = fs_path.stat().st_size if fs_path.is_file() else None
+        except OSError:
+            size = None
+        if entry is not None:
+            with self._lock:
+                files = entry["files"]
+                if size is not None:
+                    self._dirty = self._dirty or files.get(fs_path.name) != size
+                    files[fs_path.name] = size
+                elif files.pop(fs_path.name, None) is not None:
+                    self._dirty = True
+        return size
+
+    def exists(self, static_path: str) -> bool:
+        return self.size(static_path) is not None
+
+    def list_dir(self, directory: Path) -> List[str]:
+        """Static paths of the files in an indexed directory."""
+        with self._lock:
+            entry = self._entry(directory)
+            if entry is None:
+                return []
+            return [_fs_to_static(directory / name) for name in sorted(entry["files"])]
+
+    def ensure_dir(self, directory: Path):
+        """Create a directory once; later calls are answered from the index."""
+        with self._lock:
+            if self._entry(directory) is not None:
+                return
+            directory.mkdir(parents=True, exist_ok=True)
+            self._dirs[_dir_key(directory)] = {"mtime": directory.stat().st_mtime, "files": {}}
+            self._dirty = True
+
+    def add(self, fs_path: Path, size: Optional[int] = None):
+        """Record a file that was just written."""
+        fs_path = Path(fs_path)
+        if size is None:
+            try:
+                size = fs_path.stat().st_size
+            except OSError:
+                self.remove(fs_path)
+                return
+        with self._lock:
+            entry = self._entry(fs_path.parent)
+            if entry is None:
+                # First write into a directory we have not indexed yet; index all of it
+                self._scan_dir(fs_path.parent)
+                entry = self._dirs.get(_dir_key(fs_path.parent))
+                if entry is None:
+                    return
+            entry["files"][fs_path.name] = size
+            entry["mtime"] = self._mtime(fs_path.parent)
+            self._dirty = True
+
+    def remove(self, fs_path: Path):
+        """Record a file that was just deleted."""
+        fs_path = Path(fs_path)
+        with self._lock:
+            entry = self._entry(fs_path.parent)
+            if entry is not None and entry["files"].pop(fs_path.name, None) is not None:
+                entry["mtime"] = self._mtime(fs_path.parent)
+                self._dirty = True
+
+    def move(self, src: Path, dest: Path):
+        """Record a file that was just moved."""
+        size = self.size(_fs_to_static(Path(src)))
+        self.remove(src)
+        self.add(dest, size)
+
+    @staticmethod
+    def _mtime(directory: Path) -> float:
+        try:
+            return directory.stat().st_mtime
+        except OSError:
+            return 0
+
+    def save(self):
+        """Persist a snapshot so the next startup can skip unchanged directories."""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = self.snapshot_path.with_suffix(".tmp")
+                temp_path.write_text(json.dumps({"dirs": self._dirs}))
+                temp_path.replace(self.snapshot_path)
+                self._dirty = False
+            except Exception as e:
+                logger.warning("Failed to save icon manifest snapshot %s: %s", self.snapshot_path, e)
+
+    def start_watching(self) -> bool:
+        """Keep the manifest current for changes made outside the app, if watchdog is installed."""
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            logger.info("watchdog not installed; icon manifest relies on in-app updates only")
+            return False
+
+        manifest = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                path = Path(os.path.relpath(event.src_path))
+                with manifest._lock:
+                    manifest._scan_dir(path if event.is_directory else path.parent)
+
+        observer = Observer()
+        for root in self.roots:
+            root.mkdir(parents=True, exist_ok=True)
+            observer.schedule(_Handler(), str(root), recursive=True)
+        observer.daemon = True
+        observer.start()
+        logger.info("Watching icon directories for external changes")
+        return True
+
+
+icon_manifest = IconManifest()
@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import EnrichmentJob, WorkerPresence, engine
+
+logger = logging.getLogger(__name__)
+
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", 120))  # Seconds a silent worker keeps a job
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", 30))  # Doubles per attempt
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", 3600))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", 7))  # Finished jobs are pruned after this
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+CLAIM_CANDIDATES = 10  # Rows read per claim attempt; workers racing for the same row try the next one
+
+
+def retry_delay(attempts: int, base: float = JOB_RETRY_BASE_DELAY, cap: float = JOB_RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter, so failing jobs do not retry in lockstep."""
+    return random.uniform(0.5, 1.0) * min(cap, base * 2 ** max(attempts - 1, 0))
+
+
+class JobQueue:
+    """Database-backed job queue with leases, heartbeats and a visibility timeout.
+
+    A worker claims a job with a conditional UPDATE, so two workers never get the same one, on
+    SQLite or Postgres. The claim lasts JOB_VISIBILITY_TIMEOUT seconds and heartbeats extend
+    it; if the worker dies, the lease runs out and another worker picks the job up again.
+    Failures are retried with exponential backoff until max_attempts.
+    """
+
+    def __init__(self, bind=engine, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, clock=datetime.utcnow):
+        self.bind = bind
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.clock = clock
+
+    def enqueue(self, db: Session, kind: str, bookmark_id: Optional[int] = None, payload: Optional[Dict] = None) -> bool:
+        """Queue one job unless the same kind is already queued or running for the bookmark. Commits."""
+        if bookmark_id is None:
+            self._add(db, kind, None, payload)
+            db.commit()
+            return True
+        return bool(self.enqueue_many(db, kind, [bookmark_id], payload))
+
+    def enqueue_many(self, db: Session, kind: str, bookmark_ids: List[int], payload: Optional[Dict] = None,
+                     skip_failed: bool = False, group_key: Optional[str] = None,
+                     run_after: Optional[Dict[int, datetime]] = None) -> List[int]:
+        """Queue a job per bookmark in one round trip; returns the ids that were queued. Commits.
+
+        Bookmarks with a queued or running job of this kind are skipped, and with `skip_failed`
+        so are those whose last job failed for good, until it is pruned. `run_after` delays the
+        jobs of some bookmarks; `group_key` lets group_counts follow the batch.
+        """
+        if not bookmark_ids:
+            return []
+        statuses = [QUEUED, RUNNING, FAILED] if skip_failed else [QUEUED, RUNNING]
+        pending = {
+            row[0] for row in db.query(EnrichmentJob.bookmark_id).filter(
+                EnrichmentJob.kind == kind,
+                EnrichmentJob.bookmark_id.in_(bookmark_ids),
+                EnrichmentJob.status.in_(statuses),
+            )
+        }
+        queued = [bookmark_id for bookmark_id in dict.fromkeys(bookmark_ids) if bookmark_id not in pending]
+        for bookmark_id in queued:
+            self._add(db, kind, bookmark_id, payload, group_key, (run_after or {}).get(bookmark_id))
+        if queued:
+            db.commit()
+            logger.info("Queued %d %s jobs", len(queued), kind)
+        return queued
+
+    def _add(self, db: Session, kind: str, bookmark_id: Optional[int], payload: Optional[Dict],
+             group_key: Optional[str] = None, run_after: Optional[datetime] = None):
+        now = self.clock()
+        db.add(EnrichmentJob(
+            kind=kind,
+            group_key=group_key,
+            bookmark_id=bookmark_id,
+            payload=json.dumps(payload) if payload else None,
+            status=QUEUED,
+            attempts=0,
+            max_attempts=self.max_attempts,
+            run_after=max(run_after, now) if run_after else now,
+            created_at=now,
+        ))
+
+    def _claimable(self, table, now: datetime):
+        return or_(
+            and_(table.c.status == QUEUED, table.c.run_after <= now),
+            and_(table.c.status == RUNNING, table.c.lease_expires_at < now),  # Its worker stopped heartbeating
+        )
+
+    def claim(self, worker_id: str, kinds: Optional[List[str]] = None) -> Optional[Dict]:
+        """Lease the next due job to `worker_id`; None when nothing is due."""
+        table = EnrichmentJob.__table__
+        now = self.clock()
+        with self.bind.begin() as conn:
+            self._fail_exhausted(conn, table, now)
+            query = select(table.c.id).where(self._claimable(table, now))
+            if kinds:
+                query = query.where(table.c.kind.in_(kinds))
+            candidates = conn.execute(query.order_by(table.c.run_after, table.c.id).limit(CLAIM_CANDIDATES)).scalars().all()
+            for job_id in candidates:
+                claimed = conn.execute(
+                    update(table)
+                    .where(table.c.id == job_id, self._claimable(table, now))
+                    .values(status=RUNNING, locked_by=worker_id, attempts=table.c.attempts + 1,
+                            lease_expires_at=now + timedelta(seconds=self.visibility_timeout))
+                ).rowcount
+                if claimed:
+                    row = conn.execute(select(table).where(table.c.id == job_id)).mappings().first()
+                    job = dict(row)
+                    job["payload"] = json.loads(job["payload"]) if job["payload"] else {}
+                    return job
+        return None
+
+    def _fail_exhausted(self, conn, table, now: datetime):
+        # A job whose worker died on its last attempt is not handed out again
+        conn.execute(
+            update(table)
+            .where(table.c.status == RUNNING, table.c.lease_expires_at < now, table.c.attempts >= table.c.max_attempts)
+            .values(status=FAILED, locked_by=None, finished_at=now,
+                    last_error=func.coalesce(table.c.last_error, "Lease expired on the last attempt"))
+        )
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """Extend the lease; False if the job is no longer this worker's (it timed out and was reclaimed)."""
+        table = EnrichmentJob.__table__
+        with self.bind.begin() as conn:
+            return conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.locked_by == worker_id, table.c.status == RUNNING)
+                .values(lease_expires_at=self.clock() + timedelta(seconds=self.visibility_timeout))
+            ).rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str) -> bool:
+        table = EnrichmentJob.__table__
+        with self.bind.begin() as conn:
+            return conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.locked_by == worker_id, table.c.status == RUNNING)
+                .values(status=DONE, locked_by=None, lease_expires_at=None, finished_at=self.clock())
+            ).rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> Optional[str]:
+        """Record a failed attempt: requeue with backoff, or fail for good after max_attempts. Returns the new status."""
+        table = EnrichmentJob.__table__
+        now = self.clock()
+        with self.bind.begin() as conn:
+            row = conn.execute(
+                select(table.c.attempts, table.c.max_attempts)
+                .where(table.c.id == job_id, table.c.locked_by == worker_id, table.c.status == RUNNING)
+            ).first()
+            if row is None:
+                return None  # Lease lost; the job is someone else's now
+            attempts, max_attempts = row
+            if attempts >= max_attempts:
+                values = {"status": FAILED, "finished_at": now}
+            else:
+                values = {"status": QUEUED, "run_after": now + timedelta(seconds=retry_delay(attempts))}
+            conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.locked_by == worker_id)
+                .values(locked_by=None, lease_expires_at=None, last_error=error[:2000], **values)
+            )
+        return values["status"]
+
+    def stats(self) -> Dict:
+        table = EnrichmentJob.__table__
+        now = self.clock()
+        with self.bind.connect() as conn:
+            counts = dict(conn.execute(select(table.c.status, func.count()).group_by(table.c.status)).all())
+            oldest = conn.execute(
+                select(func.min(table.c.run_after)).where(table.c.status == QUEUED, table.c.run_after <= now)
+            ).scalar()
+        return {
+            "counts": {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)},
+            "oldest_due_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0,
+        }
+
+    def group_counts(self, group_key: str) -> Dict[str, int]:
+        """Jobs of a group by status."""
+        table = EnrichmentJob.__table__
+        with self.bind.connect() as conn:
+            counts = dict(conn.execute(
+                select(table.c.status, func.count()).where(table.c.group_key == group_key).group_by(table.c.status)
+            ).all())
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+    def cancel_group(self, group_key: str) -> int:
+        """Drop a group's jobs that have not started; running ones finish."""
+        table = EnrichmentJob.__table__
+        with self.bind.begin() as conn:
+            return conn.execute(delete(table).where(table.c.group_key == group_key, table.c.status == QUEUED)).rowcount
+
+    def announce_worker(self, worker_id: str):
+        """Record that a standalone worker is alive for one more visibility timeout."""
+        table = WorkerPresence.__table__
+        expires_at = self.clock() + timedelta(seconds=self.visibility_timeout)
+        with self.bind.begin() as conn:
+            if conn.execute(update(table).where(table.c.worker_id == worker_id).values(expires_at=expires_at)).rowcount == 0:
+                conn.execute(insert(table).values(worker_id=worker_id, expires_at=expires_at))
+
+    def withdraw_worker(self, worker_id: str):
+        table = WorkerPresence.__table__
+        with self.bind.begin() as conn:
+            conn.execute(delete(table).where(table.c.worker_id == worker_id))
+
+    def standalone_workers(self) -> int:
+        """How many standalone workers announced themselves and have not gone silent."""
+        table = WorkerPresence.__table__
+        with self.bind.connect() as conn:
+            return conn.execute(select(func.count()).where(table.c.expires_at > self.clock())).scalar_one()
+
+    def prune(self, retention_days: float = JOB_RETENTION_DAYS) -> int:
+        """Delete finished jobs older than the retention period, and workers that stopped announcing themselves."""
+        table = EnrichmentJob.__table__
+        now = self.clock()
+        cutoff = now - timedelta(days=retention_days)
+        with self.bind.begin() as conn:
+            presence = WorkerPresence.__table__
+            conn.execute(delete(presence).where(presence.c.expires_at < now))
+            removed = conn.execute(
+                delete(table).where(table.c.status.in_([DONE, FAILED]), table.c.finished_at < cutoff)
+            ).rowcount
+        if removed:
+            logger.info("Pruned %d finished jobs", removed)
+        return removed
+
+
+job_queue = JobQueue()
@@ -1,6 +1,7 @@
 import os
 from fastapi import UploadFile
 from app.services.favicon_generator import ICON_DIR
+from app.services.icon_manifest import icon_manifest
 
 def save_manual_icon(bookmark_id: int, file: UploadFile) -> str:
     """
@@ -12,11 +13,12 @@ def save_manual_icon(bookmark_id: int, file: UploadFile) -> str:
     ext = _ext_val.lower() or ".png"
 
     filename = f"manual_{bookmark_id}{ext}"
-    ICON_DIR.mkdir(parents=True, exist_ok=True)
+    icon_manifest.ensure_dir(ICON_DIR)
     file_path = ICON_DIR / filename
     try:
         with open(file_path, "wb") as f:
             f.write(file.file.read()) # file.file is a SpooledTemporaryFile
     finally:
         file.file.close() # Ensure the spooled temporary file is closed
+    icon_manifest.add(file_path)
     return f"/static/icons/{filename}"
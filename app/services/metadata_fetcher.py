@@ -1,11 +1,4 @@
-import shutil
 import requests
-import cloudscraper
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.firefox.options import Options
-from PIL import Image
 from urllib.parse import urlparse, urljoin, urlunparse
 from pathlib import Path
 import os
@@ -15,17 +8,26 @@ import logging
 from functools import lru_cache
 from typing import Optional, Dict, List
 import time
-import magic
 import hashlib
+from app.lazy_imports import lazy_module
+from app.services.domain_icon_cache import domain_icon_cache, DOMAIN_ICON_TYPES
+from app.services.metrics import stage_timer, record_cache, record_outbound
+from app.services.circuit_breaker import CircuitOpenError, circuit_breaker
+from app.services.url_canonical import normalize_case, resolve_canonical
+from app.services.icon_manifest import icon_manifest
+from app.services.snapshots import snapshot_store
 
-logging.basicConfig(
-    level=logging.INFO,
-    filename="uvicorn.log",
-    filemode="a",
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger(__name__)
 
+# Heavy scraping/imaging dependencies are imported on first use, not at app startup
+cloudscraper = lazy_module("cloudscraper")
+bs4 = lazy_module("bs4")
+webdriver = lazy_module("selenium.webdriver")
+firefox_service = lazy_module("selenium.webdriver.firefox.service")
+firefox_options = lazy_module("selenium.webdriver.firefox.options")
+Image = lazy_module("PIL.Image")
+magic = lazy_module("magic")
+
 BASE_ICON_DIR = Path("app/static/icons")
 DEFAULT_FAVICON = "/static/favicon.ico"
 MAX_ICON_SIZE = 1 * 1024 * 1024  # 1MB
@@ -64,7 +66,7 @@ def resize_image(local_path: Path):
             if img.size[0] > TARGET_ICON_SIZE[0] or img.size[1] > TARGET_ICON_SIZE[1]:
                 img.thumbnail(TARGET_ICON_SIZE)
                 img.save(local_path, "PNG")
-                logger.info(f"Resized image to {TARGET_ICON_SIZE}: {local_path}")
+                logger.debug("Resized image to %s: %s", TARGET_ICON_SIZE, local_path)
     except Exception as e:
         logger.error(f"Failed to resize image {local_path}: {e}")
         if local_path.exists():
@@ -75,6 +77,7 @@ def resize_image(local_path: Path):
 def download_and_validate_icon(
     icon_url: str, local_path: Path, referer: str, unique_id: str
 ) -> Optional[str]:
+    temp_path = None
     try:
         session = requests.Session()
         session.headers.update(
@@ -86,7 +89,11 @@ def download_and_validate_icon(
                 "Accept-Language": "en-US,en;q=0.9",
             }
         )
-        resp = session.get(icon_url, timeout=20, stream=True, allow_redirects=True)
+        with circuit_breaker.guard(urlparse(icon_url).netloc) as call:
+            record_outbound(urlparse(icon_url).netloc)
+            with stage_timer("icon_download"):
+                resp = session.get(icon_url, timeout=20, stream=True, allow_redirects=True)
+            call.status = resp.status_code
         if resp.status_code != 200:
             logger.warning(f"Failed to download {icon_url}: HTTP {resp.status_code}")
             return None
@@ -138,14 +145,16 @@ def download_and_validate_icon(
             return None
 
         temp_path.rename(local_path)
-        resize_image(local_path)
-        logger.info(f"Successfully saved icon: {local_path}")
+        with stage_timer("pil_processing"):
+            resize_image(local_path)
+        icon_manifest.add(local_path)
+        logger.debug("Successfully saved icon: %s", local_path)
         return f"/static/icons/{local_path.relative_to(BASE_ICON_DIR)}"
     except Exception as e:
         logger.error(f"Exception downloading icon {icon_url}: {e}")
         if local_path.exists():
             local_path.unlink()
-        if temp_path.exists():
+        if temp_path is not None and temp_path.exists():
             temp_path.unlink()
         return None
 
@@ -153,7 +162,7 @@ def download_and_validate_icon(
 def fetch_google_favicon(domain: str) -> str:
     google_url = f"https://www.google.com/s2/favicons?domain={domain}"
     domain_dir = BASE_ICON_DIR / domain.replace(".", "_")
-    domain_dir.mkdir(parents=True, exist_ok=True)
+    icon_manifest.ensure_dir(domain_dir)
     local_icon_path = domain_dir / "google.ico"
     unique_id = hashlib.md5(google_url.encode()).hexdigest()[:8]
     static_path = download_and_validate_icon(google_url, local_icon_path, "", unique_id)
@@ -163,7 +172,7 @@ def fetch_google_favicon(domain: str) -> str:
 def fetch_duckduckgo_favicon(domain: str) -> str:
     duckduckgo_url = f"https://icons.duckduckgo.com/ip3/{domain}.ico"
     domain_dir = BASE_ICON_DIR / domain.replace(".", "_")
-    domain_dir.mkdir(parents=True, exist_ok=True)
+    icon_manifest.ensure_dir(domain_dir)
     local_icon_path = domain_dir / "duckduckgo.ico"
     unique_id = hashlib.md5(duckduckgo_url.encode()).hexdigest()[:8]
     static_path = download_and_validate_icon(
@@ -172,10 +181,11 @@ def fetch_duckduckgo_favicon(domain: str) -> str:
     return static_path or DEFAULT_FAVICON
 
 
-def fetch_html(url: str, scraper: cloudscraper.CloudScraper, timeout: int = 15) -> str:
+def fetch_html(url: str, scraper: "cloudscraper.CloudScraper", timeout: int = 15) -> str:
     try:
-        resp = scraper.get(url, timeout=timeout)
-        resp.raise_for_status()
+        with circuit_breaker.guard(urlparse(url).netloc):
+            resp = scraper.get(url, timeout=timeout)
+            resp.raise_for_status()
         return resp.text
     except Exception as e:
         logger.error(f"Failed to fetch HTML for {url}: {e}")
@@ -183,7 +193,7 @@ def fetch_html(url: str, scraper: cloudscraper.CloudScraper, timeout: int = 15)
 
 
 def extract_metadata(html: str) -> Dict:
-    soup = BeautifulSoup(html, "html.parser")
+    soup = bs4.BeautifulSoup(html, "html.parser")
     data = {
         "title": None,
         "description": None,
@@ -236,11 +246,11 @@ def fetch_metadata_scrape_meta(url: str) -> Dict:
         parsed = urlparse(url)
         base_name = parsed.netloc.replace(".", "_")
         domain_dir = BASE_ICON_DIR / base_name
-        domain_dir.mkdir(parents=True, exist_ok=True)
+        icon_manifest.ensure_dir(domain_dir)
         local_candidates = []
         seen_files = set()
 
-        soup = BeautifulSoup(html, "html.parser")
+        soup = bs4.BeautifulSoup(html, "html.parser")
         icon_candidates = []
         for rel in ["icon", "shortcut icon"]:
             for tag in soup.find_all("link", rel=rel):
@@ -322,7 +332,7 @@ def fetch_metadata_scrape_meta(url: str) -> Dict:
 
         metadata["webicon"] = webicon
         metadata["icon_candidates"] = local_candidates
-        logger.info(f"Fetched metadata for {url} using scrape_meta: {metadata}")
+        logger.debug("Fetched metadata for %s using scrape_meta: %s", url, metadata)
         return metadata
     except Exception as e:
         logger.error(f"Error fetching metadata for {url} using scrape_meta: {str(e)}")
@@ -348,7 +358,7 @@ def fetch_metadata_cloudscraper(url: str) -> Dict:
             logger.warning(f"Failed to fetch {url}: HTTP {response.status_code}")
             return {"error": f"HTTP {response.status_code}"}
 
-        soup = BeautifulSoup(
+        soup = bs4.BeautifulSoup(
             response.content, "html.parser", from_encoding=response.encoding or "utf-8"
         )
         metadata = {
@@ -395,7 +405,7 @@ def fetch_metadata_cloudscraper(url: str) -> Dict:
         parsed = urlparse(url)
         base_name = parsed.netloc.replace(".", "_")
         domain_dir = BASE_ICON_DIR / base_name
-        domain_dir.mkdir(parents=True, exist_ok=True)
+        icon_manifest.ensure_dir(domain_dir)
         local_candidates = []
         seen_files = set()
 
@@ -465,7 +475,7 @@ def fetch_metadata_cloudscraper(url: str) -> Dict:
 
         metadata["webicon"] = webicon
         metadata["icon_candidates"] = local_candidates
-        logger.info(f"Fetched metadata for {url} using cloudscraper: {metadata}")
+        logger.debug("Fetched metadata for %s using cloudscraper: %s", url, metadata)
         return metadata
     except Exception as e:
         logger.error(f"Error fetching metadata for {url} using cloudscraper: {str(e)}")
@@ -476,15 +486,15 @@ def fetch_metadata_with_selenium(url: str, retries: int = 2) -> Dict:
     for attempt in range(retries):
         try:
             driver_path = setup_geckodriver()
-            options = Options()
+            options = firefox_options.Options()
             options.add_argument("--headless")
             options.add_argument("--disable-gpu")
-            service = Service(driver_path)
+            service = firefox_service.Service(driver_path)
             with webdriver.Firefox(service=service, options=options) as driver:
                 driver.set_page_load_timeout(30)
                 driver.get(url)
                 time.sleep(5)
-                soup = BeautifulSoup(driver.page_source, "html.parser")
+                soup = bs4.BeautifulSoup(driver.page_source, "html.parser")
                 metadata = {
                     "title": "",
                     "description": "",
@@ -531,7 +541,7 @@ def fetch_metadata_with_selenium(url: str, retries: int = 2) -> Dict:
                 parsed = urlparse(url)
                 base_name = parsed.netloc.replace(".", "_")
                 domain_dir = BASE_ICON_DIR / base_name
-                domain_dir.mkdir(parents=True, exist_ok=True)
+                icon_manifest.ensure_dir(domain_dir)
                 local_candidates = []
                 seen_files = set()
 
@@ -604,7 +614,7 @@ def fetch_metadata_with_selenium(url: str, retries: int = 2) -> Dict:
 
                 metadata["webicon"] = webicon
                 metadata["icon_candidates"] = local_candidates
-                logger.info(f"Fetched metadata with Selenium for {url}: {metadata}")
+                logger.debug("Fetched metadata with Selenium for %s: %s", url, metadata)
                 return metadata
         except Exception as e:
             logger.error(
@@ -652,58 +662,31 @@ def is_valid_metadata(metadata: Dict) -> bool:
     )
 
 
-def fetch_metadata_combined(url: str) -> Dict:
+def fetch_metadata_combined(url: str, include_og_image: bool = True) -> Dict:
     try:
-        logger.info(f"Starting metadata fetch for URL: {url}")
-        url = url.lower()
-        if not url.startswith(("http://", "https://")):
-            url = "https://" + url
+        logger.info("Starting metadata fetch for URL: %s", url)
+        url = normalize_case(url)
         parsed_url = urlparse(url)
         domain = parsed_url.netloc.replace(".", "_")
         base_dir = Path("app/static/icons") / domain
-        base_dir.mkdir(parents=True, exist_ok=True)
-        recycle_dir = Path("app/static/recycled_icons") / domain
-
-        # Check recycled icons
-        recycled_icons = []
-        if recycle_dir.exists():
-            for icon_path in recycle_dir.glob("*"):
-                if icon_path.is_file():
-                    relative_path = f"/static/recycled_icons/{domain}/{icon_path.name}"
-                    recycled_icons.append(relative_path)
-            if recycled_icons:
-                logger.info(
-                    f"Found {len(recycled_icons)} recycled icons for {domain}: {recycled_icons}"
-                )
-                webicon = recycled_icons[0]
-                for recycled_icon in recycled_icons:
-                    src_path = Path("app") / recycled_icon.lstrip("/")
-                    dest_path = base_dir / src_path.name
-                    if not dest_path.exists():
-                        shutil.move(str(src_path), str(dest_path))
-                        logger.info(f"Moved recycled icon {src_path} to {dest_path}")
-                return {
-                    "title": "Reused bookmark",
-                    "description": "",
-                    "webicon": f"/static/icons/{domain}/{Path(recycled_icons[0]).name}",
-                    "icon_candidates": [
-                        f"/static/icons/{domain}/{Path(ic).name}"
-                        for ic in recycled_icons
-                    ],
-                    "extra_metadata": {"url": url},
-                }
+        icon_manifest.ensure_dir(base_dir)
 
         scraper = cloudscraper.create_scraper()
         try:
-            response = scraper.get(url, timeout=10)
-            response.raise_for_status()
+            # Hosts that keep failing are skipped until their backoff expires instead of costing the full timeout
+            with circuit_breaker.guard(parsed_url.netloc):
+                record_outbound(parsed_url.netloc)
+                with stage_timer("html_fetch"):
+                    response = scraper.get(url, timeout=10)
+                response.raise_for_status()
         except Exception as e:
             logger.error(f"Failed to fetch {url}: {str(e)}")
             return {"error": f"Failed to fetch URL: {str(e)}"}
 
-        soup = BeautifulSoup(response.text, "html.parser")
+        with stage_timer("html_parse"):
+            soup = bs4.BeautifulSoup(response.text, "html.parser")
         title = soup.title.string.strip() if soup.title else "No title"
-        logger.info(f"Extracted title: {title}")
+        logger.debug("Extracted title: %s", title)
 
         description = ""
         meta_desc = soup.find("meta", attrs={"name": "description"}) or soup.find(
@@ -711,10 +694,21 @@ def fetch_metadata_combined(url: str) -> Dict:
         )
         if meta_desc and meta_desc.get("content"):
             description = meta_desc["content"].strip()
-        logger.info(f"Extracted description: {description[:50]}...")
+        logger.debug("Extracted description: %.50s...", description)
+        try:
+            link_canonical = soup.find("link", rel="canonical")
+            canonical_url = resolve_canonical(url, response.url, link_canonical.get("href") if link_canonical else None)
+        except Exception as e:
+            logger.warning(f"Failed to resolve canonical URL for {url}: {str(e)}")
+            canonical_url = None
+        snapshot = None
+        if snapshot_store.enabled:
+            try:
+                with stage_timer("snapshot_extract"):
+                    snapshot = snapshot_store.capture(response.text)
+            except Exception as e:
+                logger.warning(f"Failed to extract page text for {url}: {str(e)}")
 
-        icon_candidates = []
-        webicon = None
         icons = []
 
         # Prioritize high-res icons
@@ -722,7 +716,7 @@ def fetch_metadata_combined(url: str) -> Dict:
         if apple_icon and apple_icon.get("href"):
             icons.append(("apple-touch-icon", apple_icon["href"]))
         og_image = soup.find("meta", attrs={"property": "og:image"})
-        if og_image and og_image["content"]:
+        if og_image and og_image.get("content") and include_og_image:
             icons.append(("og-image", og_image["content"]))
         favicon = soup.find("link", rel="icon") or soup.find(
             "link", rel="shortcut icon"
@@ -730,6 +724,14 @@ def fetch_metadata_combined(url: str) -> Dict:
         if favicon and favicon.get("href"):
             icons.append(("favicon", favicon["href"]))
 
+        # Domain-wide icons are shared by every page; only page-specific ones are fetched on a hit
+        cached_icons = domain_icon_cache.get(parsed_url.netloc)
+        record_cache("domain_icons", bool(cached_icons))
+        if cached_icons:
+            logger.info("Reusing %d cached domain icons for %s", len(cached_icons), parsed_url.netloc)
+            icons = [(icon_type, icon_url) for icon_type, icon_url in icons if icon_type == "og-image"]
+
+        processed_icons = list(cached_icons or [])
         mime = magic.Magic(mime=True)
         for idx, (icon_type, icon_url) in enumerate(icons):
             try:
@@ -737,8 +739,14 @@ def fetch_metadata_combined(url: str) -> Dict:
                 icon_response = None
                 for attempt in range(2):
                     try:
-                        icon_response = scraper.get(absolute_icon_url, timeout=5)
-                        icon_response.raise_for_status()
+                        with circuit_breaker.guard(urlparse(absolute_icon_url).netloc):
+                            record_outbound(urlparse(absolute_icon_url).netloc)
+                            with stage_timer("icon_download"):
+                                icon_response = scraper.get(absolute_icon_url, timeout=5)
+                            icon_response.raise_for_status()
+                        break
+                    except CircuitOpenError as e:
+                        logger.info("Skipping icon %s: %s", absolute_icon_url, e)
                         break
                     except Exception as e:
                         if attempt == 1:
@@ -778,69 +786,90 @@ def fetch_metadata_combined(url: str) -> Dict:
                         if 16 <= width <= 180 and 16 <= height <= 180:
                             preserve_original = True
                             logger.info(
-                                f"Preserving original {file_mime} for {absolute_icon_url} (size: {width}x{height})"
+                                "Preserving original %s for %s (size: %sx%s)",
+                                file_mime, absolute_icon_url, width, height,
+                                extra={"sample_rate": 0.1},
                             )
                     except Exception as e:
                         logger.warning(
-                            f"Failed to verify image size for {absolute_icon_url}: {str(e)}"
+                            "Failed to verify image size for %s: %s", absolute_icon_url, e,
+                            extra={"sample_rate": 0.1},
                         )
 
-                icon_path = base_dir / f"icon_{idx}.{file_ext}"
+                if icon_type == "og-image":
+                    # Page-specific, so keyed by page URL to avoid overwriting other pages' images
+                    page_id = hashlib.md5(url.encode()).hexdigest()[:8]
+                    icon_path = base_dir / f"og-image_{page_id}.{file_ext}"
+                else:
+                    icon_path = base_dir / f"icon_{idx}.{file_ext}"
                 if preserve_original:
                     # Save original content
                     with open(icon_path, "wb") as f:
                         f.write(icon_response.content)
-                    logger.info(f"Saved original icon: {icon_path}")
+                    logger.info("Saved original icon: %s", icon_path, extra={"sample_rate": 0.1})
                 else:
                     # Process with PIL
-                    img = Image.open(io.BytesIO(icon_response.content))
-                    img.verify()
-                    img = Image.open(
-                        io.BytesIO(icon_response.content)
-                    )  # Reopen for processing
-                    if img.mode == "P" and img.info.get("transparency") is not None:
-                        img = img.convert("RGBA")
-                        logger.info(f"Converted P mode to RGBA for {absolute_icon_url}")
-                    elif img.mode not in ["RGB", "RGBA"]:
-                        img = img.convert("RGBA" if "A" in img.mode else "RGB")
-                    if max(img.size) > 128:
-                        img = img.resize((128, 128), Image.Resampling.LANCZOS)
-                    img.save(icon_path, "PNG", quality=95)
-                    logger.info(f"Saved processed icon: {icon_path}")
+                    with stage_timer("pil_processing"):
+                        img = Image.open(io.BytesIO(icon_response.content))
+                        img.verify()
+                        img = Image.open(
+                            io.BytesIO(icon_response.content)
+                        )  # Reopen for processing
+                        if img.mode == "P" and img.info.get("transparency") is not None:
+                            img = img.convert("RGBA")
+                            logger.debug("Converted P mode to RGBA for %s", absolute_icon_url)
+                        elif img.mode not in ["RGB", "RGBA"]:
+                            img = img.convert("RGBA" if "A" in img.mode else "RGB")
+                        if max(img.size) > 128:
+                            img = img.resize((128, 128), Image.Resampling.LANCZOS)
+                        img.save(icon_path, "PNG", quality=95)
+                    logger.info("Saved processed icon: %s", icon_path, extra={"sample_rate": 0.1})
 
                 # Validate saved icon
-                if not icon_path.exists() or icon_path.stat().st_size == 0:
+                icon_manifest.add(icon_path)
+                if not icon_manifest.size(f"/static/icons/{domain}/{icon_path.name}"):
                     logger.warning(f"Invalid icon {icon_path}: zero size or missing")
                     if icon_path.exists():
                         icon_path.unlink()
+                    icon_manifest.remove(icon_path)
                     continue
 
-                relative_path = f"/static/icons/{domain}/{icon_path.name}"
-                icon_candidates.append(relative_path)
-                if not webicon and icon_type in ["apple-touch-icon", "og-image"]:
-                    webicon = relative_path
+                processed_icons.append((icon_type, f"/static/icons/{domain}/{icon_path.name}"))
             except Exception as e:
                 logger.warning(f"Failed to process icon {icon_url}: {str(e)}")
                 continue
 
-        if not icon_candidates:
+        if not any(icon_type in DOMAIN_ICON_TYPES for icon_type, _ in processed_icons):
             logger.warning(f"No valid icons found for {url}")
-            domain = parsed_url.netloc
-            duckduckgo_icon = fetch_duckduckgo_favicon(domain)
+            duckduckgo_icon = fetch_duckduckgo_favicon(parsed_url.netloc)
             if duckduckgo_icon != DEFAULT_FAVICON:
-                icon_candidates.append(duckduckgo_icon)
+                processed_icons.append(("duckduckgo", duckduckgo_icon))
             else:
-                google_icon = fetch_google_favicon(domain)
-                icon_candidates.append(google_icon)
+                google_icon = fetch_google_favicon(parsed_url.netloc)
+                if google_icon != DEFAULT_FAVICON or not processed_icons:
+                    processed_icons.append(("google", google_icon))
+
+        if not cached_icons:
+            domain_icon_cache.put(
+                parsed_url.netloc,
+                [icon for icon in processed_icons if icon[0] in DOMAIN_ICON_TYPES and icon[1] != DEFAULT_FAVICON],
+            )
 
-        if not webicon:
-            webicon = icon_candidates[0] if icon_candidates else DEFAULT_FAVICON
+        # apple-touch-icon first, then og:image, then the rest in discovery order
+        priority = {"apple-touch-icon": 0, "og-image": 1}
+        processed_icons.sort(key=lambda icon: priority.get(icon[0], 2))
+        icon_candidates = [path for _, path in processed_icons]
+        webicon = next(
+            (path for icon_type, path in processed_icons if icon_type in priority),
+            icon_candidates[0] if icon_candidates else DEFAULT_FAVICON,
+        )
 
-        return {
+        metadata = {
             "title": title,
             "description": description,
             "webicon": webicon,
             "icon_candidates": icon_candidates,
+            "canonical_url": canonical_url,
             "extra_metadata": {
                 "og_title": (
                     soup.find("meta", attrs={"property": "og:title"})["content"]
@@ -850,6 +879,9 @@ def fetch_metadata_combined(url: str) -> Dict:
                 "url": url,
             },
         }
+        if snapshot:
+            metadata["snapshot"] = snapshot  # Main text (and HTML) for app/services/snapshots.py
+        return metadata
     except Exception as e:
         logger.error(f"Metadata fetch failed for {url}: {str(e)}", exc_info=True)
         return {
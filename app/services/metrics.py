@@ -0,0 +1,157 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Latency buckets in seconds, shared by request and stage histograms
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(key)} {value}" for key, value in items)
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._values.get(_label_key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._values.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _format_labels(key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            bucket_labels = _format_labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route.")
+STAGE_LATENCY = Histogram("stage_duration_seconds", "Duration of hot-path stages (fetch, parse, icons, db, serialization).")
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result (hit/miss).")
+OUTBOUND_REQUESTS = Counter("outbound_requests_total", "Outbound HTTP requests by host.")
+CIRCUIT_STATE = Gauge("circuit_breaker_state", "Per-host circuit state (0 closed, 1 half-open, 2 open).")
+CIRCUIT_REJECTIONS = Counter("circuit_breaker_rejections_total", "Outbound requests skipped because the host's circuit was open.")
+COMPRESSION_BYTES = Counter("http_compression_bytes_total", "Response bytes before (raw) and after (sent) compression by encoding.")
+SCHEDULER_JOB_RUNS = Counter("scheduler_job_runs_total", "Scheduled job runs by job and status (ok, error, skipped).")
+QUEUE_JOB_RUNS = Counter("queue_job_runs_total", "Queued job attempts by kind and outcome (done, retry, failed, lost).")
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "Log records dropped because the logging queue was full, by level.")
+
+REGISTRY = [REQUEST_LATENCY, STAGE_LATENCY, CACHE_REQUESTS, OUTBOUND_REQUESTS, CIRCUIT_STATE, CIRCUIT_REJECTIONS, COMPRESSION_BYTES,
+            SCHEDULER_JOB_RUNS, QUEUE_JOB_RUNS, LOG_RECORDS_DROPPED]
+
+
+def stage_timer(stage: str):
+    """Context manager recording the duration of one pipeline stage."""
+    return STAGE_LATENCY.time(stage=stage)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_outbound(host: str):
+    OUTBOUND_REQUESTS.inc(host=host or "unknown")
+
+
+def instrument_engine(engine):
+    """Record every SQL statement executed on the engine as a db_query stage."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if starts:
+            STAGE_LATENCY.observe(time.perf_counter() - starts.pop(), stage="db_query")
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
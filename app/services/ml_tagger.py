@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.lazy_imports import lazy_module
+from app.services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+np = lazy_module("numpy")
+# Only needed when TAGGER_MODEL_PATH is set, so not preloaded at startup
+torch = lazy_module("torch", preload=False)
+transformers = lazy_module("transformers", preload=False)
+onnxruntime = lazy_module("onnxruntime", preload=False)
+
+TAGGER_MODEL_PATH = os.getenv("TAGGER_MODEL_PATH")  # Local NLI model directory for zero-shot tagging
+TAGGER_BACKEND = os.getenv("TAGGER_BACKEND", "torch")  # "torch" (dynamic int8) or "onnx" (model.onnx in the model dir)
+TAGGER_MAX_BATCH = int(os.getenv("TAGGER_MAX_BATCH", 16))  # Requests combined into one forward pass
+TAGGER_MAX_WAIT_MS = float(os.getenv("TAGGER_MAX_WAIT_MS", 10))  # How long the first request waits for company
+TAGGER_THRESHOLD = float(os.getenv("TAGGER_THRESHOLD", 0.5))
+TAGGER_TIMEOUT = 5.0  # Seconds a request waits before falling back to TF-IDF
+HYPOTHESIS_TEMPLATE = "This page is about {}."
+CACHE_SIZE = 5000
+
+
+class ZeroShotModel:
+    """Scores (text, label) pairs with an NLI model: P(entailment) of "This page is about <label>"."""
+
+    def __init__(self, model_path: str, backend: str = TAGGER_BACKEND):
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        config = transformers.AutoConfig.from_pretrained(model_path, local_files_only=True)
+        label2id = {k.lower(): v for k, v in config.label2id.items()}
+        self.entailment = next(v for k, v in label2id.items() if k.startswith("entail"))
+        self.contradiction = next(v for k, v in label2id.items() if k.startswith("contra"))
+        onnx_path = Path(model_path) / "model.onnx"
+        if backend == "onnx" and onnx_path.exists():
+            self.session = onnxruntime.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"])
+            self.model = None
+        else:
+            model = transformers.AutoModelForSequenceClassification.from_pretrained(
+                model_path, local_files_only=True
+            ).eval()
+            self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.session = None
+        self.backend = "onnx" if self.session is not None else "torch-int8"
+
+    def score(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        premises = [text for text, _ in pairs]
+        hypotheses = [HYPOTHESIS_TEMPLATE.format(label) for _, label in pairs]
+        if self.session is not None:
+            tokens = self.tokenizer(premises, hypotheses, padding=True, truncation="only_first",
+                                    max_length=256, return_tensors="np")
+            inputs = {i.name: tokens[i.name] for i in self.session.get_inputs() if i.name in tokens}
+            logits = self.session.run(None, inputs)[0]
+        else:
+            tokens = self.tokenizer(premises, hypotheses, padding=True, truncation="only_first",
+                                    max_length=256, return_tensors="pt")
+            with torch.no_grad():
+                logits = self.model(**tokens).logits.numpy()
+        # Softmax over entailment vs contradiction only, as in zero-shot classification pipelines
+        pair_logits = logits[:, [self.contradiction, self.entailment]]
+        pair_logits = pair_logits - pair_logits.max(axis=1, keepdims=True)
+        probs = np.exp(pair_logits)
+        return (probs[:, 1] / probs.sum(axis=1)).tolist()
+
+
+class MicroBatcher:
+    """Collects concurrent scoring requests and runs them through the model together.
+
+    The first request waits up to `max_wait` seconds for up to `max_batch` requests before a
+    single forward pass scores all of their (text, label) pairs.
+    """
+
+    def __init__(self, score_fn: Callable[[Sequence[Tuple[str, str]]], List[float]],
+                 max_batch: int = TAGGER_MAX_BATCH, max_wait: float = TAGGER_MAX_WAIT_MS / 1000):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[str, Tuple[str, ...], Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="tagger-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str, labels: Sequence[str]) -> Future:
+        future: Future = Future()
+        self._queue.put((text, tuple(labels), future))
+        return future
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            pairs = [(text, label) for text, labels, _ in batch for label in labels]
+            try:
+                scores = self.score_fn(pairs) if pairs else []
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for _, labels, future in batch:
+                future.set_result(dict(zip(labels, scores[offset:offset + len(labels)])))
+                offset += len(labels)
+
+
+class MLTagger:
+    """Optional zero-shot tagger; `suggest` returns None whenever callers should use TF-IDF instead."""
+
+    def __init__(self, model_path: Optional[str] = TAGGER_MODEL_PATH, model_factory=ZeroShotModel):
+        self.model_path = model_path
+        self.model_factory = model_factory
+        self._batcher: Optional[MicroBatcher] = None
+        self._failed = False
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.model_path) and not self._failed
+
+    def _get_batcher(self) -> Optional[MicroBatcher]:
+        with self._lock:
+            if self._batcher is None and self.enabled:
+                try:
+                    model = self.model_factory(self.model_path)
+                    self._batcher = MicroBatcher(model.score)
+                    logger.info("Loaded zero-shot tagger from %s (%s)", self.model_path,
+                                getattr(model, "backend", "custom"))
+                except Exception as e:
+                    self._failed = True
+                    logger.warning("Zero-shot tagger unavailable, using TF-IDF tags: %s", e)
+            return self._batcher
+
+    @staticmethod
+    def _content_key(text: str, labels: Sequence[str]) -> str:
+        return hashlib.sha1("\0".join([text, *labels]).encode("utf-8")).hexdigest()
+
+    def scores(self, text: str, labels: Sequence[str], timeout: float = TAGGER_TIMEOUT) -> Optional[Dict[str, float]]:
+        if not self.enabled:
+            return None
+        key = self._content_key(text, labels)
+        with self._lock:
+            cached = self._cache.get(key)
+            record_cache("ml_tags", cached is not None)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        batcher = self._get_batcher()
+        if batcher is None:
+            return None
+        try:
+            result = batcher.submit(text, labels).result(timeout=timeout)
+        except Exception as e:
+            logger.warning("Zero-shot tagging failed, falling back to TF-IDF: %s", e)
+            return None
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
+
+    def suggest(self, text: str, labels: Sequence[str], top_k: int = 3,
+                threshold: float = TAGGER_THRESHOLD) -> Optional[List[str]]:
+        scores = self.scores(text, labels)
+        if scores is None:
+            return None
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [label for label, score in ranked if score >= threshold][:top_k]
+
+
+ml_tagger = MLTagger()
@@ -1,6 +1,8 @@
 import requests
 from urllib.parse import urlparse
 import logging
+from app.services.metrics import record_outbound
+from app.services.circuit_breaker import CircuitOpenError, circuit_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -33,40 +35,38 @@ def is_page_online(url_str: str, timeout: int = 7) -> bool:
             logger.warning(f"URL {url_str} has an unsupported scheme '{parsed_initial.scheme}'. Will not check.")
             return False
 
-        # First attempt (either original scheme if http/https, or http if no scheme)
-        try:
-            logger.debug(f"Attempting (1) to connect to {processed_url}")
-            resp = requests.get(processed_url, timeout=timeout, allow_redirects=True, headers=headers)
-            if resp.ok: # Status code < 400
-                logger.info(f"Successfully connected to {processed_url} with status {resp.status_code}")
-                return True
-            logger.warning(f"Connection to {processed_url} resulted in status {resp.status_code}")
-        except requests.exceptions.SSLError as e:
-            logger.warning(f"SSL error for {processed_url}: {e}. Will try alternative.")
-        except requests.exceptions.ConnectionError as e:
-            logger.warning(f"Connection error for {processed_url}: {e}. Will try alternative.")
-        except requests.exceptions.Timeout:
-            logger.warning(f"Timeout connecting to {processed_url}. Will try alternative.")
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"Request exception for {processed_url}: {e}. Will try alternative.")
-
-        # Second attempt (alternative scheme)
+        # Both schemes go to the same host, so the whole check is one call for its circuit breaker:
+        # an http failure followed by an https failure counts once, and an https success closes it
         alternative_url = None
         if processed_url.startswith("http://"):
             alternative_url = processed_url.replace("http://", "https://", 1)
         elif processed_url.startswith("https://"): # Should only happen if original URL was https and it failed
             alternative_url = processed_url.replace("https://", "http://", 1)
 
-        if alternative_url:
-            try:
-                logger.debug(f"Attempting (2) to connect to {alternative_url}")
-                resp = requests.get(alternative_url, timeout=timeout, allow_redirects=True, headers=headers)
-                if resp.ok:
-                    logger.info(f"Successfully connected to {alternative_url} with status {resp.status_code}")
-                    return True
-                logger.warning(f"Connection to {alternative_url} resulted in status {resp.status_code}")
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Request failed for {alternative_url}: {e}")
+        host = urlparse(processed_url).netloc
+        try:
+            with circuit_breaker.guard(host) as call:
+                for attempt, attempt_url in enumerate(filter(None, (processed_url, alternative_url)), 1):
+                    last_attempt = attempt_url == alternative_url or alternative_url is None
+                    try:
+                        logger.debug(f"Attempting ({attempt}) to connect to {attempt_url}")
+                        record_outbound(host)
+                        resp = requests.get(attempt_url, timeout=timeout, allow_redirects=True, headers=headers)
+                    except requests.exceptions.RequestException as e:
+                        if last_attempt:
+                            raise
+                        logger.warning(f"{type(e).__name__} for {attempt_url}: {e}. Will try alternative.")
+                        continue
+                    call.status = resp.status_code
+                    if resp.ok: # Status code < 400
+                        logger.info(f"Successfully connected to {attempt_url} with status {resp.status_code}")
+                        return True
+                    logger.warning(f"Connection to {attempt_url} resulted in status {resp.status_code}")
+        except CircuitOpenError as e:
+            logger.info(f"Not checking {url_str}: {e}")
+            return False
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Request failed for {alternative_url or processed_url}: {e}")
 
         logger.info(f"All attempts to check {url_str} failed.")
         return False
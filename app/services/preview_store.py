@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+import secrets
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+
+from app.models import MetadataPreview, engine
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_TOKEN_TTL = int(os.getenv("PREVIEW_TOKEN_TTL", 600))  # Seconds a /fetch-metadata preview can be committed
+
+
+class PreviewStore:
+    """Short-lived server-side store of fetched metadata, handed out as opaque tokens.
+
+    `/fetch-metadata` stores what it fetched and returns a token; POST /bookmarks redeems the
+    token to commit the same metadata and icons without fetching the page again. Previews are
+    rows in the database, so any worker process can redeem a token another one issued, and
+    the page snapshots they carry stay out of process memory. The token is a random id with
+    128 bits of entropy and is only valid for the URL it was issued for.
+    """
+
+    def __init__(self, ttl: int = PREVIEW_TOKEN_TTL, bind=engine, clock=datetime.utcnow):
+        self.ttl = ttl
+        self.bind = bind
+        self.clock = clock
+
+    def purge_expired(self) -> int:
+        """Drop previews whose token has expired; returns how many were dropped."""
+        table = MetadataPreview.__table__
+        with self.bind.begin() as conn:
+            removed = conn.execute(delete(table).where(table.c.expires_at < self.clock())).rowcount
+        if removed:
+            logger.info("Purged %d expired metadata previews", removed)
+        return removed
+
+    def issue(self, url: str, metadata: dict) -> str:
+        """Store metadata fetched for a URL and return a token for it."""
+        token = secrets.token_urlsafe(16)
+        table = MetadataPreview.__table__
+        with self.bind.begin() as conn:
+            conn.execute(insert(table).values(
+                id=token,
+                url=url,
+                data=zlib.compress(json.dumps(metadata).encode()),
+                expires_at=self.clock() + timedelta(seconds=self.ttl),
+            ))
+        return token
+
+    def redeem(self, token: str, url: str) -> Optional[dict]:
+        """Return and consume the metadata behind a token, or None if it is invalid, expired or for another URL."""
+        if not isinstance(token, str) or not token:
+            return None
+        table = MetadataPreview.__table__
+        with self.bind.begin() as conn:
+            row = conn.execute(
+                select(table.c.url, table.c.data, table.c.expires_at).where(table.c.id == token)
+            ).first()
+            if row is None or row.url != url or row.expires_at < self.clock():
+                return None
+            # Only the process whose delete lands gets the preview, so a token commits one bookmark
+            if conn.execute(delete(table).where(table.c.id == token)).rowcount != 1:
+                return None
+        return json.loads(zlib.decompress(row.data))
+
+
+preview_store = PreviewStore()
@@ -0,0 +1,226 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # Enables on-demand profiling via header or query flag
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))  # Fraction of all requests profiled automatically
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 100))  # Newest profiles kept on disk
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "data/profiles"))
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY = "profile"
+
+_PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$")
+
+
+def _short_path(filename: str) -> str:
+    for marker in ("site-packages" + os.sep, os.sep + "lib" + os.sep):
+        if marker in filename:
+            return filename.rsplit(marker, 1)[1]
+    try:
+        return os.path.relpath(filename)
+    except ValueError:  # Different drive on Windows
+        return filename
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+# The sampler profiling the current request, if any; copied into the request's tasks and threads
+_active_sampler: contextvars.ContextVar[Optional["StackSampler"]] = contextvars.ContextVar("active_sampler", default=None)
+
+
+class StackSampler:
+    """Samples the Python stacks of one request's threads every `interval` seconds.
+
+    Sync endpoints run on threadpool workers, which a per-thread profiler such as cProfile
+    started in the middleware would not see. Endpoints of routers using `ProfiledRoute`
+    register the thread (or, for async endpoints, the event loop task) they run on while
+    the request is profiled, and only those are sampled, so other requests' stacks stay out.
+    Waits on locks and queues are kept: they are time the request spent.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        # Thread ident -> the asyncio task to match on that thread (an event loop), or None
+        self._tracked: Dict[int, Optional[asyncio.Task]] = {}
+        self._loops: Dict[int, asyncio.AbstractEventLoop] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._token = None
+
+    def track(self, task: Optional[asyncio.Task] = None):
+        """Sample the calling thread until `untrack`; on an event loop, only while `task` runs."""
+        ident = threading.get_ident()
+        if task is not None:
+            self._loops[ident] = task.get_loop()
+        self._tracked[ident] = task
+
+    def untrack(self):
+        ident = threading.get_ident()
+        self._tracked.pop(ident, None)
+        self._loops.pop(ident, None)
+
+    def _sample(self):
+        tracked = dict(self._tracked)
+        if not tracked:
+            self.samples += 1
+            return
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        for ident, task in tracked.items():
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            if task is not None and asyncio.current_task(self._loops[ident]) is not task:
+                continue  # The loop is running another request's task
+            labels = []
+            while frame is not None:
+                labels.append(_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "StackSampler":
+        self._token = _active_sampler.set(self)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self._thread.join()
+        if self._token is not None:
+            _active_sampler.reset(self._token)
+            self._token = None
+        return self.stacks
+
+
+def _tracked(endpoint):
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def tracked_async(*args, **kwargs):
+            sampler = _active_sampler.get()
+            if sampler is None:
+                return await endpoint(*args, **kwargs)
+            sampler.track(asyncio.current_task())
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                sampler.untrack()
+        return tracked_async
+
+    @functools.wraps(endpoint)
+    def tracked_sync(*args, **kwargs):
+        sampler = _active_sampler.get()
+        if sampler is None:
+            return endpoint(*args, **kwargs)
+        sampler.track()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            sampler.untrack()
+    return tracked_sync
+
+
+class ProfiledRoute(APIRoute):
+    """Route class whose endpoints tell a profiling StackSampler which thread they run on.
+
+    Costs one context variable lookup per request when nothing is being profiled.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _tracked(endpoint), **kwargs)
+
+
+def folded(stacks: Counter) -> str:
+    """Collapsed-stack text ("root;...;leaf count" per line), read by flamegraph.pl and speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class ProfileStore:
+    """Profiles as <id>.folded plus <id>.json metadata; only the newest `keep` are retained."""
+
+    def __init__(self, directory: Path = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, stacks: Counter, meta: Dict) -> str:
+        now = datetime.now()
+        profile_id = f"{now:%Y%m%dT%H%M%S%f}-{secrets.token_hex(4)}"  # Sorts by creation time
+        meta = {"id": profile_id, "created_at": now.isoformat(), **meta}
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / f"{profile_id}.folded").write_text(folded(stacks))
+            (self.directory / f"{profile_id}.json").write_text(json.dumps(meta))
+            for stale in self._ids()[self.keep:]:
+                for suffix in (".folded", ".json"):
+                    (self.directory / f"{stale}{suffix}").unlink(missing_ok=True)
+        return profile_id
+
+    def _ids(self) -> List[str]:
+        if not self.directory.is_dir():
+            return []
+        return sorted((path.stem for path in self.directory.glob("*.json")), reverse=True)
+
+    def list(self) -> List[Dict]:
+        """Metadata of stored profiles, newest first."""
+        profiles = []
+        for profile_id in self._ids():
+            try:
+                profiles.append(json.loads((self.directory / f"{profile_id}.json").read_text()))
+            except (OSError, ValueError):
+                continue  # Pruned or half-written by another process
+        return profiles
+
+    def folded_path(self, profile_id: str) -> Optional[Path]:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.folded"
+        return path if path.exists() else None
+
+
+def is_authorized(headers, query_params) -> bool:
+    """Whether the request carries PROFILE_TOKEN in the X-Profile header or ?profile= flag."""
+    if not PROFILE_TOKEN:
+        return False
+    supplied = headers.get(PROFILE_HEADER) or query_params.get(PROFILE_QUERY) or ""
+    return secrets.compare_digest(supplied.encode(), PROFILE_TOKEN.encode())
+
+
+def profile_trigger(headers, query_params) -> Optional[str]:
+    """Why this request should be profiled, or None; cheap enough to run on every request."""
+    if PROFILE_TOKEN and (PROFILE_HEADER in headers or PROFILE_QUERY in query_params):
+        return "requested" if is_authorized(headers, query_params) else None
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+profile_store = ProfileStore()
+
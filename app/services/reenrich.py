@@ -0,0 +1,324 @@
+import json
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import uuid
+
+from sqlalchemy import or_, update
+
+from app.models import Bookmark, ReenrichJob, SessionLocal, engine
+from app.services.metadata_fetcher import DEFAULT_FAVICON
+from app.services.icon_manifest import icon_manifest
+from app.services.job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, job_queue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_HOST_DELAY = 1.0  # Minimum seconds between two requests to the same host
+REENRICH_BOOKMARK = "reenrich_bookmark"  # Job kind; the handler lives with the others in app/services/enrichment.py
+REENRICH_POLL_INTERVAL = float(os.getenv("REENRICH_POLL_INTERVAL", 2.0))  # Seconds between progress checks
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+REENRICH_LEASE_TTL = float(os.getenv("REENRICH_LEASE_TTL", 300))  # Seconds before a dead process's job can be resumed
+PROCESS_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Jobs currently being processed by this process, keyed by job id
+_RUNNING_JOBS: Dict[int, "ReenrichRunner"] = {}
+_RUNNING_LOCK = threading.Lock()
+
+
+class HostSpacing:
+    """Hands out start times that keep requests to the same host a minimum delay apart."""
+
+    def __init__(self, min_interval: float = DEFAULT_HOST_DELAY, clock=datetime.utcnow):
+        self.min_interval = timedelta(seconds=min_interval)
+        self.clock = clock
+        self._next_slot: Dict[str, datetime] = {}
+
+    def next_slot(self, host: str) -> datetime:
+        now = self.clock()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.min_interval
+        return slot
+
+
+def group_key(job_id: int) -> str:
+    """The job queue group holding one re-enrichment job's bookmarks."""
+    return f"reenrich:{job_id}"
+
+
+def select_bookmark_query(db, criteria: Dict, after_id: int = 0):
+    """Build the query for bookmarks matching the job criteria, ordered by id."""
+    query = db.query(Bookmark).filter(Bookmark.id > after_id)
+    if criteria.get("older_than_days") is not None:
+        cutoff = datetime.now() - timedelta(days=criteria["older_than_days"])
+        query = query.filter((Bookmark.updated_at == None) | (Bookmark.updated_at < cutoff))  # noqa: E711
+    if criteria.get("tag"):
+        tag = criteria["tag"]
+        query = query.filter(
+            (Bookmark.tags == tag)
+            | Bookmark.tags.like(f"{tag},%")
+            | Bookmark.tags.like(f"%,{tag}")
+            | Bookmark.tags.like(f"%,{tag},%")
+        )
+    if criteria.get("domain"):
+        # Narrows the scan; matches_criteria checks the parsed host
+        query = query.filter(Bookmark.url.ilike(f"%{_escape_like(_normalize_domain(criteria['domain']))}%", escape="\\"))
+    return query.order_by(Bookmark.id)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _normalize_domain(domain: str) -> str:
+    domain = domain.strip().lower()
+    host = urlparse(domain if "://" in domain else f"http://{domain}").hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def matches_criteria(url: str, criteria: Dict) -> bool:
+    """The checks SQL cannot express: a domain matches its host and subdomains, not lookalikes."""
+    if not criteria.get("domain"):
+        return True
+    domain = _normalize_domain(criteria["domain"])
+    host = (urlparse(url if "://" in url else f"http://{url}").hostname or "").lower()
+    return host == domain or host.endswith("." + domain)
+
+
+def count_matching(db, criteria: Dict) -> int:
+    query = select_bookmark_query(db, criteria)
+    if not criteria.get("domain"):
+        return query.count()
+    return sum(1 for (url,) in query.with_entities(Bookmark.url) if matches_criteria(url, criteria))
+
+
+def claim_job(job_id: int, owner: str = PROCESS_OWNER, ttl: float = REENRICH_LEASE_TTL) -> bool:
+    """Take or renew the lease on an unfinished job; False if another live process holds it."""
+    table = ReenrichJob.__table__
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        return conn.execute(
+            update(table)
+            .where(
+                table.c.id == job_id,
+                table.c.status.in_(["pending", "running"]),
+                or_(table.c.owner.is_(None), table.c.owner == owner, table.c.lease_expires_at < now),
+            )
+            .values(owner=owner, lease_expires_at=now + timedelta(seconds=ttl))
+        ).rowcount == 1
+
+
+def serialize_job(job: ReenrichJob) -> Dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "criteria": json.loads(job.criteria) if job.criteria else {},
+        "total": int(job.total or 0),
+        "processed": int(job.processed or 0),
+        "succeeded": int(job.succeeded or 0),
+        "failed": int(job.failed or 0),
+        "last_bookmark_id": int(job.last_bookmark_id or 0),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+def create_job(db, criteria: Dict) -> ReenrichJob:
+    job = ReenrichJob(
+        status="pending",
+        criteria=json.dumps(criteria),
+        total=count_matching(db, criteria),
+        processed=0,
+        succeeded=0,
+        failed=0,
+        last_bookmark_id=0,
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    logger.info(f"Created re-enrichment job {job.id} for {job.total} bookmarks: {criteria}")
+    return job
+
+
+def apply_metadata(bookmark: Bookmark, metadata: Dict) -> None:
+    """Write fetched metadata back onto a bookmark row."""
+    title = metadata.get("title")
+    if title and title not in ("No title", "Reused bookmark"):
+        bookmark.title = title
+    if metadata.get("description"):
+        bookmark.description = metadata["description"]
+    icon_candidates = [
+        str(ic) for ic in metadata.get("icon_candidates", []) if icon_manifest.exists(str(ic))
+    ]
+    if icon_candidates:
+        bookmark.icon_candidates = ",".join(icon_candidates)
+        bookmark.webicon = metadata.get("webicon") or icon_candidates[0]
+    elif not bookmark.webicon:
+        bookmark.webicon = DEFAULT_FAVICON
+    bookmark.updated_at = datetime.now()
+
+
+class ReenrichRunner:
+    """Feeds one re-enrichment job to the job queue from a background thread.
+
+    Matching bookmarks are queued a batch at a time as reenrich_bookmark jobs, with at most
+    `workers` of them queued or running at once, and the scan position is checkpointed after
+    each batch. Queue workers do the fetching; progress counts the jobs they finish.
+    """
+
+    def __init__(self, job_id: int, owner: str = PROCESS_OWNER, queue: JobQueue = job_queue,
+                 poll_interval: float = REENRICH_POLL_INTERVAL):
+        self.job_id = job_id
+        self.owner = owner
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.cancelled = threading.Event()
+        self.lease_lost = threading.Event()
+        self._done = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"reenrich-{job_id}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _renew_lease(self):
+        # A job over thousands of bookmarks outlasts the lease; keep it alive meanwhile
+        while not self._done.wait(REENRICH_LEASE_TTL / 3):
+            try:
+                if not claim_job(self.job_id, self.owner):
+                    logger.warning(f"Re-enrichment job {self.job_id} lost its lease; stopping")
+                    self.lease_lost.set()
+                    return
+            except Exception as e:
+                logger.warning(f"Could not renew lease of re-enrichment job {self.job_id}: {str(e)}")
+
+    def _record_progress(self, db, job: ReenrichJob, group: str) -> int:
+        """Copy the group's finished jobs into the counters; returns how many are still pending."""
+        counts = self.queue.group_counts(group)
+        if (job.succeeded, job.failed) != (counts[DONE], counts[FAILED]):
+            job.succeeded, job.failed = counts[DONE], counts[FAILED]
+            job.processed = counts[DONE] + counts[FAILED]
+            job.updated_at = datetime.now()
+            db.commit()
+            logger.info(f"Re-enrichment job {job.id}: {job.processed}/{job.total} processed")
+        return counts[QUEUED] + counts[RUNNING]
+
+    def run(self):
+        if not claim_job(self.job_id, self.owner):
+            logger.info(f"Re-enrichment job {self.job_id} is finished or running elsewhere")
+            with _RUNNING_LOCK:
+                _RUNNING_JOBS.pop(self.job_id, None)
+            return
+        threading.Thread(target=self._renew_lease, name=f"reenrich-lease-{self.job_id}", daemon=True).start()
+        db = SessionLocal()
+        try:
+            job = db.query(ReenrichJob).filter(ReenrichJob.id == self.job_id).first()
+            if not job:
+                logger.error(f"Re-enrichment job {self.job_id} not found")
+                return
+            criteria = json.loads(job.criteria) if job.criteria else {}
+            workers = max(1, int(criteria.get("workers") or DEFAULT_WORKERS))
+            batch_size = max(1, int(criteria.get("batch_size") or DEFAULT_BATCH_SIZE))
+            spacing = HostSpacing(float(criteria.get("per_host_delay", DEFAULT_HOST_DELAY)))
+            group = group_key(job.id)
+            job.status = "running"
+            db.commit()
+            logger.info(f"Running re-enrichment job {job.id} from checkpoint {job.last_bookmark_id}")
+
+            scanned_all = False
+            while not self.cancelled.is_set() and not self.lease_lost.is_set():
+                pending = self._record_progress(db, job, group)
+                if scanned_all and not pending:
+                    break
+                if not scanned_all and pending < workers:
+                    scanned = select_bookmark_query(db, criteria, job.last_bookmark_id or 0).limit(batch_size).all()
+                    if not scanned:
+                        scanned_all = True
+                        continue
+                    batch = [b for b in scanned if matches_criteria(b.url, criteria)]
+                    self.queue.enqueue_many(
+                        db, REENRICH_BOOKMARK, [b.id for b in batch], group_key=group,
+                        run_after={b.id: spacing.next_slot(urlparse(b.url).netloc or b.url) for b in batch},
+                    )
+                    job.last_bookmark_id = scanned[-1].id
+                    job.updated_at = datetime.now()
+                    db.commit()
+                    continue
+                # The cancel endpoint may have run in another process
+                if db.query(ReenrichJob.status).filter(ReenrichJob.id == job.id).scalar() == "cancelled":
+                    self.cancelled.set()
+                    break
+                self.cancelled.wait(self.poll_interval)
+
+            if self.lease_lost.is_set():
+                return
+            if self.cancelled.is_set():
+                self.queue.cancel_group(group)
+            self._record_progress(db, job, group)
+            job.status = "cancelled" if self.cancelled.is_set() else "completed"
+            job.owner = None
+            job.lease_expires_at = None
+            job.updated_at = datetime.now()
+            db.commit()
+            logger.info(f"Re-enrichment job {job.id} {job.status}")
+        except Exception as e:
+            logger.error(f"Re-enrichment job {self.job_id} failed: {str(e)}", exc_info=True)
+            db.rollback()
+            job = db.query(ReenrichJob).filter(ReenrichJob.id == self.job_id).first()
+            if job:
+                job.status = "failed"
+                job.error = str(e)
+                job.owner = None
+                db.commit()
+        finally:
+            self._done.set()
+            db.close()
+            with _RUNNING_LOCK:
+                _RUNNING_JOBS.pop(self.job_id, None)
+
+
+def start_job(job_id: int) -> bool:
+    """Start a job in the background unless it is finished or already running in any process."""
+    with _RUNNING_LOCK:
+        if job_id in _RUNNING_JOBS or not claim_job(job_id):
+            return False
+        runner = ReenrichRunner(job_id)
+        _RUNNING_JOBS[job_id] = runner
+    runner.start()
+    return True
+
+
+def cancel_job(job_id: int) -> bool:
+    with _RUNNING_LOCK:
+        runner = _RUNNING_JOBS.get(job_id)
+    if not runner:
+        return False
+    runner.cancelled.set()
+    return True
+
+
+def resume_interrupted_jobs() -> List[int]:
+    """Restart jobs left pending or running by a process that died, from their checkpoint.
+
+    Runs as a one-off scheduler job whenever a process becomes leader; the job lease still lets
+    only one process take each job, and jobs still running in a live process are left alone.
+    """
+    db = SessionLocal()
+    try:
+        job_ids = [
+            job.id
+            for job in db.query(ReenrichJob).filter(ReenrichJob.status.in_(["pending", "running"])).all()
+        ]
+    finally:
+        db.close()
+    resumed = [job_id for job_id in job_ids if start_job(job_id)]
+    if resumed:
+        logger.info(f"Resumed re-enrichment jobs: {resumed}")
+    return resumed
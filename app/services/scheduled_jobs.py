@@ -0,0 +1,90 @@
+import logging
+import os
+
+from sqlalchemy import text
+
+from app.models import ReenrichJob, SessionLocal, engine
+from app.services.domain_icon_cache import domain_icon_cache
+from app.services.embeddings import EMBEDDING_SYNC_INTERVAL, embedding_updater
+from app.services.enrichment import (
+    ENRICHMENT_SWEEP_INTERVAL, LINK_CHECK_INTERVAL, sweep_link_checks, sweep_unenriched,
+)
+from app.services.icon_manifest import icon_manifest
+from app.services.job_queue import job_queue
+from app.services.preview_store import preview_store
+from app.services.reenrich import create_job, resume_interrupted_jobs, start_job
+from app.services.scheduler import Scheduler
+from app.services.snapshots import SNAPSHOT_DICT_TRAIN_INTERVAL, snapshot_store
+from app.services.trash import TRASH_PURGE_INTERVAL, import_legacy_recycle_bin, run_icon_gc, run_purge
+from app.services.url_canonical import backfill_canonical_urls
+
+logger = logging.getLogger(__name__)
+
+ICON_GC_CRON = os.getenv("ICON_GC_CRON", "30 3 * * *")  # Empty to disable
+DB_OPTIMIZE_CRON = os.getenv("DB_OPTIMIZE_CRON", "0 4 * * *")
+METADATA_REFRESH_CRON = os.getenv("METADATA_REFRESH_CRON", "")  # Off unless set, since it fetches every stale page
+METADATA_REFRESH_DAYS = int(os.getenv("METADATA_REFRESH_DAYS", 90))
+DOMAIN_ICON_EVICT_INTERVAL = 3600
+PREVIEW_PURGE_INTERVAL = 300
+ICON_MANIFEST_REFRESH_INTERVAL = 60
+JOB_PRUNE_INTERVAL = 3600
+
+
+def optimize_database(bind=engine):
+    """Refresh the query planner's statistics so index choices keep up with the data."""
+    with bind.begin() as conn:
+        if bind.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA optimize"))
+        else:
+            conn.execute(text("ANALYZE"))
+    logger.info("Refreshed %s planner statistics", bind.dialect.name)
+
+
+def refresh_stale_metadata(older_than_days: int = METADATA_REFRESH_DAYS):
+    """Start a re-enrichment job for bookmarks not updated in `older_than_days`, unless one is active."""
+    db = SessionLocal()
+    try:
+        if db.query(ReenrichJob.id).filter(ReenrichJob.status.in_(["pending", "running"])).first() is not None:
+            logger.info("Skipping scheduled metadata refresh: a re-enrichment job is already active")
+            return
+        job = create_job(db, {"older_than_days": older_than_days})
+    finally:
+        db.close()
+    start_job(job.id)
+
+
+def register_jobs(scheduler: Scheduler):
+    # Startup work, run by whichever process becomes leader rather than by every worker
+    # Re-enrichment jobs interrupted by a restart continue from their last checkpoint
+    scheduler.add_job("reenrich_resume", resume_interrupted_jobs, once=True)
+    # Bookmarks saved before canonical URLs existed get one, so duplicate checks see them
+    scheduler.add_job("canonical_url_backfill", lambda: backfill_canonical_urls(engine), once=True)
+    # Older versions kept deleted bookmarks as JSON files; move them into the trash table
+    scheduler.add_job("legacy_recycle_import", import_legacy_recycle_bin, once=True)
+
+    # Cluster-wide jobs run on the lease holder only
+    scheduler.add_job("trash_purge", run_purge, interval=TRASH_PURGE_INTERVAL, jitter=60)
+    scheduler.add_job("domain_icon_cache_evict", domain_icon_cache.evict_expired,
+                      interval=DOMAIN_ICON_EVICT_INTERVAL, jitter=300)
+    scheduler.add_job("job_queue_prune", job_queue.prune, interval=JOB_PRUNE_INTERVAL, jitter=300)
+    # Bookmarks that never got icons (imports, older versions) are queued a batch at a time
+    scheduler.add_job("enrichment_sweep", sweep_unenriched, interval=ENRICHMENT_SWEEP_INTERVAL, jitter=30)
+    if LINK_CHECK_INTERVAL:
+        # Workers check the pages; every API process relays the changes to its clients
+        scheduler.add_job("link_check_sweep", sweep_link_checks, interval=LINK_CHECK_INTERVAL, jitter=60)
+    scheduler.add_job("preview_purge", preview_store.purge_expired, interval=PREVIEW_PURGE_INTERVAL, jitter=30)
+    # The leader is the embedding index's only writer; other processes reload it read-only
+    scheduler.add_job("embedding_sync", embedding_updater.sync, interval=EMBEDDING_SYNC_INTERVAL, jitter=1)
+    if snapshot_store.enabled:
+        scheduler.add_job("snapshot_dictionary_train", snapshot_store.train_dictionaries,
+                          interval=SNAPSHOT_DICT_TRAIN_INTERVAL, jitter=60)
+    if ICON_GC_CRON:
+        # Only the leader's manifest sees the deletions at once; icon_manifest_refresh updates the others
+        scheduler.add_job("icon_gc", run_icon_gc, cron=ICON_GC_CRON, jitter=300)
+    if DB_OPTIMIZE_CRON:
+        scheduler.add_job("db_optimize", optimize_database, cron=DB_OPTIMIZE_CRON, jitter=300)
+    if METADATA_REFRESH_CRON:
+        scheduler.add_job("metadata_refresh", refresh_stale_metadata, cron=METADATA_REFRESH_CRON)
+    # Every process picks up icons that other processes wrote, and the icon GC deleted
+    scheduler.add_job("icon_manifest_refresh", icon_manifest.refresh, interval=ICON_MANIFEST_REFRESH_INTERVAL,
+                      jitter=10, leader_only=False)
@@ -0,0 +1,376 @@
+import logging
+import math
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.models import ScheduledJob, SchedulerLease, engine
+from app.services.metrics import SCHEDULER_JOB_RUNS
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHEDULER_LEASE_TTL = float(os.getenv("SCHEDULER_LEASE_TTL", 30))  # Seconds a dead leader blocks the others
+SCHEDULER_MAX_WORKERS = int(os.getenv("SCHEDULER_MAX_WORKERS", 4))  # Jobs running at once in one process
+LEASE_NAME = "scheduler"
+
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day-of-month month day-of-week) in UTC.
+
+    Fields take `*`, numbers, ranges, lists and steps (`*/15`, `1-5`, `0,30`). Day-of-week
+    runs 0-6 from Sunday (7 is also Sunday). As in cron, when both day fields are
+    restricted a day matching either one fires; a field starting with `*` (`*/2` too) is not
+    restricted. UTC keeps every host on the same schedule and skips no run at a DST change.
+    """
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = parts[2].startswith("*")
+        self._any_weekday = parts[4].startswith("*")
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for item in field.split(","):
+            spec, _, step = item.partition("/")
+            if spec == "*":
+                start, end = low, high
+            elif "-" in spec:
+                start, end = (int(x) for x in spec.split("-", 1))
+            else:
+                start = end = int(spec)
+                if step:
+                    end = high
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron field {field!r} is outside {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays  # Python counts from Monday
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after `moment`, skipping whole months, days and hours that cannot match."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression {self.expression!r} never fires")
+
+
+class Job:
+    """A registered job: what to run, when, and how it last went.
+
+    A job with `once` has no schedule: it runs as soon as its process becomes leader (or, if
+    not leader-only, starts), e.g. startup work that must not run in every worker.
+    """
+
+    def __init__(self, name: str, fn: Callable[[], object], interval: Optional[float] = None,
+                 cron: Optional[str] = None, jitter: float = 0.0, max_instances: int = 1, leader_only: bool = True,
+                 once: bool = False):
+        if once and (interval is not None or cron is not None):
+            raise ValueError(f"Job {name} runs once; it takes no interval or cron")
+        if not once and (interval is None) == (cron is None):
+            raise ValueError(f"Job {name} needs exactly one of interval or cron")
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.cron = CronSchedule(cron) if cron else None
+        self.jitter = jitter
+        self.max_instances = max_instances
+        self.leader_only = leader_only  # False: runs in every process, e.g. to trim an in-memory cache
+        self.once = once
+        self.next_run: Optional[float] = None  # Epoch seconds
+        self.running = 0
+        self.last_run: Optional[float] = None
+        self.last_status: Optional[str] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def schedule_after(self, last_run: Optional[float], now: float) -> float:
+        """Next start time, given the last one (None if the job never ran anywhere)."""
+        if self.once:
+            return now if last_run is None else math.inf
+        if self.cron is not None:
+            base = datetime.utcfromtimestamp(last_run if last_run is not None else now)
+            due = _utc_to_epoch(self.cron.next_after(base))
+            if last_run is not None and due < now:
+                due = now  # Missed while no process was leader: run once, not once per missed slot
+        else:
+            due = now if last_run is None else max(now, last_run + self.interval)
+        # Spread the start so jobs sharing a schedule (and workers after a restart) do not all fire at once
+        return due + random.uniform(0, self.jitter)
+
+    def describe(self) -> Dict:
+        if self.once:
+            schedule = "once"
+        else:
+            schedule = self.cron.expression if self.cron else f"every {self.interval:g}s"
+        return {
+            "name": self.name,
+            "schedule": schedule,
+            "leader_only": self.leader_only,
+            "running": self.running,
+            "next_run": _utc_iso(self.next_run) if self.next_run not in (None, math.inf) else None,
+            "last_run": _utc_iso(self.last_run) if self.last_run else None,
+            "last_status": self.last_status,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error,
+        }
+
+
+class LeaderLease:
+    """A row in scheduler_leases that one process at a time holds, on SQLite or Postgres.
+
+    Taking or renewing the lease is a single conditional UPDATE (or an INSERT for the first
+    holder), so two processes can never both succeed. A holder that dies stops renewing and
+    another process takes over once the lease expires.
+    """
+
+    def __init__(self, name: str = LEASE_NAME, ttl: float = SCHEDULER_LEASE_TTL, bind=engine, owner: Optional[str] = None):
+        self.name = name
+        self.ttl = ttl
+        self.bind = bind
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; False while another live process holds it."""
+        table = SchedulerLease.__table__
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        try:
+            with self.bind.begin() as conn:
+                result = conn.execute(
+                    update(table)
+                    .where(table.c.name == self.name, or_(table.c.owner == self.owner, table.c.expires_at < now))
+                    .values(owner=self.owner, expires_at=expires_at)
+                )
+                if result.rowcount == 1:
+                    return True
+                if conn.execute(select(table.c.name).where(table.c.name == self.name)).first() is not None:
+                    return False
+                conn.execute(insert(table).values(name=self.name, owner=self.owner, expires_at=expires_at))
+                return True
+        except IntegrityError:
+            return False  # Another process inserted the row first
+        except SQLAlchemyError as e:
+            # A busy database must not leave two leaders; step down until the next attempt
+            logger.warning("Could not renew scheduler lease: %s", e)
+            return False
+
+    def release(self):
+        table = SchedulerLease.__table__
+        try:
+            with self.bind.begin() as conn:
+                conn.execute(
+                    update(table)
+                    .where(table.c.name == self.name, table.c.owner == self.owner)
+                    .values(expires_at=datetime.utcnow())
+                )
+        except SQLAlchemyError as e:
+            logger.warning("Could not release scheduler lease: %s", e)
+
+
+class Scheduler:
+    """In-process scheduler for interval and cron jobs, started from the app lifespan.
+
+    Every process (e.g. each gunicorn worker) runs one, but only the holder of the leader
+    lease starts leader-only jobs, so they run once cluster-wide. Job state lives in
+    scheduled_jobs, so a new leader continues where the old one stopped. A job never runs more
+    than max_instances times at once; a run that comes due while it is still busy is skipped.
+    """
+
+    def __init__(self, lease: Optional[LeaderLease] = None, max_workers: int = SCHEDULER_MAX_WORKERS,
+                 clock: Callable[[], float] = time.time):
+        self.lease = lease or LeaderLease()
+        self.max_workers = max_workers
+        self.clock = clock
+        self.is_leader = False
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._next_lease_check = 0.0
+
+    def add_job(self, name: str, fn: Callable[[], object], **options) -> Job:
+        job = Job(name, fn, **options)
+        with self._lock:
+            self._jobs[name] = job
+        return job
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _load_state(self) -> Dict[str, Optional[float]]:
+        table = ScheduledJob.__table__
+        try:
+            with self.lease.bind.connect() as conn:
+                rows = conn.execute(select(table.c.name, table.c.last_run_at)).all()
+        except SQLAlchemyError as e:
+            logger.warning("Could not load scheduled job state: %s", e)
+            return {}
+        return {name: _utc_to_epoch(last_run) for name, last_run in rows if last_run is not None}
+
+    def _save_state(self, job: Job):
+        table = ScheduledJob.__table__
+        values = {
+            "last_run_at": datetime.utcfromtimestamp(job.last_run),
+            "last_status": job.last_status,
+            "last_duration_ms": job.last_duration_ms,
+            "last_error": job.last_error,
+            "last_owner": self.lease.owner,
+        }
+        try:
+            with self.lease.bind.begin() as conn:
+                if conn.execute(update(table).where(table.c.name == job.name).values(**values)).rowcount == 0:
+                    conn.execute(insert(table).values(name=job.name, **values))
+        except SQLAlchemyError as e:
+            logger.warning("Could not record run of job %s: %s", job.name, e)
+
+    def _refresh_leadership(self, now: float):
+        leader = self.lease.acquire()
+        if leader and not self.is_leader:
+            logger.info("Scheduler became leader as %s", self.lease.owner)
+            last_runs = self._load_state()
+            for job in self.jobs():
+                if job.leader_only and job.once:
+                    job.next_run = now  # Once per leadership, so a new leader redoes what a dead one may not have
+                elif job.leader_only:
+                    job.last_run = last_runs.get(job.name, job.last_run)
+                    job.next_run = job.schedule_after(job.last_run, now)
+        elif self.is_leader and not leader:
+            logger.warning("Scheduler lost leadership; leader-only jobs stop here")
+        self.is_leader = leader
+
+    def tick(self) -> float:
+        """Renew the lease when due and start due jobs; returns seconds until the next thing to do."""
+        now = self.clock()
+        if now >= self._next_lease_check:
+            self._refresh_leadership(now)
+            self._next_lease_check = now + self.lease.ttl / 3
+        wake_at = self._next_lease_check
+        for job in self.jobs():
+            if job.leader_only and not self.is_leader:
+                continue
+            if job.next_run is None:
+                job.next_run = job.schedule_after(job.last_run, now)
+            if job.next_run <= now:
+                self._launch(job, now)
+            wake_at = min(wake_at, job.next_run)
+        return max(wake_at - self.clock(), 0.0)
+
+    def _launch(self, job: Job, now: float):
+        job.next_run = math.inf if job.once else job.schedule_after(now, now)
+        with self._lock:
+            if job.running >= job.max_instances:
+                logger.warning("Skipping run of %s: %d still running", job.name, job.running)
+                SCHEDULER_JOB_RUNS.inc(job=job.name, status="skipped")
+                return
+            job.running += 1
+        if self._executor is None:
+            self._execute(job, now)
+        else:
+            self._executor.submit(self._execute, job, now)
+
+    def _execute(self, job: Job, started: float):
+        start = time.perf_counter()
+        try:
+            job.fn()
+            job.last_status, job.last_error = "ok", None
+        except Exception as e:
+            job.last_status, job.last_error = "error", f"{type(e).__name__}: {e}"
+            logger.error("Scheduled job %s failed: %s", job.name, e, exc_info=True)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                job.running -= 1
+            job.last_run = started
+            job.last_duration_ms = round(elapsed * 1000, 1)
+            SCHEDULER_JOB_RUNS.inc(job=job.name, status=job.last_status)
+        logger.info("Scheduled job %s finished (%s) in %.1f ms", job.name, job.last_status, job.last_duration_ms)
+        if job.leader_only:
+            self._save_state(job)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                delay = self.tick()
+            except Exception as e:
+                logger.error("Scheduler tick failed: %s", e, exc_info=True)
+                delay = self.lease.ttl / 3
+            self._stopped.wait(min(delay, self.lease.ttl / 3))
+
+    def start(self):
+        if self._thread is not None or not SCHEDULER_ENABLED:
+            return
+        self._stopped.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scheduled-job")
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop starting jobs and hand the lease over; running jobs finish in the background."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self.is_leader:
+            self.lease.release()
+            self.is_leader = False
+
+    def status(self) -> Dict:
+        return {
+            "enabled": SCHEDULER_ENABLED,
+            "owner": self.lease.owner,
+            "leader": self.is_leader,
+            "jobs": [job.describe() for job in self.jobs()],
+        }
+
+
+def _utc_to_epoch(moment: datetime) -> float:
+    return (moment - datetime(1970, 1, 1)).total_seconds()
+
+
+def _utc_iso(timestamp: float) -> str:
+    # Same clock as the cron schedules, with the offset spelled out
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+scheduler = Scheduler()
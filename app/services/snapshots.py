@@ -0,0 +1,370 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.lazy_imports import lazy_module
+from app.models import Bookmark, PageSnapshot, SessionLocal, SnapshotBlob, SnapshotDictionary, TrashedBookmark
+from app.services.url_canonical import canonicalize
+
+logger = logging.getLogger(__name__)
+
+bs4 = lazy_module("bs4")
+
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "").lower() in ("1", "true", "yes")
+SNAPSHOT_RAW_HTML = os.getenv("SNAPSHOT_RAW_HTML", "").lower() in ("1", "true", "yes")  # Also keep the page HTML
+SNAPSHOT_MAX_TEXT = int(os.getenv("SNAPSHOT_MAX_TEXT", 200_000))  # Characters of main text kept per page
+SNAPSHOT_DICT_MIN_SAMPLES = int(os.getenv("SNAPSHOT_DICT_MIN_SAMPLES", 100))  # Pages stored before a dictionary is trained
+SNAPSHOT_DICT_SIZE = int(os.getenv("SNAPSHOT_DICT_SIZE", 64 * 1024))
+SNAPSHOT_DICT_TRAIN_INTERVAL = int(os.getenv("SNAPSHOT_DICT_TRAIN_INTERVAL", 600))  # Seconds between training checks
+SNAPSHOT_EXCERPT_CHARS = 2000  # Page text appended to what the search index and tagger see
+ZSTD_LEVEL = 9
+ZLIB_DICT_SIZE = 32 * 1024  # zlib only looks back 32 KB, so a longer preset dictionary is wasted
+DICT_MAX_SAMPLES = 1000
+DICT_RETRAIN_FACTOR = 8  # Retrain once the store has grown this many times since the last training
+DICT_CHECK_INTERVAL = 60  # Seconds before a process notices a dictionary the scheduler leader trained
+
+# Removed before looking for the main content; they rarely hold the article itself
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "iframe"]
+MIN_PARAGRAPH_CHARS = 25
+MIN_CONTENT_CHARS = 200  # Below this the best container is a guess; the whole body is kept instead
+_WHITESPACE = re.compile(r"[ \t\r\f\v\u00a0]+")
+
+
+@lru_cache(maxsize=None)
+def _zstandard():
+    """The optional zstandard package, or None; snapshots fall back to zlib without it."""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def default_codec() -> str:
+    return "zstd" if _zstandard() is not None else "zlib"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _main_container(soup):
+    articles = soup.find_all("article") or soup.find_all("main") or soup.find_all(attrs={"role": "main"})
+    if articles:
+        return max(articles, key=lambda tag: len(tag.get_text(" ", strip=True)))
+    # Readability-style scoring: paragraphs vote for their parent, and half as much for its parent
+    scores: Dict[int, float] = Counter()
+    containers = {}
+    for paragraph in soup.find_all(["p", "pre"]):
+        length = len(paragraph.get_text(" ", strip=True))
+        if length < MIN_PARAGRAPH_CHARS:
+            continue
+        for container, weight in ((paragraph.parent, 1.0), (paragraph.parent and paragraph.parent.parent, 0.5)):
+            if container is not None:
+                scores[id(container)] += length * weight
+                containers[id(container)] = container
+    if scores:
+        best, score = max(scores.items(), key=lambda item: item[1])
+        if score >= MIN_CONTENT_CHARS:
+            return containers[best]
+    return soup.body or soup
+
+
+def extract_main_text(html: str, max_chars: int = SNAPSHOT_MAX_TEXT) -> str:
+    """Readable main text of a page: navigation, scripts and other boilerplate removed, one block per line."""
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    lines = []
+    for line in _main_container(soup).get_text("\n").splitlines():
+        line = _WHITESPACE.sub(" ", line).strip()
+        if line and (not lines or lines[-1] != line):
+            lines.append(line)
+    return "\n".join(lines)[:max_chars]
+
+
+def _train_zlib_dictionary(samples: List[bytes], size: int = ZLIB_DICT_SIZE) -> bytes:
+    """Preset dictionary of the lines shared by most samples.
+
+    zlib has no trainer; repeated boilerplate (menus, footers, markup) is what a dictionary
+    saves, so lines seen in several samples are kept, the most useful last where zlib's
+    back-references are shortest.
+    """
+    seen = Counter()
+    for sample in samples:
+        seen.update({line for line in re.split(rb"(?<=[\n>])", sample) if len(line.strip()) >= 8})
+    shared = [(count * len(line), line) for line, count in seen.items() if count > 1]
+    shared.sort()
+    picked, total = [], 0
+    for _, line in reversed(shared):
+        if total + len(line) > size:
+            continue
+        picked.append(line)
+        total += len(line)
+    return b"".join(reversed(picked))
+
+
+def train_dictionary(codec: str, samples: List[bytes], size: int = SNAPSHOT_DICT_SIZE) -> Optional[bytes]:
+    if codec == "zstd":
+        zstandard = _zstandard()
+        try:
+            return zstandard.train_dictionary(size, samples).as_bytes()
+        except zstandard.ZstdError as e:  # Too few or too similar samples
+            logger.warning("Could not train a snapshot dictionary: %s", e)
+            return None
+    dictionary = _train_zlib_dictionary(samples, min(size, ZLIB_DICT_SIZE))
+    return dictionary or None
+
+
+def compress(codec: str, data: bytes, dictionary: Optional[bytes] = None) -> bytes:
+    if codec == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError("zstd snapshots require the optional zstandard package")
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data).compress(data)
+    compressor = zlib.compressobj(9, zdict=dictionary) if dictionary else zlib.compressobj(9)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(codec: str, data: bytes, dictionary: Optional[bytes] = None) -> bytes:
+    if codec == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError("zstd snapshots require the optional zstandard package")
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data)
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+class SnapshotStore:
+    """Compressed, deduplicated page snapshots in the database.
+
+    Each page's main text (and optionally its HTML) is one row in snapshot_blobs, keyed by
+    content hash, so identical pages are stored once and a snapshot is read with a primary-key
+    lookup. Once enough pages are stored, a compression dictionary is trained on them: pages
+    from the same sites share most of their boilerplate, which a dictionary stores only once.
+    Training is a scheduled job (train_dictionaries), so saving a page never waits for it.
+    """
+
+    def __init__(self, enabled: bool = SNAPSHOTS_ENABLED, keep_html: bool = SNAPSHOT_RAW_HTML,
+                 codec: Optional[str] = None, min_samples: int = SNAPSHOT_DICT_MIN_SAMPLES):
+        self.enabled = enabled
+        self.keep_html = keep_html
+        self.codec = codec or default_codec()
+        self.min_samples = min_samples
+        self._dictionaries: Dict[int, bytes] = {}  # Immutable once written, so cached forever
+        # (kind, codec) -> (current dictionary id, blobs stored when it was trained)
+        self._current: Dict[Tuple[str, str], Tuple[Optional[int], int]] = {}
+        self._checked: Dict[Tuple[str, str], float] = {}  # When _current was last read from the database
+        self._lock = threading.Lock()
+
+    def capture(self, html: str) -> Optional[Dict]:
+        """What to snapshot from a fetched page, or None when snapshots are off or the page has no text."""
+        if not self.enabled:
+            return None
+        text = extract_main_text(html)
+        if not text:
+            return None
+        return {"text": text, "html": html if self.keep_html else None}
+
+    def _dictionary(self, db: Session, dictionary_id: int) -> bytes:
+        with self._lock:
+            cached = self._dictionaries.get(dictionary_id)
+        if cached is None:
+            cached = db.execute(
+                select(SnapshotDictionary.data).where(SnapshotDictionary.id == dictionary_id)
+            ).scalar_one()
+            with self._lock:
+                self._dictionaries[dictionary_id] = cached
+        return cached
+
+    def _current_dictionary(self, db: Session, kind: str) -> Tuple[Optional[int], int]:
+        key = (kind, self.codec)
+        with self._lock:
+            if key in self._current and time.monotonic() - self._checked.get(key, 0) < DICT_CHECK_INTERVAL:
+                return self._current[key]
+        row = db.execute(
+            select(SnapshotDictionary.id, SnapshotDictionary.blob_count)
+            .where(SnapshotDictionary.kind == kind, SnapshotDictionary.codec == self.codec)
+            .order_by(SnapshotDictionary.id.desc())
+            .limit(1)
+        ).first()
+        current = (row.id, row.blob_count) if row else (None, 0)
+        with self._lock:
+            # Unless a newer dictionary appeared, keep a failed training's count so it waits for growth
+            if key not in self._current or self._current[key][0] != current[0]:
+                self._current[key] = current
+            self._checked[key] = time.monotonic()
+            return self._current[key]
+
+    def _put_blob(self, db: Session, kind: str, content: str) -> str:
+        data = content.encode("utf-8")
+        digest = content_hash(data)
+        if db.get(SnapshotBlob, digest) is not None:
+            return digest
+        dictionary_id, _ = self._current_dictionary(db, kind)
+        dictionary = self._dictionary(db, dictionary_id) if dictionary_id else None
+        db.add(SnapshotBlob(
+            hash=digest, kind=kind, codec=self.codec, dictionary_id=dictionary_id,
+            raw_size=len(data), data=compress(self.codec, data, dictionary),
+        ))
+        return digest
+
+    def _read_blob(self, db: Session, blob: SnapshotBlob) -> str:
+        dictionary = self._dictionary(db, blob.dictionary_id) if blob.dictionary_id else None
+        return decompress(blob.codec, blob.data, dictionary).decode("utf-8")
+
+    def save(self, db: Session, canonical_url: str, url: str, text: str, html: Optional[str] = None) -> PageSnapshot:
+        """Store or replace the snapshot of a page; the caller commits."""
+        text_hash = self._put_blob(db, "text", text)
+        html_hash = self._put_blob(db, "html", html) if html else None
+        snapshot = db.get(PageSnapshot, canonical_url)
+        if snapshot is None:
+            snapshot = PageSnapshot(canonical_url=canonical_url)
+            db.add(snapshot)
+        snapshot.url = url
+        snapshot.text_hash = text_hash
+        snapshot.html_hash = html_hash
+        snapshot.text_size = len(text)
+        snapshot.captured_at = datetime.now()
+        db.flush()
+        return snapshot
+
+    def save_fetched(self, db: Session, canonical_url: str, url: str, snapshot: Dict) -> bool:
+        """Store a snapshot captured by the metadata fetcher and commit.
+
+        Runs after the bookmark itself is committed; a failure is logged and costs only the snapshot.
+        """
+        try:
+            self.save(db, canonical_url, url, snapshot["text"], snapshot.get("html"))
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to store snapshot of {url}: {str(e)}")
+            return False
+
+    def train_dictionaries(self, db: Optional[Session] = None) -> List[int]:
+        """Train the dictionaries that are due and commit; returns the new ids. Runs on the scheduler leader."""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            trained = [row_id for row_id in (self.maybe_train(db, kind) for kind in ("text", "html")) if row_id]
+            db.commit()
+            return trained
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            if own_session:
+                db.close()
+
+    def maybe_train(self, db: Session, kind: str) -> Optional[int]:
+        """Train a dictionary for new blobs of a kind once there are enough samples; returns its id."""
+        current_id, trained_at = self._current_dictionary(db, kind)
+        count = db.execute(select(func.count()).select_from(SnapshotBlob).where(SnapshotBlob.kind == kind)).scalar_one()
+        if count < self.min_samples or (trained_at and count < trained_at * DICT_RETRAIN_FACTOR):
+            return None
+        blobs = db.query(SnapshotBlob).filter(SnapshotBlob.kind == kind).limit(DICT_MAX_SAMPLES)
+        samples = [self._read_blob(db, blob).encode("utf-8") for blob in blobs]
+        dictionary = train_dictionary(self.codec, samples)
+        if dictionary is None:
+            with self._lock:  # Retry only after the store has grown
+                self._current[(kind, self.codec)] = (current_id, count)
+            return None
+        row = SnapshotDictionary(kind=kind, codec=self.codec, blob_count=count, data=dictionary)
+        db.add(row)
+        db.flush()
+        with self._lock:
+            self._dictionaries[row.id] = dictionary
+            self._current[(kind, self.codec)] = (row.id, count)
+        logger.info("Trained a %d-byte %s dictionary for %s snapshots on %d samples", len(dictionary), self.codec, kind, len(samples))
+        return row.id
+
+    def get(self, db: Session, canonical_url: str) -> Optional[PageSnapshot]:
+        return db.get(PageSnapshot, canonical_url)
+
+    def read(self, db: Session, content_hash: Optional[str]) -> Optional[str]:
+        if not content_hash:
+            return None
+        blob = db.get(SnapshotBlob, content_hash)
+        return self._read_blob(db, blob) if blob is not None else None
+
+    def excerpts(self, bookmark_ids: Iterable[int], chars: int = SNAPSHOT_EXCERPT_CHARS,
+                 db: Optional[Session] = None) -> Dict[int, str]:
+        """The first `chars` characters of page text for the bookmarks that have a snapshot."""
+        bookmark_ids = list(bookmark_ids)
+        if not bookmark_ids:
+            return {}
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            excerpts = {}
+            for start in range(0, len(bookmark_ids), 500):
+                rows = db.execute(
+                    select(Bookmark.id, SnapshotBlob)
+                    .join(PageSnapshot, PageSnapshot.canonical_url == Bookmark.canonical_url)
+                    .join(SnapshotBlob, SnapshotBlob.hash == PageSnapshot.text_hash)
+                    .where(Bookmark.id.in_(bookmark_ids[start:start + 500]))
+                )
+                for bookmark_id, blob in rows:
+                    excerpts[bookmark_id] = self._read_blob(db, blob)[:chars]
+            return excerpts
+        finally:
+            if own_session:
+                db.close()
+
+    def collect_garbage(self, db: Session) -> int:
+        """Delete snapshots of pages no bookmark or trash entry refers to, then unreferenced blobs.
+
+        Flushes but does not commit.
+        """
+        referenced = {url for (url,) in db.execute(select(Bookmark.canonical_url).where(Bookmark.canonical_url.is_not(None)))}
+        for url, data in db.execute(select(TrashedBookmark.url, TrashedBookmark.data)):
+            referenced.add(json.loads(data).get("canonical_url") or canonicalize(url))
+        stale = [url for (url,) in db.execute(select(PageSnapshot.canonical_url)) if url not in referenced]
+        for start in range(0, len(stale), 500):
+            db.execute(delete(PageSnapshot).where(PageSnapshot.canonical_url.in_(stale[start:start + 500])))
+        used = select(PageSnapshot.text_hash).union(
+            select(PageSnapshot.html_hash).where(PageSnapshot.html_hash.is_not(None))
+        )
+        blobs = db.execute(delete(SnapshotBlob).where(SnapshotBlob.hash.not_in(used))).rowcount
+        db.flush()
+        if stale or blobs:
+            logger.info("Removed %d unreferenced snapshots and %d blobs", len(stale), blobs)
+        return len(stale)
+
+    def stats(self, db: Session) -> Dict:
+        """Stored versus uncompressed bytes, for benchmarks and diagnostics."""
+        snapshots = db.execute(select(func.count()).select_from(PageSnapshot)).scalar_one()
+        blobs, raw, stored = db.execute(
+            select(func.count(), func.coalesce(func.sum(SnapshotBlob.raw_size), 0),
+                   func.coalesce(func.sum(func.length(SnapshotBlob.data)), 0))
+        ).one()
+        dictionaries = db.execute(
+            select(func.coalesce(func.sum(func.length(SnapshotDictionary.data)), 0))
+        ).scalar_one()
+        return {
+            "snapshots": snapshots,
+            "blobs": blobs,
+            "raw_bytes": raw,
+            "stored_bytes": stored + dictionaries,
+            "codec": self.codec,
+        }
+
+
+snapshot_store = SnapshotStore()
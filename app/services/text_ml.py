@@ -0,0 +1,22 @@
+from app.lazy_imports import lazy_module
+
+# scikit-learn (and scipy under it) costs over a second to import, so it is loaded on first use
+_text = lazy_module("sklearn.feature_extraction.text")
+_cluster = lazy_module("sklearn.cluster")
+_pairwise = lazy_module("sklearn.metrics.pairwise")
+
+
+def tfidf_vectorizer(**kwargs):
+    return _text.TfidfVectorizer(**kwargs)
+
+
+def hashing_vectorizer(**kwargs):
+    return _text.HashingVectorizer(**kwargs)
+
+
+def kmeans(**kwargs):
+    return _cluster.KMeans(**kwargs)
+
+
+def cosine_similarity(a, b):
+    return _pairwise.cosine_similarity(a, b)
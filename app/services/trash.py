@@ -0,0 +1,291 @@
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.models import Bookmark, SessionLocal, TrashedBookmark
+from app.services.domain_icon_cache import domain_icon_cache
+from app.services.icon_manifest import icon_manifest
+from app.services.snapshots import snapshot_store
+from app.services.url_canonical import canonicalize
+
+logger = logging.getLogger(__name__)
+
+TRASH_RETENTION_DAYS = float(os.getenv("TRASH_RETENTION_DAYS", 30))  # Deleted bookmarks are purged after this
+TRASH_PURGE_INTERVAL = float(os.getenv("TRASH_PURGE_INTERVAL", 3600))  # Seconds between purge runs
+ICON_GC_GRACE_HOURS = float(os.getenv("ICON_GC_GRACE_HOURS", 24))  # Newer unreferenced icons may belong to a bookmark being saved
+APP_DIR = Path("app")
+ICON_DIR = APP_DIR / "static" / "icons"
+LEGACY_RECYCLE_DIR = Path("app/static/recycled_bookmarks")
+LEGACY_ICON_DIR = Path("app/static/recycled_icons")
+LEGACY_CLAIM_STALE = 600  # Seconds after which a file claimed by an importer that died is retried
+DEFAULT_FAVICON = "/static/favicon.ico"
+
+_DATETIME_COLUMNS = ("last_used", "created_at", "updated_at")
+
+
+class TrashConflict(Exception):
+    """The bookmark cannot be restored because its URL is in use again."""
+
+
+def snapshot(bookmark: Bookmark) -> Dict:
+    """Every column of a bookmark as JSON-safe values, so a restore is lossless."""
+    data = {}
+    for column in Bookmark.__table__.columns:
+        value = getattr(bookmark, column.name)
+        data[column.name] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+
+def _icon_paths(data: Dict) -> List[str]:
+    icons = [data.get("webicon")]
+    candidates = data.get("icon_candidates")
+    if isinstance(candidates, str):
+        candidates = candidates.split(",")
+    icons.extend(candidates or [])
+    return [icon for icon in dict.fromkeys(icons) if icon and icon != DEFAULT_FAVICON]
+
+
+def trash_bookmarks(db: Session, snapshots: Iterable[Dict], deleted_at: Optional[datetime] = None) -> int:
+    """Add snapshots of bookmarks being deleted to the trash; the caller commits."""
+    deleted_at = deleted_at or datetime.now()
+    rows = [
+        {
+            "bookmark_id": data["id"],
+            "url": data["url"],
+            "title": data.get("title"),
+            "data": json.dumps(data),
+            "deleted_at": deleted_at,
+        }
+        for data in snapshots
+    ]
+    if rows:
+        db.execute(TrashedBookmark.__table__.insert(), rows)
+    return len(rows)
+
+
+def list_trash(db: Session, limit: int = 50, offset: int = 0) -> Tuple[int, List[TrashedBookmark]]:
+    """Most recently deleted first; ordered and paged on the deleted_at index."""
+    total = db.execute(select(func.count()).select_from(TrashedBookmark)).scalar_one()
+    items = (
+        db.query(TrashedBookmark)
+        .order_by(TrashedBookmark.deleted_at.desc(), TrashedBookmark.id.desc())
+        .limit(limit)
+        .offset(offset)
+        .all()
+    )
+    return total, items
+
+
+def _restore_icon(icon: str) -> bool:
+    """Whether an icon referenced by a trashed bookmark is (again) in place.
+
+    Icons stay where they were on delete. Bookmarks trashed by older versions had theirs moved
+    to recycled_icons/<domain>, so those are moved back.
+    """
+    # Restores are rare, so ask the filesystem: another process may have written or moved the file
+    target = Path("app") / icon.lstrip("/")
+    if target.is_file():
+        icon_manifest.add(target)
+        return True
+    recycled = LEGACY_ICON_DIR / target.parent.name / target.name
+    if not recycled.is_file():
+        return False
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        recycled.replace(target)
+        icon_manifest.move(recycled, target)
+        return True
+    except OSError as e:
+        logger.warning("Failed to restore icon %s: %s", icon, e)
+        return False
+
+
+def restore(db: Session, trash_id: int) -> Optional[Bookmark]:
+    """Re-create a trashed bookmark and drop it from the trash; None if there is no such entry."""
+    entry = db.query(TrashedBookmark).filter(TrashedBookmark.id == trash_id).first()
+    if entry is None:
+        return None
+    data = json.loads(entry.data)
+    canonical_url = canonicalize(entry.url)  # Older snapshots lack the column or hold a fetched canonical
+    if db.query(Bookmark.id).filter(or_(Bookmark.url == entry.url, Bookmark.canonical_url == canonical_url)).first():
+        raise TrashConflict(f"A bookmark for {entry.url} already exists")
+    columns = {column.name for column in Bookmark.__table__.columns}
+    fields = {k: v for k, v in data.items() if k in columns}
+    fields["canonical_url"] = canonical_url
+    for name in _DATETIME_COLUMNS:
+        if fields.get(name):
+            fields[name] = datetime.fromisoformat(fields[name])
+    for name in ("tags", "icon_candidates"):
+        if isinstance(fields.get(name), list):  # Legacy backups stored these as lists
+            fields[name] = ",".join(fields[name]) or None
+    if isinstance(fields.get("extra_metadata"), dict):
+        fields["extra_metadata"] = json.dumps(fields["extra_metadata"]) if fields["extra_metadata"] else None
+
+    restored_icons = [icon for icon in _icon_paths(fields) if _restore_icon(icon)]
+    if fields.get("webicon") not in restored_icons:
+        fields["webicon"] = restored_icons[0] if restored_icons else DEFAULT_FAVICON
+    fields["icon_candidates"] = ",".join(restored_icons) or None
+    if db.query(Bookmark.id).filter(Bookmark.id == entry.bookmark_id).first():
+        fields.pop("id", None)  # Id taken by a newer bookmark
+    else:
+        fields["id"] = entry.bookmark_id
+    fields["updated_at"] = datetime.now()
+
+    bookmark = Bookmark(**fields)
+    db.add(bookmark)
+    db.delete(entry)
+    db.flush()
+    return bookmark
+
+
+def _referenced_icons(db: Session) -> set:
+    referenced = set()
+    for webicon, candidates in db.query(Bookmark.webicon, Bookmark.icon_candidates):
+        referenced.update(_icon_paths({"webicon": webicon, "icon_candidates": candidates}))
+    for (data,) in db.query(TrashedBookmark.data):
+        referenced.update(_icon_paths(json.loads(data)))
+    return referenced
+
+
+def purge_expired(db: Session, retention_days: float = TRASH_RETENTION_DAYS, now: Optional[datetime] = None) -> int:
+    """Permanently delete trash entries older than the retention period, and icons and snapshots only they used.
+
+    Commits, since icon files are removed once the rows are gone.
+    """
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+    expired = db.query(TrashedBookmark.id, TrashedBookmark.data).filter(TrashedBookmark.deleted_at < cutoff).all()
+    if not expired:
+        return 0
+    icons = set()
+    for _, data in expired:
+        icons.update(_icon_paths(json.loads(data)))
+    db.execute(delete(TrashedBookmark).where(TrashedBookmark.deleted_at < cutoff))
+    db.flush()
+    orphaned = icons - _referenced_icons(db)
+    snapshot_store.collect_garbage(db)
+    db.commit()
+    for icon in orphaned:
+        path = Path("app") / icon.lstrip("/")
+        try:
+            path.unlink()
+            icon_manifest.remove(path)
+        except FileNotFoundError:
+            icon_manifest.remove(path)
+        except OSError as e:
+            logger.warning("Failed to delete icon %s of purged bookmark: %s", path, e)
+    logger.info("Purged %d bookmarks deleted before %s", len(expired), cutoff.isoformat())
+    return len(expired)
+
+
+def _claim_legacy_file(path: Path) -> Optional[Path]:
+    """Rename a file to a name only this process knows; None if another process got there first."""
+    claimed = path.with_name(f"{path.name.split('.json')[0]}.json.importing-{socket.gethostname()}-{os.getpid()}")
+    try:
+        path.rename(claimed)
+    except FileNotFoundError:
+        return None
+    return claimed
+
+
+def _legacy_files(directory: Path) -> List[Path]:
+    stale = time.time() - LEGACY_CLAIM_STALE
+    files = list(directory.glob("*.json"))
+    for path in directory.glob("*.json.importing-*"):
+        try:
+            if path.stat().st_mtime < stale:
+                files.append(path)  # Its importer died before finishing
+        except FileNotFoundError:
+            pass
+    return sorted(files)
+
+
+def import_legacy_recycle_bin(directory: Path = LEGACY_RECYCLE_DIR) -> int:
+    """Move JSON backups written by older versions into the trash table, once.
+
+    Each file is claimed with an atomic rename before it is read, so processes starting at the
+    same time never import the same file twice.
+    """
+    if not directory.is_dir():
+        return 0
+    imported = 0
+    db = SessionLocal()
+    try:
+        for path in _legacy_files(directory):
+            claimed = _claim_legacy_file(path)
+            if claimed is None:
+                continue
+            try:
+                items = json.loads(claimed.read_text())
+                items = items if isinstance(items, list) else [items]
+                for data in items:
+                    deleted_at = datetime.fromisoformat(data["deleted_at"]) if data.get("deleted_at") else None
+                    trash_bookmarks(db, [data], deleted_at)
+                db.commit()
+                claimed.unlink()
+                imported += len(items)
+            except Exception as e:
+                db.rollback()
+                logger.warning("Skipping unreadable recycle-bin file %s: %s", path, e)
+                # Leave it where the next start looks, unless another importer has it by now
+                original = claimed.with_name(claimed.name.split(".json")[0] + ".json")
+                try:
+                    if not original.exists():
+                        claimed.rename(original)
+                except OSError:
+                    pass
+    finally:
+        db.close()
+    if imported:
+        logger.info("Imported %d bookmarks from %s into the trash", imported, directory)
+    return imported
+
+
+def run_purge() -> int:
+    """Scheduled job: purge expired trash entries."""
+    db = SessionLocal()
+    try:
+        return purge_expired(db)
+    finally:
+        db.close()
+
+
+def collect_orphan_icons(db: Session, grace_hours: float = ICON_GC_GRACE_HOURS, directory: Path = ICON_DIR,
+                         app_dir: Path = APP_DIR) -> int:
+    """Delete icon files that no bookmark, trash entry or domain icon cache entry refers to.
+
+    Catches icons left behind by failed saves, replaced icons and previews that were never
+    committed. Files younger than the grace period are kept.
+    """
+    if not directory.is_dir():
+        return 0
+    referenced = {icon.lstrip("/") for icon in _referenced_icons(db) | domain_icon_cache.icon_paths()}
+    cutoff = time.time() - grace_hours * 3600
+    removed = 0
+    for path in directory.rglob("*"):
+        try:
+            if not path.is_file() or path.relative_to(app_dir).as_posix() in referenced or path.stat().st_mtime > cutoff:
+                continue
+            path.unlink()
+            icon_manifest.remove(path)
+            removed += 1
+        except OSError as e:
+            logger.warning("Failed to delete orphaned icon %s: %s", path, e)
+    if removed:
+        logger.info("Deleted %d icons no bookmark refers to", removed)
+    return removed
+
+
+def run_icon_gc() -> int:
+    db = SessionLocal()
+    try:
+        return collect_orphan_icons(db)
+    finally:
+        db.close()
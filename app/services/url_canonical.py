@@ -0,0 +1,136 @@
+import logging
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from sqlalchemy import bindparam, select, update
+
+from app.models import Bookmark
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that identify a campaign or click rather than the page
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "oly_anon_id", "oly_enc_id", "vero_id", "ref_src", "spm",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+BACKFILL_BATCH = 5000
+_PERCENT_ESCAPE = re.compile(r"%[0-9a-fA-F]{2}")
+# Paths a redirect ends on for pages that need a session; they say nothing about which page it was
+_LOGIN_PATH = re.compile(r"/(log-?in|sign-?in|auth|sso|session|account/login|users/sign_in)(/|$|\?)", re.IGNORECASE)
+
+
+def _is_tracking(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def normalize_case(url: str) -> str:
+    """Add a missing scheme and lowercase only the scheme and host; paths can be case-sensitive."""
+    if not url.lower().startswith(("http://", "https://")):
+        url = "https://" + url
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, parts.fragment))
+
+
+def with_scheme(url: str) -> str:
+    """The URL with https:// added when it has none, e.g. for an absolute redirect to "example.com/page"."""
+    url = url.strip()
+    return url if "://" in url else "https://" + url.lstrip("/")
+
+
+def canonicalize(url: str) -> str:
+    """Identity key for a page: equal for URLs that differ only in ways that never change the content.
+
+    http and https, a leading "www.", default ports, tracking parameters, query order, a trailing
+    slash and the fragment are ignored (hash-bang routes such as "#!/page" are kept).
+    """
+    try:
+        parts = urlsplit(normalize_case(url.strip()))
+        port = parts.port
+    except ValueError:  # Malformed host or port; only exact matches can be found
+        return url.strip()
+    host = parts.hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    if port and str(port) == DEFAULT_PORTS.get(parts.scheme):
+        port = None
+    netloc = f"[{host}]" if ":" in host else host  # IPv6
+    if port:
+        netloc += f":{port}"
+
+    path = _PERCENT_ESCAPE.sub(lambda m: m.group(0).upper(), parts.path) or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+    params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(k)]
+    query = urlencode(sorted(params))
+    fragment = parts.fragment if parts.fragment.startswith(("!", "/")) else ""
+    return urlunsplit(("https", netloc, path, query, fragment))
+
+
+def resolve_canonical(requested_url: str, final_url: Optional[str], link_canonical: Optional[str]) -> str:
+    """Canonical URL of a fetched page: its <link rel=canonical> if that stays on the same site,
+    otherwise wherever redirects ended up."""
+    base = final_url or requested_url
+    if link_canonical:
+        candidate = urljoin(base, link_canonical.strip())
+        if urlsplit(candidate).scheme in ("http", "https"):
+            canonical = canonicalize(candidate)
+            if urlsplit(canonical).netloc == urlsplit(canonicalize(base)).netloc:
+                return canonical
+            logger.debug("Ignoring cross-site rel=canonical %s for %s", candidate, base)
+    return canonicalize(base)
+
+
+def canonical_hint(requested_url: str, fetched_canonical: Optional[str]) -> Optional[str]:
+    """The fetched canonical URL if it is worth keeping as a duplicate hint, else None.
+
+    Only a different page on the same host counts: a redirect to the site root or to a login
+    page happens to many unrelated URLs and would group them all together.
+    """
+    if not fetched_canonical:
+        return None
+    requested = canonicalize(requested_url)
+    hint = canonicalize(fetched_canonical)
+    parts = urlsplit(hint)
+    if hint == requested or parts.netloc != urlsplit(requested).netloc:
+        return None
+    if (parts.path == "/" and not parts.query) or _LOGIN_PATH.search(parts.path):
+        return None
+    return hint
+
+
+def backfill_canonical_urls(bind) -> int:
+    """Fill canonical_url for bookmarks saved before the column existed, and repair rows whose
+    canonical_url came from a fetched page rather than the bookmark's own URL."""
+    table = Bookmark.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(canonical_url=bindparam("b_url"), canonical_hint=bindparam("b_hint"))
+    )
+    filled = 0
+    last_id = 0
+    with bind.begin() as conn:
+        while True:
+            rows = conn.execute(
+                select(table.c.id, table.c.url, table.c.canonical_url, table.c.canonical_hint)
+                .where(table.c.id > last_id).order_by(table.c.id).limit(BACKFILL_BATCH)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            changed = []
+            for row in rows:
+                canonical = canonicalize(row.url)
+                if row.canonical_url != canonical:
+                    hint = row.canonical_hint or canonical_hint(row.url, row.canonical_url)
+                    changed.append({"b_id": row.id, "b_url": canonical, "b_hint": hint})
+            if changed:
+                conn.execute(statement, changed)
+                filled += len(changed)
+    if filled:
+        logger.info("Computed canonical URLs for %d bookmarks", filled)
+    return filled
@@ -0,0 +1,224 @@
+"""Enrichment worker: runs queued jobs (page fetches, icon downloads) outside the API process.
+
+    python -m app.worker --concurrency 4
+
+Start as many as the fetch load needs, on this machine or others sharing the database. The API
+only enqueues; see app/services/job_queue.py for the lease and retry semantics. While a
+standalone worker is running, the API's embedded worker threads stand by.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+from app.logging_config import setup_logging
+from app.services.enrichment import HANDLERS
+from app.services.icon_manifest import icon_manifest
+from app.services.job_queue import FAILED, QUEUED, JobQueue, job_queue
+from app.services.metrics import QUEUE_JOB_RUNS
+
+logger = logging.getLogger(__name__)
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 2))  # Jobs one worker process runs at once
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", 2.0))  # Seconds between polls of an empty queue
+WORKER_SHUTDOWN_TIMEOUT = 30  # Seconds running jobs get to finish on SIGTERM before their leases are left to expire
+# Worker threads inside each API process. They claim nothing while a standalone worker is alive,
+# so the default suits both a single process and a deployment with `python -m app.worker`
+ENRICHMENT_EMBEDDED_WORKERS = int(os.getenv("ENRICHMENT_EMBEDDED_WORKERS", 1))
+PRESENCE_CHECK_INTERVAL = 30  # Seconds an embedded worker trusts its last look for standalone workers
+
+
+class Worker:
+    """Claims jobs from the queue in `concurrency` threads and heartbeats their leases.
+
+    A job that raises is retried with backoff; a worker that dies mid-job stops heartbeating,
+    and once the lease expires another worker runs the job again, so handlers must be idempotent.
+    A standalone worker announces itself with its heartbeat; an `embedded` one (threads in an API
+    process) claims nothing while any standalone worker is alive.
+    """
+
+    def __init__(self, queue: JobQueue = job_queue, handlers: Optional[Dict[str, Callable[[Dict], None]]] = None,
+                 concurrency: int = WORKER_CONCURRENCY, poll_interval: float = WORKER_POLL_INTERVAL,
+                 worker_id: Optional[str] = None, embedded: bool = False):
+        self.queue = queue
+        self.handlers = handlers if handlers is not None else HANDLERS
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._active: Dict[int, str] = {}  # Job id -> kind, for the heartbeat
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._drained = threading.Event()
+        self.embedded = embedded
+        self._threads = []
+        self._heartbeat_thread = None
+        self._standby_until = 0.0  # Monotonic time until which an embedded worker stays idle
+        self._presence_checked = 0.0
+
+    def run_once(self) -> bool:
+        """Claim and run one due job; False if none was due."""
+        job = self.queue.claim(self.worker_id, kinds=list(self.handlers))
+        if job is None:
+            return False
+        job_id, kind = job["id"], job["kind"]
+        with self._lock:
+            self._active[job_id] = kind
+        try:
+            self.handlers[kind](job)
+        except Exception as e:
+            status = self.queue.fail(job_id, self.worker_id, f"{type(e).__name__}: {e}")
+            outcome = {QUEUED: "retry", FAILED: "failed"}.get(status, "lost")
+            logger.warning("Job %s (%s) attempt %d failed (%s): %s", job_id, kind, job["attempts"], outcome, e)
+        else:
+            outcome = "done" if self.queue.complete(job_id, self.worker_id) else "lost"
+        finally:
+            with self._lock:
+                self._active.pop(job_id, None)
+        if outcome == "lost":
+            logger.warning("Job %s (%s) outlived its lease and was handed to another worker", job_id, kind)
+        QUEUE_JOB_RUNS.inc(kind=kind, outcome=outcome)
+        return True
+
+    def drain(self) -> int:
+        """Run due jobs in the calling thread until none is left; returns how many ran."""
+        ran = 0
+        while self.run_once():
+            ran += 1
+        return ran
+
+    def standing_by(self) -> bool:
+        """True for an embedded worker while a standalone worker is alive; checked every PRESENCE_CHECK_INTERVAL."""
+        if not self.embedded:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._presence_checked < PRESENCE_CHECK_INTERVAL:
+                return now < self._standby_until
+            self._presence_checked = now
+        try:
+            present = self.queue.standalone_workers() > 0
+        except Exception as e:
+            logger.warning("Could not look for standalone workers: %s", e)
+            present = False
+        with self._lock:
+            self._standby_until = now + PRESENCE_CHECK_INTERVAL if present else 0.0
+        return present
+
+    def _announce(self):
+        if self.embedded:
+            return
+        try:
+            self.queue.announce_worker(self.worker_id)
+        except Exception as e:
+            logger.warning("Could not announce worker %s: %s", self.worker_id, e)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            if self.standing_by():
+                self._stopped.wait(self.poll_interval)
+                continue
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                logger.error("Worker poll failed: %s", e, exc_info=True)
+                worked = False
+            if not worked:
+                self._stopped.wait(self.poll_interval)
+
+    def _heartbeat(self):
+        # Keeps going after stop is requested, so leases stay alive while running jobs finish
+        while not self._drained.wait(self.queue.visibility_timeout / 3):
+            if not self._stopped.is_set():
+                self._announce()
+            with self._lock:
+                active = list(self._active.items())
+            for job_id, kind in active:
+                try:
+                    if not self.queue.heartbeat(job_id, self.worker_id):
+                        logger.warning("Lost the lease on job %s (%s)", job_id, kind)
+                except Exception as e:
+                    logger.warning("Heartbeat for job %s failed: %s", job_id, e)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopped.clear()
+        self._drained.clear()
+        self._announce()
+        self._threads = [threading.Thread(target=self._loop, name=f"worker-{i}", daemon=True)
+                         for i in range(self.concurrency)]
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="worker-heartbeat", daemon=True)
+        for thread in self._threads + [self._heartbeat_thread]:
+            thread.start()
+        logger.info("Worker %s started with %d threads%s", self.worker_id, self.concurrency,
+                    " (embedded; stands by while a standalone worker runs)" if self.embedded else "")
+
+    def request_stop(self):
+        """Stop claiming new jobs; safe to call from a signal handler."""
+        self._stopped.set()
+
+    def stop(self, timeout: float = WORKER_SHUTDOWN_TIMEOUT):
+        """Stop claiming and wait for running jobs; jobs still running after `timeout` are reclaimed later."""
+        self.request_stop()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._drained.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout=5)
+            self._heartbeat_thread = None
+        if not self.embedded:
+            try:
+                self.queue.withdraw_worker(self.worker_id)
+            except Exception as e:
+                logger.warning("Could not withdraw worker %s: %s", self.worker_id, e)
+        with self._lock:
+            unfinished = list(self._active)
+        if unfinished:
+            logger.warning("Worker %s stopped with jobs %s still running; their leases will expire",
+                           self.worker_id, unfinished)
+        self._threads = []
+
+    def wait(self):
+        """Block until stop is requested (by a signal handler in the standalone worker)."""
+        while not self._stopped.wait(1):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued enrichment jobs outside the API process.")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="jobs to run at once")
+    parser.add_argument("--poll-interval", type=float, default=WORKER_POLL_INTERVAL,
+                        help="seconds between polls when the queue is empty")
+    parser.add_argument("--shutdown-timeout", type=float, default=WORKER_SHUTDOWN_TIMEOUT,
+                        help="seconds running jobs get to finish on SIGTERM or Ctrl-C")
+    parser.add_argument("--once", action="store_true", help="run the jobs that are due, then exit")
+    args = parser.parse_args()
+
+    setup_logging()
+    icon_manifest.load()
+    worker = Worker(concurrency=args.concurrency, poll_interval=args.poll_interval)
+    if args.once:
+        logger.info("Worker %s ran %d jobs", worker.worker_id, worker.drain())
+        icon_manifest.save()
+        return
+
+    def request_stop(signum, frame):
+        logger.info("Received signal %d; finishing running jobs", signum)
+        worker.request_stop()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    worker.start()
+    worker.wait()
+    worker.stop(args.shutdown_timeout)
+    icon_manifest.save()
+    logger.info("Worker %s stopped", worker.worker_id)
+
+
+if __name__ == "__main__":
+    main()
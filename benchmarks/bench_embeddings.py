@@ -0,0 +1,58 @@
+"""Semantic search latency at 100k vectors.
+
+    python -m benchmarks.bench_embeddings [--vectors 100000] [--dim 384] [--queries 200] [--no-float32-cache]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.embeddings import EmbeddingIndex, HashingEncoder
+from benchmarks.timing import summarize
+
+
+def run(vectors=100_000, dim=384, queries=200, k=10, float32_cache=True, log=print):
+    """Build an index of random unit vectors and time searches; returns the metrics."""
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((vectors, dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = EmbeddingIndex(Path(tmp), encoder_factory=lambda: HashingEncoder(dim), float32_cache=float32_cache,
+                               writable=True)
+        start = time.perf_counter()
+        index.upsert_vectors(range(vectors), matrix)
+        build_s = time.perf_counter() - start
+        log(f"build: {vectors} x {dim} float16 in {build_s:.2f}s")
+
+        latencies = []
+        for query in matrix[rng.integers(0, vectors, queries)]:
+            start = time.perf_counter()
+            index.search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        search = summarize(latencies)
+        log(f"top-{k} search: p50 {search['p50_ms']:.2f} ms, p95 {search['p95_ms']:.2f} ms, max {search['max_ms']:.2f} ms")
+
+        texts = [f"bookmark {i} about python web frameworks and databases" for i in range(1000)]
+        start = time.perf_counter()
+        index.encode(texts)
+        encode_per_s = len(texts) / (time.perf_counter() - start)
+        log(f"encode ({index.encoder.name}): {encode_per_s:.0f} texts/s")
+    return {"build_s": round(build_s, 3), "search": search, "encode_per_s": round(encode_per_s, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--no-float32-cache", action="store_true", help="Search the float16 memmap directly")
+    args = parser.parse_args()
+    run(args.vectors, args.dim, args.queries, args.k, float32_cache=not args.no_float32_cache)
+
+
+if __name__ == "__main__":
+    main()
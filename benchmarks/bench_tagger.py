@@ -0,0 +1,82 @@
+"""Tag suggestion throughput (tags/s) at several micro-batch sizes.
+
+    TAGGER_MODEL_PATH=/models/nli python -m benchmarks.bench_tagger [--texts 256] [--batch-sizes 1 4 16 32]
+
+Without TAGGER_MODEL_PATH only the TF-IDF fallback is measured.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.routes.bookmarks import TAG_VOCAB
+from app.services import text_ml
+from app.services.ml_tagger import TAGGER_MODEL_PATH, MLTagger, MicroBatcher, ZeroShotModel
+
+SAMPLE_TEXTS = [
+    "Stable Diffusion checkpoints and LoRA models for image generation",
+    "Kubernetes operator patterns for running stateful databases",
+    "Weeknight pasta recipes with seasonal vegetables",
+    "Rust async runtime internals explained",
+    "Budget travel guide to Lisbon and Porto",
+    "Transformer attention mechanisms from scratch in PyTorch",
+]
+
+
+def make_texts(count):
+    return [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} (page {i})" for i in range(count)]
+
+
+def bench_tfidf(texts, log=print):
+    start = time.perf_counter()
+    for text in texts:
+        X = text_ml.tfidf_vectorizer(stop_words="english").fit_transform([text] + TAG_VOCAB)
+        text_ml.cosine_similarity(X[0:1], X[1:])
+    elapsed = time.perf_counter() - start
+    log(f"tfidf fallback: {len(texts) / elapsed:.1f} texts/s, {len(texts) * len(TAG_VOCAB) / elapsed:.0f} tags/s")
+    return {"texts_per_s": round(len(texts) / elapsed, 2), "tags_per_s": round(len(texts) * len(TAG_VOCAB) / elapsed, 1)}
+
+
+def bench_model(model, texts, batch_size, log=print):
+    batcher = MicroBatcher(model.score, max_batch=batch_size, max_wait=0.01)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=batch_size) as pool:
+        list(pool.map(lambda text: batcher.submit(text, TAG_VOCAB).result(), texts))
+    elapsed = time.perf_counter() - start
+    log(f"zero-shot batch={batch_size}: {len(texts) / elapsed:.1f} texts/s, "
+        f"{len(texts) * len(TAG_VOCAB) / elapsed:.0f} tags/s")
+    return {"texts_per_s": round(len(texts) / elapsed, 2), "tags_per_s": round(len(texts) * len(TAG_VOCAB) / elapsed, 1)}
+
+
+def run(text_count=256, batch_sizes=(1, 4, 16, 32), log=print):
+    """TF-IDF throughput, plus the zero-shot model when TAGGER_MODEL_PATH is set; returns the metrics."""
+    texts = make_texts(text_count)
+    results = {"tfidf": bench_tfidf(texts, log)}
+    if not TAGGER_MODEL_PATH:
+        log("TAGGER_MODEL_PATH not set; skipping zero-shot model")
+        return results
+    model = ZeroShotModel(TAGGER_MODEL_PATH)
+    log(f"model backend: {model.backend}")
+    for batch_size in batch_sizes:
+        results[f"zero_shot_batch_{batch_size}"] = bench_model(model, texts, batch_size, log)
+    # Repeated content is served from the per-content-hash cache
+    tagger = MLTagger(TAGGER_MODEL_PATH, model_factory=lambda path: model)
+    tagger.suggest(texts[0], TAG_VOCAB)
+    start = time.perf_counter()
+    for _ in range(1000):
+        tagger.suggest(texts[0], TAG_VOCAB)
+    cached_per_s = 1000 / (time.perf_counter() - start)
+    log(f"cached: {cached_per_s:.0f} texts/s")
+    results["cached"] = {"texts_per_s": round(cached_per_s, 1)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+    run(args.texts, args.batch_sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Time to interactive of the web UI, measured in a headless browser.
+
+    python -m benchmarks.bench_ui [--rows 10000] [--runs 5] [--browser firefox|chrome]
+
+Builds a synthetic library, serves the app on a loopback port and loads /website until the
+page sets its "bookmarks-interactive" performance mark (first bookmarks rendered, handlers
+attached). Needs selenium and a local Firefox or Chrome with its WebDriver.
+"""
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from benchmarks.timing import summarize
+
+INTERACTIVE_MARK = "bookmarks-interactive"
+PAGE_TIMEOUT = 120
+
+
+def start_driver(browser: str):
+    from selenium import webdriver
+
+    if browser == "chrome":
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        return webdriver.Chrome(options=options)
+    options = webdriver.FirefoxOptions()
+    options.add_argument("--headless")
+    return webdriver.Firefox(options=options)
+
+
+def run(base_url: str, runs: int = 5, browser: str = "firefox", log=print) -> dict:
+    """Load /website `runs` times against a running server; latencies are time to interactive."""
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    try:
+        driver = start_driver(browser)
+    except WebDriverException as e:
+        return {"skipped": f"no {browser} WebDriver: {e.msg}"}
+    try:
+        driver.set_window_size(1280, 900)
+        times, cards, icons = [], 0, 0
+        for _ in range(runs):
+            driver.get(f"{base_url}/website")
+            WebDriverWait(driver, PAGE_TIMEOUT).until(
+                lambda d: d.execute_script(f"return performance.getEntriesByName('{INTERACTIVE_MARK}').length > 0")
+            )
+            times.append(driver.execute_script(f"return performance.getEntriesByName('{INTERACTIVE_MARK}')[0].startTime"))
+            cards = driver.execute_script("return document.querySelectorAll('.bookmark-card').length")
+            icons = driver.execute_script("return document.querySelectorAll('.card-img-top[src]').length")
+        result = {"time_to_interactive": summarize(times), "cards_in_dom": cards, "icons_requested": icons}
+        log(f"time to interactive: p50 {result['time_to_interactive']['p50_ms']:.0f} ms, "
+            f"{cards} cards in the DOM, {icons} icons requested")
+        return result
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--browser", choices=("firefox", "chrome"), default="firefox")
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp())
+    database_url = f"sqlite:///{scratch / 'library.db'}"
+    os.environ["DATABASE_URL"] = database_url  # Before app.models is imported
+    from benchmarks.synthetic import build_library
+    build_library(database_url, args.rows)
+    from app.main import app
+    from benchmarks.standin_site import StandinServer
+
+    with StandinServer(asgi_app=app) as server:
+        print(json.dumps(run(server.base_url, args.runs, args.browser), indent=2))
+
+
+if __name__ == "__main__":
+    main()
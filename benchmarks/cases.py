@@ -0,0 +1,254 @@
+"""Benchmark cases, run in a worker process against one synthetic library.
+
+    DATABASE_URL=sqlite:////tmp/library.db python -m benchmarks.cases --rows 10000 --result out.json
+
+Normally started by benchmarks.run, which builds the library, starts the stand-in site and
+points DATABASE_URL and the working directory at scratch space. Each case returns a dict of
+metrics; keys ending in _ms or _s are lower-is-better and keys ending in _per_s higher-is-better.
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple, Optional
+
+from benchmarks.timing import measure
+
+
+class Context(NamedTuple):
+    rows: int
+    repeat: int
+    standin_url: Optional[str]
+
+    def scaled_repeat(self, minimum: int = 3) -> int:
+        """Fewer runs for cases that touch every bookmark, so 1M rows stays practical."""
+        return max(minimum, min(self.repeat, self.repeat * 1000 // max(self.rows, 1)))
+
+
+class Case(NamedTuple):
+    fn: Callable[[Context], Dict]
+    needs_library: bool  # Run once per library size; otherwise once per suite run
+    max_rows: Optional[int]  # Skipped above this size, e.g. responses that materialize every row
+    needs_standin: bool
+
+
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str, needs_library: bool = True, max_rows: Optional[int] = None, needs_standin: bool = False):
+    def register(fn):
+        CASES[name] = Case(fn, needs_library, max_rows, needs_standin)
+        return fn
+    return register
+
+
+def _client():
+    # No lifespan: background indexing and flush threads would add noise to the timings
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
+
+
+def _get(client, path: str):
+    response = client.get(path)
+    response.raise_for_status()
+    return response
+
+
+@case("bookmarks_list", max_rows=100_000)
+def bookmarks_list(ctx: Context) -> Dict:
+    client = _client()
+    return {
+        "default": measure(lambda i: _get(client, "/bookmarks"), ctx.scaled_repeat()),
+        "sort_frecency": measure(lambda i: _get(client, "/bookmarks?sort=frecency"), ctx.scaled_repeat()),
+        "response_bytes": {
+            encoding: int(client.get("/bookmarks", headers={"Accept-Encoding": encoding}).headers["content-length"])
+            for encoding in ("identity", "gzip")
+        },
+    }
+
+
+@case("bookmarks_first_page")
+def bookmarks_first_page(ctx: Context) -> Dict:
+    # What the web UI waits for before its first render; independent of the library size
+    client = _client()
+    return measure(lambda i: _get(client, "/bookmarks?limit=500"), ctx.repeat)
+
+
+@case("ui_time_to_interactive", max_rows=100_000)
+def ui_time_to_interactive(ctx: Context) -> Dict:
+    from app.main import app
+    from benchmarks import bench_ui
+    from benchmarks.standin_site import StandinServer
+
+    with StandinServer(asgi_app=app) as server:
+        return bench_ui.run(server.base_url, runs=max(3, ctx.repeat // 4), log=lambda message: None)
+
+
+SEARCH_QUERIES = {
+    "common": "python",  # A word in a few percent of titles and descriptions
+    "host": "site1.example",
+    "no_match": "zzzz-no-such-bookmark",
+}
+
+
+@case("search")
+def search(ctx: Context) -> Dict:
+    client = _client()
+    results = {}
+    for name, query in SEARCH_QUERIES.items():
+        repeat = ctx.scaled_repeat() if name == "common" else ctx.repeat
+        results[name] = measure(lambda i: _get(client, f"/search?query={query}"), repeat)
+    return results
+
+
+@case("categorize", max_rows=100_000)
+def categorize(ctx: Context) -> Dict:
+    client = _client()
+    return measure(lambda i: _get(client, "/categorize-bookmarks"), ctx.scaled_repeat())
+
+
+@case("semantic_index", max_rows=100_000)
+def semantic_index(ctx: Context) -> Dict:
+    from benchmarks import bench_embeddings
+    return bench_embeddings.run(vectors=ctx.rows, queries=ctx.repeat * 5, log=lambda message: None)
+
+
+@case("suggest_tags", needs_library=False)
+def suggest_tags(ctx: Context) -> Dict:
+    client = _client()
+
+    def suggest(i):
+        # A distinct title per call, so the tag cache is never hit
+        response = client.post("/suggest-tags", json={
+            "title": f"Tuning postgres indexes for python web apps, part {i}",
+            "description": "Query plans, caching and connection pooling",
+            "url": f"https://site{i}.example/postgres-tuning",
+        })
+        response.raise_for_status()
+
+    return {"uncached": measure(suggest, ctx.repeat, warmup=2), **_tagger(ctx)}
+
+
+def _tagger(ctx: Context) -> Dict:
+    from benchmarks import bench_tagger
+    return bench_tagger.run(text_count=ctx.repeat * 4, batch_sizes=(1, 16), log=lambda message: None)
+
+
+PIPELINE_VARIANTS = {
+    "page": "/page/{i}",
+    "slow_200ms": "/slow/200/{i}",
+    "redirect_3_hops": "/redirect/3/{i}",
+    "rate_limited_429": "/ratelimited/{i}",
+}
+
+
+@case("metadata_pipeline", needs_library=False, needs_standin=True)
+def metadata_pipeline(ctx: Context) -> Dict:
+    from app.services.domain_icon_cache import domain_icon_cache
+    from app.services.metadata_fetcher import fetch_metadata_combined
+
+    def cold(i):
+        domain_icon_cache.clear()  # Every page downloads and processes all of its icons
+        fetch_metadata_combined(f"{ctx.standin_url}/page/{i}")
+
+    results = {"page_cold_icons": measure(cold, ctx.repeat)}
+    domain_icon_cache.clear()
+    for name, path in PIPELINE_VARIANTS.items():
+        results[name] = measure(lambda i: fetch_metadata_combined(ctx.standin_url + path.format(i=i)), ctx.repeat)
+    return results
+
+
+@case("icon_processing", needs_library=False, needs_standin=True)
+def icon_processing(ctx: Context) -> Dict:
+    from app.services.metadata_fetcher import BASE_ICON_DIR, download_and_validate_icon, resize_image
+    from benchmarks.standin_site import OG_IMAGE
+
+    scratch = Path(tempfile.mkdtemp())
+    BASE_ICON_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        def resize(i):
+            path = scratch / f"og_{i}.png"
+            path.write_bytes(OG_IMAGE)
+            resize_image(path)
+
+        def download(i):
+            path = BASE_ICON_DIR / f"bench_{i}.png"
+            if download_and_validate_icon(f"{ctx.standin_url}/og/{i}.png", path, ctx.standin_url, str(i)) is None:
+                raise RuntimeError("Icon download failed")
+
+        return {"resize_600px": measure(resize, ctx.repeat), "download_validate": measure(download, ctx.repeat)}
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+@case("snapshots", needs_library=False)
+def snapshots(ctx: Context) -> Dict:
+    from app.models import SessionLocal
+    from app.services.snapshots import SnapshotStore
+    from app.services.url_canonical import canonicalize
+    from benchmarks.synthetic import page_html
+
+    store = SnapshotStore(enabled=True, keep_html=True)
+    count = ctx.repeat * 25  # Past SNAPSHOT_DICT_MIN_SAMPLES, so most pages use a trained dictionary
+    pages = [page_html(i) for i in range(count)]
+    urls = [f"https://site{i % 20}.example/article/{i}" for i in range(count)]
+    captured = []
+    extract = measure(lambda i: captured.append(store.capture(pages[i])), count, warmup=0)
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        for i, (url, snapshot) in enumerate(zip(urls, captured)):
+            if i == store.min_samples:
+                store.train_dictionaries(db)  # What the scheduled job does in the app
+            store.save(db, canonicalize(url), url, snapshot["text"], snapshot["html"])
+            db.commit()
+        saved_per_s = count / (time.perf_counter() - start)
+        stats = store.stats(db)
+        hashes = [(s.text_hash, s.html_hash) for s in (store.get(db, canonicalize(url)) for url in urls)]
+        return {
+            "extract": extract,
+            "saves_per_s": round(saved_per_s, 2),
+            "read_text": measure(lambda i: store.read(db, hashes[i * 7 % count][0]), ctx.repeat * 5),
+            "read_html": measure(lambda i: store.read(db, hashes[i * 7 % count][1]), ctx.repeat * 5),
+            "raw_bytes_per_bookmark": round(stats["raw_bytes"] / count),
+            "stored_bytes_per_bookmark": round(stats["stored_bytes"] / count),
+            "codec": stats["codec"],
+        }
+    finally:
+        db.close()
+
+
+def run_cases(names, ctx: Context) -> Dict:
+    results = {}
+    for name in names:
+        current = CASES[name]
+        if current.max_rows is not None and ctx.rows > current.max_rows:
+            results[name] = {"skipped": f"above {current.max_rows} rows"}
+            continue
+        if current.needs_standin and not ctx.standin_url:
+            results[name] = {"skipped": "no stand-in site"}
+            continue
+        try:
+            results[name] = current.fn(ctx)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, required=True, help="Bookmarks in the library at DATABASE_URL")
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--standin-url")
+    parser.add_argument("--result", required=True, help="File the JSON results are written to")
+    args = parser.parse_args()
+    ctx = Context(args.rows, args.repeat, args.standin_url)
+    Path(args.result).write_text(json.dumps(run_cases(args.cases, ctx), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Reproducible benchmark suite: synthetic libraries, a local stand-in site and baseline checks.
+
+    python -m benchmarks.run [--sizes 1k 10k] [--cases search categorize] [--output results.json]
+                             [--baseline benchmarks/baseline.json] [--tolerance 0.5] [--update-baseline]
+
+Each library size runs in its own worker process with a scratch working directory, so the
+app's database, icons and caches never touch the checkout. Libraries are generated once per
+size and seed and reused from --cache-dir. Exits with status 1 when a metric regresses by more
+than --tolerance against the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from benchmarks.cases import CASES
+from benchmarks.standin_site import StandinServer
+from benchmarks.synthetic import DEFAULT_SEED, parse_size
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = REPO_ROOT / "benchmarks" / "baseline.json"
+DEFAULT_CACHE_DIR = REPO_ROOT / "data" / "bench_libraries"
+SHARED = "shared"  # Results key for cases that do not depend on the library size
+# Only stable statistics are compared; p95, max and ops_per_s (the mean) are reported but too noisy to gate on
+COMPARED_SUFFIXES = ("p50_ms", "_per_s", "build_s")
+IGNORED_SUFFIXES = ("ops_per_s",)
+MIN_DELTA_MS = 2.0  # Smaller slowdowns are timer and scheduler noise whatever the percentage
+
+
+def library_path(cache_dir: Path, size: str, seed: int) -> Path:
+    path = cache_dir / f"library-{size}-seed{seed}.db"
+    if not path.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".partial")
+        partial.unlink(missing_ok=True)
+        print(f"Generating {size} library...", flush=True)
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.synthetic", "--size", size, "--seed", str(seed), "--output", str(partial)],
+            cwd=REPO_ROOT, env={**os.environ, "DATABASE_URL": f"sqlite:///{partial}"}, check=True,
+        )
+        partial.rename(path)
+    return path
+
+
+def run_worker(cases: List[str], rows: int, library: Optional[Path], repeat: int, standin_url: str) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="bookmark-bench-") as scratch:
+        scratch = Path(scratch)
+        database = scratch / "bookmarks.db"
+        if library is not None:
+            shutil.copyfile(library, database)  # Cases may write, e.g. icon candidates
+        result = scratch / "result.json"
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{database}",
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])),
+            "DOMAIN_RULES_PATH": str(REPO_ROOT / "app/config/domain_rules.json"),
+            "NETWORK_RANGES_PATH": str(REPO_ROOT / "app/config/network_ranges.json"),
+            "LOG_FILE": str(scratch / "bench.log"),
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        }
+        command = [sys.executable, "-m", "benchmarks.cases", "--rows", str(rows), "--repeat", str(repeat),
+                   "--standin-url", standin_url, "--result", str(result), "--cases", *cases]
+        subprocess.run(command, cwd=scratch, env=env, check=True)
+        return json.loads(result.read_text())
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Metrics more than `tolerance` (a fraction) worse than the baseline."""
+    regressions = []
+    current = flatten(results)
+    for name, before in flatten(baseline).items():
+        if not name.endswith(COMPARED_SUFFIXES) or name.endswith(IGNORED_SUFFIXES):
+            continue
+        if name not in current or before <= 0:
+            continue
+        after = current[name]
+        higher_is_better = name.endswith("_per_s")
+        change = (after - before) / before
+        slower_ms = (after - before) * (1 if name.endswith("_ms") else 1000)
+        if not higher_is_better and slower_ms < MIN_DELTA_MS:
+            continue
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append({"metric": name, "baseline": before, "current": after, "change": round(change, 3)})
+    return regressions
+
+
+def select_cases(only: Optional[Iterable[str]]) -> Tuple[List[str], List[str]]:
+    names = list(only or CASES)
+    unknown = sorted(set(names) - set(CASES))
+    if unknown:
+        raise SystemExit(f"Unknown cases: {', '.join(unknown)}; choose from {', '.join(CASES)}")
+    return [n for n in names if CASES[n].needs_library], [n for n in names if not CASES[n].needs_library]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["1k", "10k"], help="Library sizes: 1k, 10k, 100k, 1m or row counts")
+    parser.add_argument("--cases", nargs="+", help=f"Subset of: {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per measurement (fewer for full-library reads)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--output", type=Path, help="Write the JSON results here as well as to stdout")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed slowdown as a fraction (0.5 = 50%%); tighten on dedicated hardware")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args()
+    library_cases, shared_cases = select_cases(args.cases)
+
+    started = time.perf_counter()
+    results: Dict[str, Dict] = {}
+    with StandinServer() as standin:
+        for size in args.sizes:
+            if not library_cases:
+                break
+            rows = parse_size(size)
+            library = library_path(args.cache_dir, size, args.seed)
+            print(f"Running {', '.join(library_cases)} on {rows} bookmarks...", flush=True)
+            results[size] = run_worker(library_cases, rows, library, args.repeat, standin.base_url)
+        if shared_cases:
+            print(f"Running {', '.join(shared_cases)}...", flush=True)
+            results[SHARED] = run_worker(shared_cases, 0, None, args.repeat, standin.base_url)
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "duration_s": round(time.perf_counter() - started, 1),
+        },
+        "results": results,
+    }
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline.exists():
+        report["baseline"] = str(args.baseline)
+        report["tolerance"] = args.tolerance
+        report["regressions"] = compare(results, json.loads(args.baseline.read_text())["results"], args.tolerance)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    print(output)
+    for regression in report.get("regressions", []):
+        print(f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+              f"({regression['change']:+.0%})", file=sys.stderr)
+    sys.exit(1 if report.get("regressions") else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Local HTTP stand-in for the sites the metadata pipeline fetches.
+
+    python -m benchmarks.standin_site [--port 8765]
+
+Serves pages with realistic <head> sections and icons, slow responses, 429s and redirect
+chains from 127.0.0.1, so fetch benchmarks never depend on the internet.
+"""
+import argparse
+import asyncio
+import struct
+import threading
+import time
+import zlib
+
+import uvicorn
+from fastapi import FastAPI, Response
+from fastapi.responses import HTMLResponse, RedirectResponse
+
+app = FastAPI()
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html><head>
+<title>Stand-in page {n}: notes on python, databases and caching</title>
+<meta name="description" content="Synthetic page {n} served locally for benchmarks. {filler}">
+<meta property="og:image" content="/og/{n}.png">
+<link rel="apple-touch-icon" href="/apple-touch-icon.png">
+<link rel="icon" href="/favicon.png">
+<link rel="canonical" href="/page/{n}">
+{links}
+</head><body>{body}</body></html>"""
+
+
+def png(size: int, rgb=(40, 120, 200)) -> bytes:
+    """A solid-colour RGB PNG, built without PIL so the stand-in stays dependency-free."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = b"\x00" + bytes(rgb) * size
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(row * size)) + chunk(b"IEND", b"")
+
+
+FAVICON = png(32)
+TOUCH_ICON = png(180, (200, 80, 40))
+OG_IMAGE = png(600, (30, 160, 90))  # Larger than the icon target, so it gets resized
+
+
+def page_html(n: int) -> str:
+    links = "\n".join(f'<link rel="stylesheet" href="/static/style{i}.css">' for i in range(20))
+    body = "<p>" + "Lorem ipsum dolor sit amet. " * 200 + "</p>"
+    return PAGE_HEAD.format(n=n, filler="Filler text. " * 10, links=links, body=body)
+
+
+@app.get("/page/{n}")
+def page(n: int):
+    return HTMLResponse(page_html(n))
+
+
+@app.get("/slow/{ms}/{n}")
+async def slow_page(ms: int, n: int):
+    await asyncio.sleep(ms / 1000)
+    return HTMLResponse(page_html(n))
+
+
+@app.get("/ratelimited/{n}")
+def rate_limited(n: int):
+    return Response("Too Many Requests", status_code=429, headers={"Retry-After": "30"})
+
+
+@app.get("/redirect/{hops}/{n}")
+def redirect(hops: int, n: int):
+    target = f"/redirect/{hops - 1}/{n}" if hops > 1 else f"/page/{n}"
+    return RedirectResponse(target, status_code=301)
+
+
+@app.get("/favicon.png")
+def favicon():
+    return Response(FAVICON, media_type="image/png")
+
+
+@app.get("/apple-touch-icon.png")
+def touch_icon():
+    return Response(TOUCH_ICON, media_type="image/png")
+
+
+@app.get("/og/{name}")
+def og_image(name: str):
+    return Response(OG_IMAGE, media_type="image/png")
+
+
+class StandinServer:
+    """Runs the stand-in (or another ASGI app) with uvicorn in a background thread on a free loopback port."""
+
+    def __init__(self, port: int = 0, asgi_app=None):
+        config = uvicorn.Config(asgi_app or app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def start(self, timeout: float = 10.0) -> "StandinServer":
+        self._thread = threading.Thread(target=self._server.run, name="standin-site", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Stand-in site failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
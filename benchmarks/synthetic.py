@@ -0,0 +1,154 @@
+"""Deterministic synthetic bookmark libraries for the benchmark suite.
+
+    python -m benchmarks.synthetic --size 10k --output /tmp/library.db
+
+The same size and seed always produce the same rows, so timings from different runs and
+machines are comparable.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from sqlalchemy import create_engine, text
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+DEFAULT_SEED = 42
+INSERT_BATCH = 10_000
+
+WORDS = (
+    "python rust async database kubernetes docker guide tutorial recipe travel budget design "
+    "typescript react server cache index query search vector model training notes home lab "
+    "network router backup music video review release benchmark profiling memory"
+).split()
+TAGS = (
+    "programming,python,rust,javascript,devops,cloud,ai,machine-learning,database,security,"
+    "design,news,video,music,cooking,travel,finance,science,homelab,tools,reading,reference"
+).split(",")
+KNOWN_HOSTS = (
+    "github.com", "www.youtube.com", "news.ycombinator.com", "en.wikipedia.org",
+    "stackoverflow.com", "docs.python.org", "www.reddit.com", "medium.com",
+)
+CREATED_START = datetime(2022, 1, 1)
+CREATED_SPAN = timedelta(days=3 * 365)
+
+
+def parse_size(size: str) -> int:
+    """A size name from SIZES, or a plain row count."""
+    return SIZES[size.lower()] if size.lower() in SIZES else int(size)
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _url(rng: random.Random, i: int, hosts: int) -> str:
+    roll = rng.random()
+    if roll < 0.70:
+        return f"https://site{rng.randrange(hosts)}.example/{rng.choice(WORDS)}/{i}"
+    if roll < 0.85:
+        return f"https://{rng.choice(KNOWN_HOSTS)}/{rng.choice(WORDS)}-{i}"
+    if roll < 0.95:
+        # Loopback rather than private ranges, so categorizing never probes the network
+        return f"http://127.0.{rng.randrange(4)}.{rng.randrange(1, 255)}:{rng.choice((3000, 8080, 9000))}/app{i}"
+    return f"https://site{rng.randrange(hosts)}.example/article/{i}?utm_source=feed&utm_medium=rss&ref={i % 97}"
+
+
+def generate_rows(count: int, seed: int = DEFAULT_SEED) -> Iterator[Dict]:
+    """Bookmark rows 1..count; icon_candidates is set so listing never triggers metadata fetches."""
+    from app.services.click_tracker import add_click
+    from app.services.url_canonical import canonicalize
+
+    rng = random.Random(seed)
+    hosts = max(1, count // 20)
+    for i in range(1, count + 1):
+        created = CREATED_START + timedelta(seconds=rng.randrange(int(CREATED_SPAN.total_seconds())))
+        clicks = int(rng.expovariate(0.3)) if rng.random() < 0.6 else 0
+        frecency = None
+        last_used = None
+        for _ in range(min(clicks, 5)):
+            last_used = created + timedelta(seconds=rng.randrange(90 * 86400))
+            frecency = add_click(frecency, last_used)
+        tag_count = rng.choice((0, 1, 2, 2, 3, 4))
+        url = _url(rng, i, hosts)
+        yield {
+            "id": i,
+            "url": url,
+            "canonical_url": canonicalize(url),
+            "title": _words(rng, rng.randint(2, 8)).title(),
+            "description": _words(rng, rng.randint(0, 30)) or None,
+            "webicon": "/static/favicon.ico",
+            "icon_candidates": "/static/favicon.ico",
+            "tags": ",".join(rng.sample(TAGS, tag_count)) or None,
+            "is_favorite": rng.random() < 0.05,
+            "click_count": clicks,
+            "last_used": last_used,
+            "frecency": frecency,
+            "created_at": created,
+            "updated_at": created,
+        }
+
+
+def page_html(i: int, seed: int = DEFAULT_SEED, sites: int = 20) -> str:
+    """A fetched page: one of `sites` sites' shared chrome around an article of its own.
+
+    Pages from one site share their navigation, footer and markup, as real sites do, which is
+    what snapshot dictionaries compress away.
+    """
+    site = i % sites
+    site_rng = random.Random(seed * 1000 + site)
+    rng = random.Random(seed * 1_000_003 + i)
+    nav = "".join(
+        f'<li><a href="/{word}">{word.title()}</a></li>' for word in site_rng.sample(WORDS, 12)
+    )
+    footer = f"<p>Copyright site{site}.example. {_words(site_rng, 30)}</p>"
+    paragraphs = "".join(f"<p>{_words(rng, rng.randint(20, 80)).capitalize()}.</p>" for _ in range(rng.randint(3, 15)))
+    return (
+        f'<!DOCTYPE html><html><head><title>{_words(rng, 6).title()} | site{site}</title>'
+        f'<script src="/assets/site{site}.js"></script><style>.nav{{display:flex}}</style></head>'
+        f'<body><header><nav class="nav"><ul>{nav}</ul></nav></header>'
+        f'<div class="content"><h1>{_words(rng, 6).title()}</h1>{paragraphs}</div>'
+        f"<footer>{footer}</footer></body></html>"
+    )
+
+
+def build_library(database_url: str, count: int, seed: int = DEFAULT_SEED) -> float:
+    """Create a library of `count` bookmarks at database_url; returns the build time in seconds."""
+    # Imported here: app.models opens DATABASE_URL on import, and the runner only needs SIZES
+    from app.models import Base, Bookmark, add_missing_columns
+
+    start = time.perf_counter()
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    table = Bookmark.__table__
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA synchronous=OFF"))
+        batch: List[Dict] = []
+        for row in generate_rows(count, seed):
+            batch.append(row)
+            if len(batch) == INSERT_BATCH:
+                conn.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+    engine.dispose()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="10k", help=f"One of {', '.join(SIZES)} or a row count")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", required=True, help="Path of the SQLite file to create")
+    args = parser.parse_args()
+    count = parse_size(args.size)
+    elapsed = build_library(f"sqlite:///{args.output}", count, args.seed)
+    print(f"{count} bookmarks written to {args.output} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
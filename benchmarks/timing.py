@@ -0,0 +1,30 @@
+"""Latency sampling shared by the benchmarks."""
+import time
+from typing import Callable, Dict, List
+
+
+def percentile(samples, pct):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def summarize(latencies_ms: List[float]) -> Dict[str, float]:
+    total_s = sum(latencies_ms) / 1000
+    return {
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "max_ms": round(max(latencies_ms), 3),
+        "ops_per_s": round(len(latencies_ms) / total_s, 2) if total_s else 0.0,
+        "runs": len(latencies_ms),
+    }
+
+
+def measure(fn: Callable[[int], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Call fn(i) `warmup` times untimed, then `repeat` times, and summarize the latencies."""
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
@@ -0,0 +1,112 @@
+import uuid
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.models import Base, Bookmark, SessionLocal, TrashedBookmark
+from app.services.batch_ops import apply_batch
+from app.services.trash import snapshot
+
+client = TestClient(app)
+
+
+def make_session(tmp_path, count):
+    engine = create_engine(f"sqlite:///{tmp_path / 'batch.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(Bookmark(id=i, url=f"http://example.com/{i}", tags="old") for i in range(1, count + 1))
+    session.commit()
+    return engine, session
+
+
+def test_operations_apply_in_order(tmp_path):
+    engine, db = make_session(tmp_path, 4)
+    outcome = apply_batch(db, [
+        {"op": "add_tags", "ids": [1, 2], "tags": ["python", " web "]},
+        {"op": "remove_tags", "ids": [1], "tags": ["old"]},
+        {"op": "update", "ids": [3], "fields": {"title": "Renamed"}},
+        {"op": "favorite", "ids": [2, 3]},
+        {"op": "delete", "ids": [4, 99]},
+        {"op": "favorite", "ids": [4]},
+    ], snapshot)
+    db.commit()
+
+    statuses = [(r["operation"], r["id"], r["status"]) for r in outcome.results]
+    assert (4, 99, "not_found") in statuses
+    assert (5, 4, "not_found") in statuses  # Deleted earlier in the same batch
+    assert outcome.changed == {1: True, 2: True, 3: False}
+    assert [item["id"] for item in outcome.deleted] == [4]
+
+    rows = {b.id: b for b in db.query(Bookmark)}
+    assert rows[1].tags == "python,web"
+    assert rows[2].tags == "old,python,web"
+    assert rows[3].title == "Renamed"
+    assert rows[2].is_favorite and rows[3].is_favorite and not rows[1].is_favorite
+    assert 4 not in rows
+
+
+def test_apply_batch_rejects_mistyped_operands(tmp_path):
+    engine, db = make_session(tmp_path, 1)
+    for operation in (
+        {"op": "update", "ids": [1], "fields": {"tags": "python"}},
+        {"op": "update", "ids": [1], "fields": {"description": ["x"]}},
+        {"op": "add_tags", "ids": [1], "tags": "python"},
+        {"op": "favorite", "ids": ["1"]},
+    ):
+        with pytest.raises(ValueError):
+            apply_batch(db, [operation], snapshot)
+    assert db.query(Bookmark).one().tags == "old"
+
+
+def test_statement_count_does_not_grow_with_bookmarks(tmp_path):
+    engine, db = make_session(tmp_path, 500)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    ids = list(range(1, 501))
+    apply_batch(db, [
+        {"op": "add_tags", "ids": ids, "tags": ["bulk"]},
+        {"op": "favorite", "ids": ids},
+    ], snapshot)
+    db.commit()
+    # One SELECT of current tags, one favorite UPDATE and one executemany tag UPDATE
+    assert len(statements) <= 4
+    assert db.query(Bookmark).filter(Bookmark.tags == "old,bulk", Bookmark.is_favorite.is_(True)).count() == 500
+
+
+@patch("app.routes.bookmarks.fetch_metadata_combined", return_value={"webicon": "/static/favicon.ico"})
+def test_batch_endpoint(mock_fetch):
+    urls = [f"http://example.com/batch-{uuid.uuid4().hex}" for _ in range(3)]
+    ids = [client.post("/bookmarks", json={"url": url}).json()["id"] for url in urls]
+    response = client.post("/bookmarks/batch", json={"operations": [
+        {"op": "add_tags", "ids": ids[:2], "tags": ["batched"]},
+        {"op": "delete", "ids": [ids[2]]},
+    ]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 2 and data["deleted"] == 1
+    db = SessionLocal()
+    try:
+        tagged = db.query(Bookmark).filter(Bookmark.id.in_(ids)).order_by(Bookmark.id).all()
+        assert [b.id for b in tagged] == ids[:2]
+        assert all("batched" in b.tags.split(",") for b in tagged)
+        assert db.query(TrashedBookmark).filter(TrashedBookmark.url == urls[2]).count() == 1
+    finally:
+        db.close()
+
+    malformed = [
+        {"op": "rename", "ids": ids},
+        {"op": "update", "ids": ids, "fields": {"url": "http://evil.example"}},
+        {"op": "update", "ids": ids, "fields": {}},
+        {"op": "update", "ids": ids, "fields": {"tags": "python,web"}},
+        {"op": "update", "ids": ids, "fields": {"title": 42}},
+        {"op": "update", "ids": ids, "fields": {"is_favorite": "yes"}},
+        {"op": "add_tags", "ids": ids, "tags": "python"},
+        {"op": "remove_tags", "ids": ids, "tags": []},
+    ]
+    for operation in malformed:
+        assert client.post("/bookmarks/batch", json={"operations": [operation]}).status_code == 422, operation
+    client.post("/bookmarks/batch", json={"operations": [{"op": "delete", "ids": ids[:2]}]})
@@ -0,0 +1,24 @@
+from benchmarks.run import compare
+from benchmarks.synthetic import generate_rows, parse_size
+
+
+def test_synthetic_library_is_deterministic():
+    assert parse_size("10k") == 10_000 and parse_size("2500") == 2500
+    first = list(generate_rows(200, seed=7))
+    assert first == list(generate_rows(200, seed=7))
+    assert first != list(generate_rows(200, seed=8))
+    assert len({row["url"] for row in first}) == 200
+    assert all(row["icon_candidates"] for row in first)
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"10k": {"search": {"p50_ms": 10.0, "p95_ms": 12.0, "ops_per_s": 90.0},
+                        "tiny": {"p50_ms": 0.5}},
+                "shared": {"tagger": {"texts_per_s": 100.0}}}
+    current = {"10k": {"search": {"p50_ms": 16.0, "p95_ms": 40.0, "ops_per_s": 10.0},
+                       "tiny": {"p50_ms": 1.5}},
+               "shared": {"tagger": {"texts_per_s": 40.0}}}
+    flagged = {r["metric"]: r["change"] for r in compare(current, baseline, tolerance=0.5)}
+    # p95 and the mean-based ops_per_s are not gated on, and sub-2ms slowdowns are noise
+    assert flagged == {"10k/search/p50_ms": 0.6, "shared/tagger/texts_per_s": -0.6}
+    assert compare(current, baseline, tolerance=1.0) == []
@@ -1,39 +1,53 @@
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.models import Bookmark, SessionLocal
 
 client = TestClient(app)
 
 
-@pytest.fixture
-def create_bookmark():
-    response = client.post(
+def _remove(bookmark_id):
+    db = SessionLocal()
+    try:
+        db.query(Bookmark).filter(Bookmark.id == bookmark_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _post_example(url):
+    return client.post(
         "/bookmarks",
         json={
-            "url": "https://example.com",
+            "url": url,
             "title": "Example",
             "description": "An example bookmark",
             "webicon": "https://example.com/icon.png",
         },
     )
+
+
+@pytest.fixture
+def create_bookmark():
+    # A fresh URL per test, since the shared database keeps rows from earlier runs
+    response = _post_example(f"https://example.com/{uuid.uuid4().hex}")
     assert response.status_code == 200
-    return response.json()
+    yield response.json()
+    _remove(response.json()["id"])
 
 
 def test_create_bookmark():
-    response = client.post(
-        "/bookmarks",
-        json={
-            "url": "https://example.com",
-            "title": "Example",
-            "description": "An example bookmark",
-            "webicon": "https://example.com/icon.png",
-        },
-    )
+    url = f"https://example.com/{uuid.uuid4().hex}"
+    response = _post_example(url)
     assert response.status_code == 200
     data = response.json()
-    assert data["title"] == "Example"
-    assert data["url"] == "https://example.com"
+    try:
+        assert data["title"] == "Example"
+        assert data["url"] == url
+    finally:
+        _remove(data["id"])
 
 
 def test_get_bookmark(create_bookmark):
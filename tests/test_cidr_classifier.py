@@ -0,0 +1,54 @@
+import ipaddress
+from unittest.mock import patch
+
+from app.services.cidr_classifier import CidrClassifier
+from app.services.network_detector import NetworkDetector
+
+RANGES = {
+    "ranges": [
+        {"cidr": "192.168.0.0/16", "category": "Local"},
+        {"cidr": "192.168.1.0/24", "category": "Local", "label": "homelab"},
+        {"cidr": "100.64.0.0/10", "category": "VPN", "label": "office VPN"},
+        {"cidr": "127.0.0.0/8", "category": "Loopback"},
+        {"cidr": "fe80::/10", "category": "Link-Local"},
+        {"cidr": "fd00:1::/64", "category": "VPN", "label": "wireguard"},
+    ]
+}
+
+
+def make_classifier():
+    classifier = CidrClassifier(path=None)
+    classifier.load(RANGES)
+    return classifier
+
+
+def test_longest_prefix_wins_for_ipv4_and_ipv6():
+    classifier = make_classifier()
+    assert classifier.match(ipaddress.ip_address("192.168.1.20")).tag == "homelab"
+    assert classifier.match(ipaddress.ip_address("192.168.7.1")).category == "Local"
+    assert classifier.match(ipaddress.ip_address("100.101.1.1")).tag == "office-vpn"
+    assert classifier.match(ipaddress.ip_address("fe80::1")).category == "Link-Local"
+    assert classifier.match(ipaddress.ip_address("fd00:1::5")).tag == "wireguard"
+    assert classifier.match(ipaddress.ip_address("::ffff:127.0.0.1")).category == "Loopback"
+    assert classifier.match(ipaddress.ip_address("8.8.8.8")) is None
+
+
+def test_batch_matches_single_lookups():
+    classifier = make_classifier()
+    addresses = [ipaddress.ip_address(a) for a in (
+        "192.168.1.1", "192.168.2.1", "10.0.0.1", "fd00:1::1", "fd00:2::1", "127.0.0.1", "2001:db8::1",
+    )] + [None]
+    expected = [classifier.match(a) if a is not None else None for a in addresses]
+    assert classifier.match_many(addresses) == expected
+
+
+def test_network_detector_uses_configured_labels():
+    detector = NetworkDetector()
+    with patch("app.services.network_detector.cidr_classifier", make_classifier()), \
+            patch("app.services.network_detector.is_page_online", return_value=True):
+        assert detector.get_network_tag("http://192.168.1.5:8080") == "homelab"
+        assert detector.classify_url("http://[fe80::1]/") == ("Link-Local", True)
+        assert detector.classify_url("http://192.168.9.9") == ("Local", True)
+        assert [c for c, _ in detector.classify_many(["http://127.0.0.1", "http://[2001:db8::1]"])] == [
+            "Loopback", "Remote"
+        ]
@@ -0,0 +1,98 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from app.services import page_status
+from app.services.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, circuit_breaker,
+)
+from app.services.metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail(breaker, host, error=ConnectionError("down")):
+    with pytest.raises(type(error)):
+        with breaker.guard(host):
+            raise error
+
+
+def test_opens_after_threshold_and_backs_off_exponentially():
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=3, base_delay=10, max_delay=35, clock=clock)
+    for _ in range(2):
+        fail(breaker, "down.example")
+    assert breaker.state("down.example") == CLOSED
+    fail(breaker, "down.example")
+    assert breaker.state("down.example") == OPEN
+    assert CIRCUIT_STATE.value(host="down.example") == 2
+
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard("DOWN.example"):
+            pytest.fail("an open host must not be contacted")
+    assert CIRCUIT_REJECTIONS.value(host="down.example") >= 1
+
+    # Half-open after the delay: one probe, its failure doubles the delay (capped at max_delay)
+    for expected_delay in (20, 35, 35):
+        clock.now += 10 if expected_delay == 20 else 35
+        assert breaker.allow("down.example")
+        assert breaker.state("down.example") == HALF_OPEN
+        assert not breaker.allow("down.example")  # Only one probe at a time
+        breaker.record_failure("down.example")
+        assert breaker.retry_in("down.example") == expected_delay
+
+    clock.now += 35
+    with breaker.guard("down.example"):
+        pass
+    assert breaker.state("down.example") == CLOSED
+
+
+def test_failures_while_open_do_not_grow_the_backoff():
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=2, base_delay=10, max_delay=300, clock=clock)
+    for _ in range(2):
+        fail(breaker, "slow.example")
+    assert breaker.retry_in("slow.example") == 10
+
+    # Calls that were already in flight when the circuit opened fail afterwards
+    for _ in range(5):
+        breaker.record_failure("slow.example")
+    assert breaker.state("slow.example") == OPEN
+    assert breaker.retry_in("slow.example") == 10
+
+    clock.now += 10
+    assert breaker.allow("slow.example")
+    breaker.record_failure("slow.example")
+    assert breaker.retry_in("slow.example") == 20
+    assert CIRCUIT_STATE.value(host="down.example") == 0
+
+
+def test_status_codes_decide_health():
+    breaker = CircuitBreaker(threshold=2, clock=Clock())
+    not_found = requests.HTTPError(response=MagicMock(status_code=404))
+    for _ in range(3):
+        fail(breaker, "up.example", not_found)
+    assert breaker.state("up.example") == CLOSED
+
+    for status in (503, 429):
+        with breaker.guard("busy.example") as call:
+            call.status = status
+    assert breaker.state("busy.example") == OPEN
+
+
+def test_page_status_fails_fast_for_open_hosts():
+    circuit_breaker.record_success("dead.example")
+    with patch("app.services.page_status.requests.get", side_effect=requests.exceptions.ConnectionError("refused")) as get:
+        for _ in range(3):
+            assert page_status.is_page_online("http://dead.example/") is False
+        calls = get.call_count
+        assert page_status.is_page_online("http://dead.example/") is False
+        assert get.call_count == calls  # Circuit open: no request made
+    circuit_breaker.record_success("dead.example")
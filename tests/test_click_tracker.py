@@ -0,0 +1,113 @@
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+
+from app.main import app
+from app.models import Base, Bookmark, add_missing_columns
+from app.services.click_tracker import ClickTracker, add_click, frecency_score
+
+client = TestClient(app)
+
+
+def make_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'clicks.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for bookmark_id in (1, 2, 3):
+            conn.execute(Bookmark.__table__.insert().values(id=bookmark_id, url=f"http://example.com/{bookmark_id}",
+                                                            click_count=0))
+    return engine
+
+
+def read(engine, bookmark_id):
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT click_count, last_used, frecency FROM bookmarks WHERE id = :id"), {"id": bookmark_id}
+        ).one()
+
+
+def test_clicks_are_buffered_until_flush(tmp_path):
+    engine = make_engine(tmp_path)
+    tracker = ClickTracker(bind=engine)
+    for _ in range(5):
+        tracker.record(1)
+    tracker.record(2)
+    tracker.record(99)  # Unknown bookmark is dropped on flush
+
+    assert read(engine, 1).click_count == 0
+    assert tracker.flush() == 2
+    assert tracker.pending() == 0
+    assert read(engine, 1).click_count == 5
+    assert read(engine, 2).click_count == 1
+    assert read(engine, 1).frecency > read(engine, 2).frecency
+
+    tracker.record(2)
+    tracker.flush()
+    assert read(engine, 2).click_count == 2
+
+
+def test_flush_leaves_updated_at_alone(tmp_path):
+    engine = make_engine(tmp_path)
+    edited = datetime(2000, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(Bookmark.__table__.update().where(Bookmark.__table__.c.id == 1).values(updated_at=edited))
+    tracker = ClickTracker(bind=engine)
+    tracker.record(1)
+    assert tracker.flush() == 1
+    with engine.connect() as conn:
+        updated_at = conn.execute(text("SELECT updated_at FROM bookmarks WHERE id = 1")).scalar_one()
+    assert read(engine, 1).click_count == 1 and str(updated_at).startswith("2000-01-01")
+
+
+def test_frecency_prefers_recent_clicks():
+    now = datetime(2024, 6, 1)
+    old = add_click(add_click(None, now - timedelta(days=120)), now - timedelta(days=120))
+    recent = add_click(None, now - timedelta(days=1))
+    assert recent > old
+    assert abs(frecency_score(add_click(None, now), now) - 1.0) < 1e-9
+    # One half-life later a click counts half
+    assert abs(frecency_score(add_click(None, now), now + timedelta(days=30)) - 0.5) < 1e-6
+
+
+def test_add_missing_columns_upgrades_old_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE bookmarks (id INTEGER PRIMARY KEY, url VARCHAR NOT NULL, click_count INTEGER)"))
+    add_missing_columns(engine)
+    columns = {column["name"] for column in inspect(engine).get_columns("bookmarks")}
+    assert "frecency" in columns
+
+
+@patch("app.routes.bookmarks.fetch_metadata_combined", return_value={"webicon": "/static/favicon.ico"})
+def test_click_endpoints(mock_fetch):
+    url = f"http://example.com/go-{uuid.uuid4().hex}"
+    bookmark = client.post("/bookmarks", json={"url": url}).json()
+    with patch("app.routes.bookmarks.click_tracker") as tracker:
+        assert client.post("/bookmarks/999999/click").status_code == 404
+        tracker.record.assert_not_called()
+
+        response = client.get(f"/go/{bookmark['id']}", follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"] == url
+        tracker.record.assert_called_once_with(bookmark["id"])
+    client.delete(f"/bookmarks/{bookmark['id']}")
+
+
+@patch("app.routes.bookmarks.fetch_metadata_combined", return_value={"webicon": "/static/favicon.ico"})
+def test_go_adds_a_missing_scheme(mock_fetch):
+    host = f"go-{uuid.uuid4().hex}.example.com"
+    bookmark = client.post("/bookmarks", json={"url": f"{host}/page"}).json()
+    try:
+        with patch("app.routes.bookmarks.click_tracker"):
+            response = client.get(f"/go/{bookmark['id']}", follow_redirects=False)
+        assert response.headers["location"] == f"https://{host}/page"
+    finally:
+        client.delete(f"/bookmarks/{bookmark['id']}")
+
+
+def test_bookmarks_sort_validation():
+    assert client.get("/bookmarks?sort=bogus").status_code == 400
+    assert client.get("/bookmarks?sort=frecency").status_code == 200
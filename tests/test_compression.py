@@ -0,0 +1,86 @@
+import gzip
+import os
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.services.compression import CompressionMiddleware, PrecompressedStaticFiles, negotiate, precompress_tree
+
+
+def test_negotiate_honours_q_values_and_server_preference():
+    with patch("app.services.compression.available_encodings", return_value=["gzip", "br", "zstd"]):
+        assert negotiate("gzip, deflate, br, zstd") == "zstd"
+        assert negotiate("gzip, br", ("br", "zstd", "gzip")) == "br"
+        assert negotiate("br;q=0.5, gzip") == "gzip"
+        assert negotiate("*;q=0.1, gzip;q=0") == "zstd"
+        assert negotiate("identity") is None
+        assert negotiate("") is None
+    with patch("app.services.compression.available_encodings", return_value=["gzip"]):
+        assert negotiate("br, zstd") is None
+
+
+def test_large_json_is_compressed_and_streams_pass_through():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+    rows = [{"webicon": "/static/icons/example.com/favicon.png", "created_at": "2024-01-01T00:00:00"}] * 50
+
+    @app.get("/rows")
+    def list_rows():
+        return JSONResponse(rows)
+
+    @app.get("/tiny")
+    def tiny():
+        return {"ok": True}
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: 1\n\n" * 50, b"data: 2\n\n"]), media_type="text/event-stream")
+
+    client = TestClient(app)
+    response = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content) // 10
+    assert response.json() == rows
+    assert "content-encoding" not in client.get("/rows", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/tiny", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_static_files_are_served_precompressed(tmp_path):
+    static, cache = tmp_path / "static", tmp_path / "cache"
+    (static / "css").mkdir(parents=True)
+    css = "body { color: #eee; background: #222; }\n" * 100
+    (static / "css" / "site.css").write_text(css)
+    (static / "logo.png").write_bytes(b"\x89PNG" + bytes(2000))
+    assert precompress_tree(static, cache) >= 1
+    assert precompress_tree(static, cache) == 0  # Up to date; nothing recompressed
+
+    # A replaced file is recompressed even when its mtime is older than the variants (a restore)
+    css_path = static / "css" / "site.css"
+    stale = css_path.stat()
+    css_path.write_text("body { color: #000; }\n" * 100)
+    os.utime(css_path, ns=(stale.st_atime_ns, stale.st_mtime_ns - 10**9))
+    assert precompress_tree(static, cache) >= 1
+    assert gzip.decompress((cache / "css" / "site.css.gz").read_bytes()).decode() == css_path.read_text()
+    css_path.write_text(css)
+
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(static), cache_dir=cache), name="static")
+    client = TestClient(app)
+    response = client.get("/static/css/site.css", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert int(response.headers["content-length"]) == len((cache / "css" / "site.css.gz").read_bytes())
+    assert gzip.decompress((cache / "css" / "site.css.gz").read_bytes()).decode() == response.text == css
+    assert client.get("/static/css/site.css", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]}).status_code == 304
+
+    plain = client.get("/static/css/site.css", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.text == css
+    assert "content-encoding" not in client.get("/static/logo.png", headers={"Accept-Encoding": "gzip"}).headers
+
+    # Files added after startup (generated icons) are compressed on their first request
+    (static / "icon.svg").write_text("<svg xmlns='http://www.w3.org/2000/svg'>" + "<rect/>" * 300 + "</svg>")
+    assert client.get("/static/icon.svg", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
@@ -0,0 +1,43 @@
+import json
+import os
+
+from app.services import domain_rules as domain_rules_module
+from app.services.domain_rules import AhoCorasick, DomainRules
+
+
+def write_rules(path, rules):
+    path.write_text(json.dumps(rules))
+
+
+def test_host_suffix_and_keyword_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, {
+        "hosts": {"google.com": "search", "colab.research.google.com": "machine-learning"},
+        "keywords": {"news": "news", "blog": "blog"},
+    })
+    rules = DomainRules(path)
+    assert rules.classify("https://colab.research.google.com/drive") == "machine-learning"
+    assert rules.classify("https://mail.google.com") == "search"
+    assert rules.classify("https://notgoogle.com") is None
+    assert rules.classify("https://news.ycombinator.com") == "news"
+    assert rules.classify("https://tech-blog.example.org:8443/post") == "blog"
+    # Keywords no longer match inside unrelated words
+    assert rules.classify("https://mynewsletter.io") is None
+    assert rules.classify_many(["https://a.google.com", "", "https://b.google.com"]) == ["search", None, "search"]
+
+
+def test_rules_reload_when_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(domain_rules_module, "RELOAD_CHECK_INTERVAL", 0)
+    path = tmp_path / "rules.json"
+    write_rules(path, {"hosts": {"example.com": "old"}})
+    rules = DomainRules(path)
+    assert rules.classify("example.com") == "old"
+    write_rules(path, {"hosts": {"example.com": "new"}})
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+    assert rules.classify("example.com") == "new"
+
+
+def test_aho_corasick_finds_overlapping_keywords():
+    matcher = AhoCorasick({"he": "a", "she": "b", "hers": "c"})
+    found = sorted((start, keyword) for start, keyword, _ in matcher.find("ushers"))
+    assert found == [(1, "she"), (2, "he"), (2, "hers")]
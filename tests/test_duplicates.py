@@ -0,0 +1,105 @@
+import random
+import uuid
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.models import Base, Bookmark
+from app.services.duplicates import find_duplicates, hamming, near_duplicate_pairs, simhash
+from app.services.url_canonical import backfill_canonical_urls, canonical_hint, canonicalize, resolve_canonical
+from app.worker import Worker
+
+client = TestClient(app)
+
+
+def test_canonicalize_ignores_presentation_but_keeps_case_sensitive_paths():
+    same = ["http://x.com", "https://x.com/", "https://www.x.com/?utm_source=feed", "HTTPS://WWW.X.COM:443/#top"]
+    assert {canonicalize(url) for url in same} == {"https://x.com/"}
+    assert canonicalize("x.com/Docs/Page/?b=2&a=1&fbclid=z") == "https://x.com/Docs/Page?a=1&b=2"
+    assert canonicalize("https://x.com/Docs") != canonicalize("https://x.com/docs")
+    assert canonicalize("http://192.168.1.10:8080/app/") == "https://192.168.1.10:8080/app"
+    assert canonicalize("https://x.com/#!/inbox") == "https://x.com/#!/inbox"
+
+
+def test_redirect_target_and_same_site_rel_canonical_win():
+    assert resolve_canonical("http://x.com/a", "https://www.x.com/b/", None) == "https://x.com/b"
+    assert resolve_canonical("http://x.com/a?id=1", None, "/a") == "https://x.com/a"
+    assert resolve_canonical("http://x.com/a", None, "https://spam.example/") == "https://x.com/a"
+
+
+def test_only_a_different_page_on_the_same_host_is_a_canonical_hint():
+    assert canonical_hint("http://x.com/short/1", "https://x.com/posts/1") == "https://x.com/posts/1"
+    assert canonical_hint("http://x.com/a", "https://www.x.com/a/") is None  # Same page
+    assert canonical_hint("http://x.com/old", "https://x.com/") is None  # Site root
+    assert canonical_hint("http://x.com/private", "https://x.com/login?next=/private") is None
+    assert canonical_hint("http://x.com/a", "https://other.example/a") is None
+    assert canonical_hint("http://x.com/a", None) is None
+
+
+def test_banded_lsh_finds_every_close_pair():
+    rng = random.Random(1)
+    hashes = {i: rng.getrandbits(64) for i in range(300)}
+    for i in range(300, 400):  # Copies of earlier hashes with up to 3 flipped bits
+        value = hashes[i - 300]
+        for bit in rng.sample(range(64), rng.randint(0, 3)):
+            value ^= 1 << bit
+        hashes[i] = value
+    brute = {(a, b) for a in hashes for b in hashes if a < b and hamming(hashes[a], hashes[b]) <= 3}
+    found = {tuple(sorted(pair[:2])) for pair in near_duplicate_pairs(hashes, 3)}
+    assert found == brute and len(brute) >= 100
+
+
+def test_duplicate_report(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dupes.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        Bookmark(id=1, url="http://x.com/post?utm_source=a", title="Tuning postgres indexes for web apps"),
+        Bookmark(id=2, url="https://www.x.com/post/", title="Something else entirely"),
+        Bookmark(id=3, url="https://blog.example/tuning", title="Tuning postgres indexes for web apps",
+                 description="Query plans and caching"),
+        Bookmark(id=4, url="https://mirror.example/tuning", title="Tuning postgres indexes for web apps!",
+                 description="Query plans and caching"),
+        Bookmark(id=5, url="https://other.example/", title="Weeknight pasta recipes with seasonal vegetables"),
+        # Saved when the redirect target replaced the canonical URL; the backfill moves it to the hint
+        Bookmark(id=6, url="https://x.com/p/7", canonical_url="https://x.com/post", title="Short link"),
+    ])
+    db.commit()
+    assert backfill_canonical_urls(engine) == 6
+    assert backfill_canonical_urls(engine) == 0
+    assert simhash("Tuning postgres indexes") == simhash("tuning, POSTGRES indexes")
+
+    report = find_duplicates(db)
+    assert [[b["id"] for b in group["bookmarks"]] for group in report["exact"]] == [[1, 2]]
+    assert report["exact"][0]["canonical_url"] == "https://x.com/post"
+    assert [[b["id"] for b in group["bookmarks"]] for group in report["hinted"]] == [[1, 2, 6]]
+    assert [[b["id"] for b in group["bookmarks"]] for group in report["near"]] == [[3, 4]]
+
+
+@patch("app.services.enrichment.fetch_metadata_combined")
+def test_adding_the_same_page_again_is_rejected(mock_fetch):
+    mock_fetch.return_value = {"webicon": "/static/favicon.ico"}
+    slug = uuid.uuid4().hex
+    created = client.post("/bookmarks", json={"url": f"https://www.example.com/{slug}/?utm_medium=x"}).json()
+    assert created["canonical_url"] == f"https://example.com/{slug}"
+    response = client.post("/bookmarks", json={"url": f"http://example.com/{slug}"})
+    assert response.status_code == 409
+    Worker().drain()
+    fetched = [call.args[0] for call in mock_fetch.call_args_list]
+    assert f"https://www.example.com/{slug}/?utm_medium=x" in fetched
+    assert f"http://example.com/{slug}" not in fetched  # Rejected before anything was queued
+
+    # The fetch can reveal a duplicate too, via redirects or rel=canonical; the worker records it as a hint
+    mock_fetch.return_value = {"webicon": "/static/favicon.ico", "canonical_url": f"https://example.com/{slug}"}
+    short = client.post("/bookmarks", json={"url": f"https://example.com/short/{slug}"}).json()
+    Worker().drain()
+    assert short["canonical_url"] == f"https://example.com/short/{slug}"
+    report = client.get("/duplicates").json()
+    assert [created["id"], short["id"]] in [[b["id"] for b in group["bookmarks"]] for group in report["hinted"]]
+    assert short["id"] not in [b["id"] for group in report["exact"] for b in group["bookmarks"]]
+    assert client.get("/duplicates?distance=40").status_code == 400
+    client.delete(f"/bookmarks/{created['id']}")
+    client.delete(f"/bookmarks/{short['id']}")
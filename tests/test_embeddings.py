@@ -0,0 +1,88 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.models import Base, Bookmark
+from app.services import embeddings
+from app.services.embeddings import EmbeddingIndex, EmbeddingUpdater, HashingEncoder
+
+client = TestClient(app)
+
+
+def make_index(path):
+    return EmbeddingIndex(path, encoder_factory=lambda: HashingEncoder(64), writable=True)
+
+
+def test_similar_ranks_related_text_first(tmp_path):
+    index = make_index(tmp_path)
+    index.upsert([
+        (1, "python web framework tutorial"),
+        (2, "python web framework documentation"),
+        (3, "chocolate cake recipe"),
+    ])
+    ranked = index.similar(1, k=2)
+    assert [bookmark_id for bookmark_id, _ in ranked][0] == 2
+    assert index.query("cake recipe", k=1)[0][0] == 3
+
+    index.remove([2])
+    assert 2 not in index
+    assert all(bookmark_id != 2 for bookmark_id, _ in index.similar(1, k=5))
+
+
+def test_index_persists_and_grows(tmp_path):
+    with patch.object(embeddings, "INITIAL_CAPACITY", 4):
+        index = make_index(tmp_path)
+        index.upsert([(i, f"bookmark number {i}") for i in range(10)])
+    reopened = make_index(tmp_path)
+    assert len(reopened) == 10
+    assert reopened.similar(3, k=1)[0][0] != 3
+
+
+def test_readers_reload_what_the_single_writer_saves(tmp_path):
+    writer = make_index(tmp_path)
+    reader = EmbeddingIndex(tmp_path, encoder_factory=lambda: HashingEncoder(64))
+    assert len(reader) == 0
+    with pytest.raises(RuntimeError):
+        reader.upsert([(1, "python web framework")])
+
+    writer.upsert([(1, "python web framework"), (2, "chocolate cake recipe")])
+    assert reader.query("cake", k=1)[0][0] == 2
+    writer.remove([2])
+    assert 2 not in reader and len(reader) == 1
+
+
+def test_updater_syncs_index_with_bookmarks_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add_all([
+        Bookmark(id=1, url="http://a.example.com", title="python web framework"),
+        Bookmark(id=2, url="http://b.example.com", title="chocolate cake recipe"),
+    ])
+    db.commit()
+    index = EmbeddingIndex(tmp_path / "index", encoder_factory=lambda: HashingEncoder(64))
+    updater = EmbeddingUpdater(index, session_factory=session_factory)
+
+    assert updater.sync() == 2 and index.writable
+    assert updater.sync() == 0  # Nothing changed since
+    assert index.query("cake recipe", k=1)[0][0] == 2
+
+    db.get(Bookmark, 1).title = "sourdough bread recipe"
+    db.get(Bookmark, 1).updated_at = datetime(2030, 1, 1)
+    db.delete(db.get(Bookmark, 2))
+    db.commit()
+    assert updater.sync() == 2
+    assert 2 not in index
+    assert index.query("bread", k=1)[0][0] == 1
+    db.close()
+
+
+def test_search_rejects_unknown_mode():
+    response = client.get("/search", params={"query": "x", "mode": "fuzzy"})
+    assert response.status_code == 400
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+from app.services.event_bus import EventBus, format_sse, ICON_UPDATED, LINK_STATUS_CHANGED
+
+
+def test_event_published_from_worker_thread_reaches_subscriber():
+    bus = EventBus()
+
+    async def receive():
+        subscription = bus.subscribe()
+        worker = threading.Thread(target=bus.publish, args=(ICON_UPDATED, 7), kwargs={"webicon": "/static/icons/x.png"})
+        worker.start()
+        event = await asyncio.wait_for(subscription.queue.get(), timeout=2)
+        bus.unsubscribe(subscription)
+        return event
+
+    event = asyncio.run(receive())
+    assert event["type"] == ICON_UPDATED
+    assert event["bookmark_id"] == 7
+    assert event["data"]["webicon"] == "/static/icons/x.png"
+    assert format_sse(event).startswith(f"id: {event['id']}\nevent: icon_updated\n")
+
+
+def test_link_status_only_published_on_change():
+    bus = EventBus()
+
+    async def receive():
+        subscription = bus.subscribe()
+        bus.record_link_status(1, "http://10.0.0.1", True)
+        bus.record_link_status(1, "http://10.0.0.1", True)
+        bus.record_link_status(1, "http://10.0.0.1", False)
+        await asyncio.sleep(0.05)
+        events = []
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait())
+        return events
+
+    events = asyncio.run(receive())
+    assert [e["data"]["online"] for e in events] == [True, False]
+    assert all(e["type"] == LINK_STATUS_CHANGED for e in events)
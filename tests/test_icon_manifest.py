@@ -0,0 +1,85 @@
+from pathlib import Path
+from unittest.mock import patch
+
+from app.services import icon_manifest as manifest_module
+from app.services.icon_manifest import IconManifest
+
+
+def make_manifest(tmp_path):
+    app_dir = tmp_path / "app"
+    icons = app_dir / "static" / "icons"
+    (icons / "example.com").mkdir(parents=True)
+    (icons / "example.com" / "favicon.png").write_bytes(b"x" * 10)
+    patches = [
+        patch.object(manifest_module, "APP_DIR", app_dir),
+        patch.object(manifest_module, "STATIC_DIR", app_dir / "static"),
+    ]
+    for p in patches:
+        p.start()
+    manifest = IconManifest(roots=(icons,), snapshot_path=tmp_path / "manifest.json")
+    return manifest, icons, patches
+
+
+def test_lookups_are_answered_from_index(tmp_path):
+    manifest, icons, patches = make_manifest(tmp_path)
+    try:
+        manifest.load()
+        assert manifest.size("/static/icons/example.com/favicon.png") == 10
+        assert not manifest.exists("/static/icons/example.com/missing.png")
+
+        new_icon = icons / "example.com" / "og-image.png"
+        new_icon.write_bytes(b"y" * 3)
+        manifest.add(new_icon)
+        assert manifest.size("/static/icons/example.com/og-image.png") == 3
+
+        dest_dir = icons / "other.org"
+        manifest.ensure_dir(dest_dir)
+        dest = dest_dir / "og-image.png"
+        new_icon.rename(dest)
+        manifest.move(new_icon, dest)
+        assert not manifest.exists("/static/icons/example.com/og-image.png")
+        assert manifest.list_dir(dest_dir) == ["/static/icons/other.org/og-image.png"]
+    finally:
+        for p in patches:
+            p.stop()
+
+
+def test_snapshot_skips_unchanged_directories(tmp_path):
+    manifest, icons, patches = make_manifest(tmp_path)
+    try:
+        manifest.load()
+        manifest.save()
+        assert (tmp_path / "manifest.json").exists()
+
+        restarted = IconManifest(roots=(icons,), snapshot_path=tmp_path / "manifest.json")
+        with patch.object(IconManifest, "_scan_dir") as scan:
+            restarted.load()
+        scan.assert_not_called()
+        assert restarted.size("/static/icons/example.com/favicon.png") == 10
+    finally:
+        for p in patches:
+            p.stop()
+
+
+def test_sees_icons_written_and_deleted_by_other_processes(tmp_path):
+    manifest, icons, patches = make_manifest(tmp_path)
+    try:
+        manifest.load()
+        other = IconManifest(roots=(icons,), snapshot_path=tmp_path / "other.json")
+        other.load()
+
+        # Written by another process: found on the filesystem check behind the miss
+        written = icons / "example.com" / "icon_1.png"
+        written.write_bytes(b"z" * 4)
+        other.add(written)
+        assert manifest.size("/static/icons/example.com/icon_1.png") == 4
+
+        # Deleted by another process (e.g. the icon GC): picked up by the periodic refresh
+        (icons / "example.com" / "favicon.png").unlink()
+        other.remove(icons / "example.com" / "favicon.png")
+        assert manifest.refresh() == 1
+        assert not manifest.exists("/static/icons/example.com/favicon.png")
+        assert manifest.exists("/static/icons/example.com/icon_1.png")
+    finally:
+        for p in patches:
+            p.stop()
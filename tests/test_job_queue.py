@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Bookmark, SessionLocal
+from app.services.enrichment import CHECK_LINK, ENRICH_BOOKMARK, JobEventRelay, sweep_unenriched
+from app.services.event_bus import event_bus
+from app.services.job_queue import JobQueue
+from app.worker import Worker
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2024, 3, 1, 12, 0)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+def make_queue(tmp_path, clock, **options):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    return JobQueue(bind=engine, clock=clock, **options), sessionmaker(bind=engine)()
+
+
+def test_claims_are_exclusive_and_expired_leases_are_reclaimed(tmp_path):
+    clock = Clock()
+    queue, db = make_queue(tmp_path, clock, visibility_timeout=60, max_attempts=2)
+    assert queue.enqueue_many(db, ENRICH_BOOKMARK, [1, 2]) == [1, 2]
+    assert queue.enqueue_many(db, ENRICH_BOOKMARK, [1, 3]) == [3]  # 1 is already queued
+
+    first, second = queue.claim("a"), queue.claim("b")
+    assert (first["bookmark_id"], second["bookmark_id"]) == (1, 2)
+    third = queue.claim("c")
+    assert third["bookmark_id"] == 3 and queue.claim("c") is None
+    assert queue.complete(third["id"], "c")
+
+    # "a" keeps heartbeating; "b" goes silent and its job is handed to another worker
+    clock.advance(50)
+    assert queue.heartbeat(first["id"], "a")
+    clock.advance(20)
+    reclaimed = queue.claim("d")
+    assert reclaimed["id"] == second["id"] and reclaimed["attempts"] == 2
+    assert not queue.heartbeat(second["id"], "b") and not queue.complete(second["id"], "b")
+    assert queue.complete(second["id"], "d")
+
+    # A failed attempt is retried with backoff; the last one fails for good
+    assert queue.fail(first["id"], "a", "timeout") == "queued"
+    assert queue.claim("a") is None
+    clock.advance(3600)
+    retry = queue.claim("a")
+    assert retry["id"] == first["id"] and retry["attempts"] == 2
+    assert queue.fail(retry["id"], "a", "timeout") == "failed"
+    assert queue.stats()["counts"] == {"queued": 0, "running": 0, "done": 2, "failed": 1}
+    assert queue.enqueue_many(db, ENRICH_BOOKMARK, [1], skip_failed=True) == []
+
+    clock.advance(8 * 86400)
+    assert queue.prune(retention_days=7) == 3
+
+
+@patch("app.services.enrichment.publish_bookmark_event")
+@patch("app.services.enrichment.fetch_metadata_combined")
+def test_worker_enriches_bookmarks_and_retries_fetch_errors(mock_fetch, mock_publish, tmp_path):
+    clock = Clock()
+    queue, db = make_queue(tmp_path, clock)
+    session = SessionLocal()
+    bookmark = Bookmark(url="http://example.com/queued", webicon="/static/favicon.ico")
+    session.add(bookmark)
+    session.commit()
+    queue.enqueue(db, ENRICH_BOOKMARK, bookmark.id)
+    mock_fetch.side_effect = [
+        {"error": "Read timed out"},
+        {"title": "Fetched title", "description": "About", "webicon": "/static/favicon.ico", "icon_candidates": []},
+    ]
+    worker = Worker(queue=queue, worker_id="w1")
+    relay = JobEventRelay(bind=queue.bind, clock=clock)
+
+    assert worker.drain() == 1  # Fails, then waits out its backoff
+    assert queue.stats()["counts"]["queued"] == 1
+    clock.advance(3600)
+    assert worker.drain() == 1
+    assert queue.stats()["counts"]["done"] == 1
+    session.refresh(bookmark)
+    assert (bookmark.title, bookmark.description, bookmark.icon_candidates) == ("Fetched title", "About", "/static/favicon.ico")
+
+    assert relay.poll() == 1 and relay.poll() == 0
+    assert mock_publish.call_args.args[1].id == bookmark.id
+
+    # Without SSE subscribers the relay skips the database; with them, idle polls back off
+    relay = JobEventRelay(bind=queue.bind, clock=clock, poll_interval=1, max_poll_interval=4)
+    with patch.object(relay, "poll", return_value=0) as mock_poll:
+        assert relay.next_interval(1) == 1 and not mock_poll.called
+        with patch.object(event_bus, "has_subscribers", return_value=True):
+            assert [relay.next_interval(i) for i in (1, 2, 4)] == [2, 4, 4]
+            mock_poll.return_value = 1
+            assert relay.next_interval(4) == 1
+    session.delete(bookmark)
+    session.commit()
+    session.close()
+
+
+def test_embedded_workers_stand_by_while_a_standalone_worker_is_alive(tmp_path):
+    clock = Clock()
+    queue, db = make_queue(tmp_path, clock, visibility_timeout=60)
+    queue.enqueue_many(db, ENRICH_BOOKMARK, [1])
+    standalone = Worker(queue=queue, handlers={ENRICH_BOOKMARK: lambda job: None}, worker_id="standalone")
+    embedded = Worker(queue=queue, handlers={ENRICH_BOOKMARK: lambda job: None}, worker_id="api", embedded=True)
+    assert not embedded.standing_by()
+
+    standalone._announce()
+    embedded._presence_checked = 0.0  # Skip the cached answer
+    assert queue.standalone_workers() == 1 and embedded.standing_by()
+    clock.advance(61)  # Stopped heartbeating
+    embedded._presence_checked = 0.0
+    assert not embedded.standing_by()
+    assert queue.prune() == 0 and queue.standalone_workers() == 0
+
+
+def test_sweep_queues_unenriched_bookmarks_in_capped_batches():
+    session = SessionLocal()
+    bookmarks = [Bookmark(url=f"http://example.com/sweep/{i}/{id(session)}") for i in range(3)]
+    session.add_all(bookmarks)
+    session.commit()
+    try:
+        with patch("app.services.enrichment.enqueue_enrichment", side_effect=lambda db, ids, **kw: ids) as mock_enqueue:
+            assert sweep_unenriched(limit=2) == 2
+        assert len(mock_enqueue.call_args.args[1]) == 2
+    finally:
+        for bookmark in bookmarks:
+            session.delete(bookmark)
+        session.commit()
+        session.close()
+
+
+@patch("app.services.enrichment.is_page_online", return_value=False)
+def test_link_checks_are_stored_and_relayed_as_events(mock_online, tmp_path):
+    clock = Clock()
+    queue, db = make_queue(tmp_path, clock)
+    edited = datetime(2000, 1, 1)
+    db.add(Bookmark(id=9001, url="http://gone.example/page", updated_at=edited))
+    db.commit()
+    relay = JobEventRelay(bind=queue.bind, clock=datetime.utcnow)
+    relay.link_cursor = datetime.utcnow() - timedelta(minutes=5)
+    queue.enqueue(db, CHECK_LINK, 9001)
+    with patch("app.services.enrichment.engine", queue.bind), \
+            patch("app.services.enrichment.SessionLocal", sessionmaker(bind=queue.bind)):
+        assert Worker(queue=queue, worker_id="w1").drain() == 1
+    db.expire_all()
+    bookmark = db.get(Bookmark, 9001)
+    assert bookmark.link_online is False and bookmark.updated_at == edited
+    mock_online.assert_called_once_with("http://gone.example/page")
+
+    with patch.object(event_bus, "publish") as mock_publish:
+        assert relay.poll() == 1 and relay.poll() == 0  # Reread in the overlap, but unchanged
+    assert mock_publish.call_args.kwargs == {"url": "http://gone.example/page", "online": False}
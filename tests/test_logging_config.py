@@ -0,0 +1,44 @@
+import json
+import logging
+import queue
+
+from app.logging_config import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+from app.services.metrics import LOG_RECORDS_DROPPED
+
+
+def _record(msg, *args, level=logging.INFO, **extra):
+    record = logging.LogRecord("test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampling_filter_keeps_one_in_n_per_template():
+    sampler = SamplingFilter()
+    kept = [sampler.filter(_record("Saved icon %s", i, sample_rate=0.1)) for i in range(100)]
+    assert sum(kept) == 10
+    # Unsampled records and errors always pass; sampled warnings are thinned like INFO
+    assert sampler.filter(_record("Plain message"))
+    assert sampler.filter(_record("Saved icon %s", 1, level=logging.ERROR, sample_rate=0.1))
+    warnings = [sampler.filter(_record("Slow icon %s", i, level=logging.WARNING, sample_rate=0.5)) for i in range(10)]
+    assert sum(warnings) == 5
+
+
+def test_queue_handler_formats_args_eagerly_and_counts_drops():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    tags = ["news"]
+    handler.handle(_record("Tags: %s", tags))
+    tags.append("later")
+    assert handler.queue.get_nowait().getMessage() == "Tags: ['news']"
+
+    dropped = LOG_RECORDS_DROPPED.value(level="INFO")
+    handler.handle(_record("First"))
+    handler.handle(_record("Second"))
+    assert LOG_RECORDS_DROPPED.value(level="INFO") == dropped + 1
+
+
+def test_json_formatter_formats_lazily_and_keeps_extra_fields():
+    line = JsonFormatter().format(_record("Response: %s", 200, route="/bookmarks"))
+    entry = json.loads(line)
+    assert entry["message"] == "Response: 200"
+    assert entry["route"] == "/bookmarks"
+    assert entry["level"] == "INFO"
@@ -34,4 +34,11 @@ def test_delete_bookmark():
     response = client.delete("/bookmarks/1")
     assert response.status_code == 204
     response = client.get("/bookmarks/1")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_metrics_endpoint_exports_request_latency():
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
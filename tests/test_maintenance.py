@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import Bookmark, EnrichmentJob, ReenrichJob, SessionLocal
+from app.services.enrichment import reenrich_bookmark
+from app.services.reenrich import (
+    REENRICH_BOOKMARK, HostSpacing, ReenrichRunner, claim_job, create_job, group_key, matches_criteria,
+)
+from app.worker import Worker
+
+client = TestClient(app)
+
+
+def _make_bookmarks(urls):
+    db = SessionLocal()
+    try:
+        bookmarks = [Bookmark(url=url, title="Old title", tags="reenrich-test") for url in urls]
+        db.add_all(bookmarks)
+        db.commit()
+        return [b.id for b in bookmarks]
+    finally:
+        db.close()
+
+
+def _cleanup(ids, job_id=None):
+    db = SessionLocal()
+    try:
+        db.query(Bookmark).filter(Bookmark.id.in_(ids)).delete(synchronize_session=False)
+        if job_id:
+            db.query(ReenrichJob).filter(ReenrichJob.id == job_id).delete()
+            db.query(EnrichmentJob).filter(EnrichmentJob.group_key == group_key(job_id)).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_host_spacing_spaces_requests_to_same_host():
+    now = datetime(2024, 1, 1)
+    spacing = HostSpacing(min_interval=5, clock=lambda: now)
+    slots = [spacing.next_slot("example.com") for _ in range(3)]
+    assert slots == [now, now + timedelta(seconds=5), now + timedelta(seconds=10)]
+    assert spacing.next_slot("other.test") == now
+
+
+@patch("app.services.enrichment.fetch_metadata_combined")
+def test_reenrich_runner_queues_bookmarks_and_counts_finished_jobs(mock_fetch):
+    mock_fetch.return_value = {"title": "Fresh title", "description": "Fresh description", "icon_candidates": []}
+    ids = _make_bookmarks([f"https://reenrich-{i}.test/page" for i in range(5)])
+    db = SessionLocal()
+    job = create_job(db, {"tag": "reenrich-test", "batch_size": 2, "workers": 2, "per_host_delay": 0})
+    db.close()
+    try:
+        runner = ReenrichRunner(job.id, poll_interval=0.01)
+        runner.start()
+        # Stands in for python -m app.worker; the runner itself never fetches
+        worker = Worker(handlers={REENRICH_BOOKMARK: reenrich_bookmark}, worker_id="reenrich-test")
+        while runner.thread.is_alive():
+            worker.drain()
+            runner.thread.join(0.01)
+        assert mock_fetch.call_count == 5
+        db = SessionLocal()
+        job = db.query(ReenrichJob).filter(ReenrichJob.id == job.id).first()
+        assert job.status == "completed"
+        assert job.processed == 5 and job.succeeded == 5
+        assert job.last_bookmark_id == max(ids)
+        titles = {b.title for b in db.query(Bookmark).filter(Bookmark.id.in_(ids)).all()}
+        assert titles == {"Fresh title"}
+        db.close()
+    finally:
+        _cleanup(ids, job.id)
+
+
+def test_reenrich_request_rejects_out_of_range_settings():
+    for settings in ({"workers": 0}, {"workers": 10000}, {"batch_size": 0}, {"per_host_delay": -1}):
+        assert client.post("/maintenance/reenrich", json=settings).status_code == 422
+
+
+def test_get_unknown_reenrich_job_returns_404():
+    response = client.get("/maintenance/reenrich/999999")
+    assert response.status_code == 404
+
+
+def test_domain_criteria_match_the_host_and_its_subdomains_only():
+    criteria = {"domain": "example.com"}
+    assert matches_criteria("https://example.com/a", criteria)
+    assert matches_criteria("http://docs.example.com:8080/a", criteria)
+    assert matches_criteria("example.com/no-scheme", criteria)
+    assert not matches_criteria("https://example.com.evil.net/", criteria)
+    assert not matches_criteria("https://notexample.com/", criteria)
+    assert not matches_criteria("https://other.net/example.com", criteria)
+    assert not matches_criteria("https://exampleXcom.net/", {"domain": "example_com"})
+
+
+def test_only_one_process_claims_a_job_and_cancel_reports_it():
+    db = SessionLocal()
+    job = create_job(db, {"tag": "no-such-tag"})
+    db.close()
+    try:
+        assert claim_job(job.id, "worker-a") and claim_job(job.id, "worker-a")
+        assert not claim_job(job.id, "worker-b")
+        assert client.post(f"/maintenance/reenrich/{job.id}/cancel").json()["status"] == "cancelled"
+        assert not claim_job(job.id, "worker-a")
+    finally:
+        _cleanup([], job.id)
+
+
+def test_progress_stream_ends_with_the_finished_job():
+    db = SessionLocal()
+    job = create_job(db, {"tag": "no-such-tag"})
+    job.status = "completed"
+    db.commit()
+    db.refresh(job)
+    db.close()
+    try:
+        response = client.get(f"/maintenance/reenrich/{job.id}/events")
+        assert response.status_code == 200
+        assert "event: progress" in response.text
+        assert response.text.rstrip().split("\n\n")[-1].startswith("event: done")
+    finally:
+        _cleanup([], job.id)
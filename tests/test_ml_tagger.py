@@ -0,0 +1,57 @@
+import threading
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.ml_tagger import MicroBatcher, MLTagger
+
+client = TestClient(app)
+
+
+class FakeModel:
+    """Scores a label 0.9 when it appears in the text, else 0.1, and records batch sizes."""
+
+    def __init__(self, model_path):
+        self.batches = []
+
+    def score(self, pairs):
+        self.batches.append(len(pairs))
+        return [0.9 if label in text else 0.1 for text, label in pairs]
+
+
+def test_micro_batcher_combines_concurrent_requests():
+    model = FakeModel(None)
+    batcher = MicroBatcher(model.score, max_batch=8, max_wait=0.2)
+    results = [None] * 8
+
+    def run(i):
+        results[i] = batcher.submit(f"text about tag{i}", [f"tag{i}", "other"]).result(timeout=5)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results[3] == {"tag3": 0.9, "other": 0.1}
+    assert len(model.batches) < 8
+
+
+def test_tagger_caches_by_content():
+    models = []
+    tagger = MLTagger("fake-model", model_factory=lambda path: models.append(FakeModel(path)) or models[-1])
+    assert tagger.suggest("a python tutorial", ["python", "cooking"]) == ["python"]
+    assert tagger.suggest("a python tutorial", ["python", "cooking"]) == ["python"]
+    assert models[0].batches == [2]
+
+
+def test_suggest_tags_falls_back_to_tfidf_when_model_fails():
+    failing = MLTagger("missing-model", model_factory=lambda path: 1 / 0)
+    with patch("app.routes.bookmarks.ml_tagger", failing):
+        response = client.post(
+            "/suggest-tags",
+            json={"title": "Python tutorial", "description": "programming guide", "url": "https://example.org/fallback"},
+        )
+    assert response.status_code == 200
+    assert "tags" in response.json()
+    assert not failing.enabled
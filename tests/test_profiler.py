@@ -0,0 +1,90 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import profiler
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = profiler.ProfileStore(tmp_path / "profiles", keep=2)
+    monkeypatch.setattr(profiler, "profile_store", store)
+    monkeypatch.setattr("app.main.profile_store", store)
+    return store
+
+
+def slow_classify(url):
+    time.sleep(0.05)
+    return None
+
+
+def suggest(**kwargs):
+    with patch("app.routes.bookmarks.domain_rules.classify", side_effect=slow_classify):
+        return client.post("/suggest-tags", json={"title": f"Profiled {time.time()}", "url": "http://example.com"},
+                           **kwargs)
+
+
+def test_requested_profile_is_stored_and_served(store, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_TOKEN", "secret")
+    response = suggest(headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    assert client.get("/diagnostics/profiles").status_code == 403
+    listing = client.get("/diagnostics/profiles", headers={"X-Profile": "secret"}).json()["profiles"]
+    assert listing[0]["id"] == profile_id
+    assert listing[0]["route"] == "/suggest-tags" and listing[0]["trigger"] == "requested"
+    assert listing[0]["samples"] > 0
+
+    body = client.get(f"/diagnostics/profiles/{profile_id}?profile=secret").text
+    stack, count = body.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("suggest_tags (app/routes/bookmarks.py" in line for line in body.splitlines())
+    assert client.get("/diagnostics/profiles/..%2Fsecrets?profile=secret").status_code == 404
+
+
+def test_wrong_token_and_disabled_profiling_add_nothing(store, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_TOKEN", "secret")
+    assert "X-Profile-Id" not in suggest(headers={"X-Profile": "guess"}).headers
+    monkeypatch.setattr(profiler, "PROFILE_TOKEN", "")
+    assert "X-Profile-Id" not in client.get("/?profile=1").headers
+    assert store.list() == []
+
+
+def test_sampled_profiles_are_pruned_to_keep(store, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_SAMPLE_RATE", 1.0)
+    ids = [client.get("/").headers["X-Profile-Id"] for _ in range(3)]
+    assert client.get("/diagnostics/profiles").status_code == 403  # Disabled without a token
+    monkeypatch.setattr(profiler, "PROFILE_TOKEN", "secret")
+    listing = client.get("/diagnostics/profiles?profile=secret").json()["profiles"]
+    assert {p["trigger"] for p in listing} == {"sampled"}
+    assert len(listing) == 2 and ids[0] not in {p["id"] for p in listing}
+
+
+def test_sampler_only_records_the_requests_own_thread():
+    busy = threading.Event()
+    stop = threading.Event()
+
+    def other_request():
+        busy.set()
+        while not stop.is_set():
+            sum(range(1000))
+
+    neighbour = threading.Thread(target=other_request, name="other-request")
+    neighbour.start()
+    busy.wait()
+    sampler = profiler.StackSampler(interval=0.001).start()
+    try:
+        profiler._tracked(lambda: time.sleep(0.05))()
+    finally:
+        stacks = sampler.stop()
+        stop.set()
+        neighbour.join()
+    assert stacks and all(stack.startswith("MainThread;") for stack in stacks)
+    assert any("sleep" in stack or "<lambda>" in stack for stack in stacks)
@@ -1,7 +1,11 @@
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from unittest.mock import patch, MagicMock
+from sqlalchemy import create_engine
+from app.models import Base, Bookmark, SessionLocal
 
 client = TestClient(app)
 
@@ -22,6 +26,26 @@ def test_get_bookmarks():
     assert response.status_code == 200
     assert isinstance(response.json(), list)
 
+def test_get_bookmarks_paged():
+    run = uuid.uuid4().hex
+    db = SessionLocal()
+    added = [Bookmark(url=f"http://paged-{i}-{run}.example.com", title=f"Paged {i}") for i in range(5)]
+    db.add_all(added)
+    db.commit()
+    try:
+        total = len(client.get("/bookmarks").json())
+        six = [b["id"] for b in client.get("/bookmarks?sort=created&limit=6").json()]
+        first = client.get("/bookmarks?sort=created&limit=3")
+        second = client.get("/bookmarks?sort=created&limit=3&offset=3")
+        assert first.headers["X-Total-Count"] == str(total)
+        assert [b["id"] for b in first.json()] + [b["id"] for b in second.json()] == six
+        assert client.get("/bookmarks?limit=0").status_code == 400
+    finally:
+        for bookmark in added:
+            db.delete(bookmark)
+        db.commit()
+        db.close()
+
 @patch("app.routes.bookmarks.fetch_metadata_combined")
 def test_get_metadata(mock_fetch_metadata):
     mock_fetch_metadata.return_value = {
@@ -41,3 +65,65 @@ def test_search_bookmarks():
     response = client.get("/search", params={"query": "example"})
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+@patch("app.routes.bookmarks.fetch_metadata_combined")
+def test_preview_token_skips_second_fetch(mock_fetch_metadata):
+    mock_fetch_metadata.return_value = {
+        "title": "Preview Title",
+        "description": "",
+        "webicon": "/static/favicon.ico",
+        "icon_candidates": ["/static/favicon.ico"],
+        "extra_metadata": {},
+    }
+    preview = client.post("/fetch-metadata", json={"url": "http://preview.example.com"}).json()
+    assert preview["preview_token"]
+    response = client.post(
+        "/bookmarks",
+        json={"url": "http://preview.example.com", "preview_token": preview["preview_token"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["webicon"] == "/static/favicon.ico"
+    assert response.json()["icon_candidates"] == ["/static/favicon.ico"]
+    assert mock_fetch_metadata.call_count == 1
+
+def test_preview_token_rejects_other_url(tmp_path):
+    from app.services.preview_store import PreviewStore
+    engine = create_engine(f"sqlite:///{tmp_path / 'previews.db'}")
+    Base.metadata.create_all(bind=engine)
+    store = PreviewStore(ttl=60, bind=engine)
+    token = store.issue("http://a.example.com", {"title": "A"})
+    # Another worker process sees the same previews
+    other = PreviewStore(ttl=60, bind=engine)
+    assert other.redeem(token + "0", "http://a.example.com") is None
+    assert other.redeem(token, "http://b.example.com") is None
+    assert other.redeem(token, "http://a.example.com") == {"title": "A"}
+    assert store.redeem(token, "http://a.example.com") is None
+
+    expired = PreviewStore(ttl=-1, bind=engine)
+    stale = expired.issue("http://a.example.com", {"title": "A"})
+    assert store.redeem(stale, "http://a.example.com") is None
+    assert store.purge_expired() == 1
+
+def test_website_renders():
+    response = client.get("/website")
+    assert response.status_code == 200
+    assert 'id="bookmark-card-template"' in response.text
+
+@patch("app.routes.bookmarks.is_page_online", return_value=True)
+def test_page_status_checks_the_stored_url_for_a_bookmark(mock_online):
+    db = SessionLocal()
+    bookmark = Bookmark(url=f"http://status-{uuid.uuid4().hex}.example.com")
+    db.add(bookmark)
+    db.commit()
+    try:
+        response = client.get("/page-status", params={"url": "http://elsewhere.example", "bookmark_id": bookmark.id})
+        assert response.json() == {"url": bookmark.url, "online": True}
+        mock_online.assert_called_once_with(bookmark.url)
+        db.refresh(bookmark)
+        assert bookmark.link_online is True and bookmark.link_checked_at is not None
+        assert client.get("/page-status", params={"bookmark_id": 10**9}).status_code == 404
+        assert client.get("/page-status").status_code == 400
+    finally:
+        db.delete(bookmark)
+        db.commit()
+        db.close()
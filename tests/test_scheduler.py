@@ -0,0 +1,105 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+from app.models import Base
+from app.services.scheduler import CronSchedule, LeaderLease, Scheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2024, 3, 1, 12, 0).timestamp()
+
+    def __call__(self):
+        return self.now
+
+
+def test_cron_next_run():
+    after = datetime(2024, 3, 1, 12, 7, 30)  # A Friday
+    assert CronSchedule("*/15 * * * *").next_after(after) == datetime(2024, 3, 1, 12, 15)
+    assert CronSchedule("30 3 * * *").next_after(after) == datetime(2024, 3, 2, 3, 30)
+    assert CronSchedule("0 9 * * 1-5").next_after(after) == datetime(2024, 3, 4, 9, 0)
+    assert CronSchedule("0 0 1 * 0").next_after(after) == datetime(2024, 3, 3, 0, 0)  # Day 1 or a Sunday
+    assert CronSchedule("0 0 29 2 *").next_after(after) == datetime(2028, 2, 29, 0, 0)
+    # As in cron, "*/2" counts as unrestricted, so both day fields must match: odd days that are Mondays
+    assert CronSchedule("0 0 */2 * 1").next_after(after) == datetime(2024, 3, 11, 0, 0)
+
+
+def test_lease_allows_one_holder_until_it_expires_or_is_released(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'lease.db'}")
+    Base.metadata.create_all(bind=engine)
+    a, b = LeaderLease(ttl=30, bind=engine, owner="a"), LeaderLease(ttl=30, bind=engine, owner="b")
+    assert a.acquire() and a.acquire()
+    assert not b.acquire()
+    a.release()
+    assert b.acquire() and not a.acquire()
+
+    dead = LeaderLease(ttl=-1, bind=engine, owner="dead")  # Its lease is already expired when written
+    b.release()
+    assert dead.acquire()
+    assert a.acquire()
+
+
+def test_leader_only_jobs_run_once_across_processes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scheduler.db'}")
+    Base.metadata.create_all(bind=engine)
+    clock = Clock()
+    runs = []
+    schedulers = [Scheduler(LeaderLease(bind=engine, owner=name), clock=clock) for name in ("w1", "w2")]
+    for s in schedulers:
+        s.add_job("purge", lambda s=s: runs.append(("purge", s.lease.owner)), interval=3600)
+        s.add_job("local", lambda s=s: runs.append(("local", s.lease.owner)), interval=3600, leader_only=False)
+        s.tick()
+    assert sorted(runs) == [("local", "w1"), ("local", "w2"), ("purge", "w1")]
+    assert [s.is_leader for s in schedulers] == [True, False]
+
+    # The leader shuts down; the other takes over and continues the schedule rather than restarting it
+    clock.now += 600
+    schedulers[0].stop()
+    runs.clear()
+    schedulers[1].tick()
+    assert schedulers[1].is_leader and runs == []
+    clock.now += 3000
+    schedulers[1].tick()
+    assert runs == [("purge", "w2"), ("local", "w2")]
+    assert schedulers[1].status()["jobs"][0]["last_status"] == "ok"
+
+
+def test_once_jobs_run_on_each_new_leader_and_cron_is_utc(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scheduler.db'}")
+    Base.metadata.create_all(bind=engine)
+    clock = Clock()
+    clock.now = (datetime(2024, 3, 1, 12, 0) - datetime(1970, 1, 1)).total_seconds()  # Noon UTC
+    runs = []
+    schedulers = [Scheduler(LeaderLease(bind=engine, owner=name), clock=clock) for name in ("w1", "w2")]
+    for s in schedulers:
+        s.add_job("backfill", lambda s=s: runs.append(s.lease.owner), once=True)
+        s.add_job("daily", lambda: None, cron="30 3 * * *")
+        s.tick()
+        s.tick()
+    assert runs == ["w1"]
+    assert schedulers[0].status()["jobs"][0]["next_run"] is None
+    assert datetime.utcfromtimestamp(schedulers[0].jobs()[1].next_run) == datetime(2024, 3, 2, 3, 30)
+    assert schedulers[0].status()["jobs"][1]["next_run"] == "2024-03-02T03:30:00+00:00"
+
+    schedulers[0].stop()
+    clock.now += 60
+    schedulers[1].tick()
+    assert runs == ["w1", "w2"]  # The new leader redoes it, in case the old one died half-way
+
+
+def test_busy_job_is_skipped_and_failures_are_recorded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scheduler.db'}")
+    Base.metadata.create_all(bind=engine)
+    clock = Clock()
+    s = Scheduler(LeaderLease(bind=engine, owner="w1"), clock=clock)
+    calls = []
+    busy = s.add_job("busy", lambda: calls.append(1), interval=60)
+    s.add_job("broken", lambda: 1 / 0, cron="* * * * *")
+    busy.running = 1  # Still running from the previous tick
+    s.tick()
+    clock.now += 60
+    s.tick()
+    assert calls == []
+    broken = s.status()["jobs"][1]
+    assert broken["last_status"] == "error" and "ZeroDivisionError" in broken["last_error"]
@@ -62,3 +62,45 @@ def test_fetch_metadata_combined(monkeypatch):
     result = fetch_metadata_combined("http://example.com")
     assert "title" in result
     assert result["title"] == "Scrape Meta Title"
+
+def test_fetch_metadata_combined_reuses_cached_domain_icons(tmp_path):
+    from app.services.domain_icon_cache import DomainIconCache
+
+    cache = DomainIconCache(path=tmp_path / "domain_icons.json", ttl=3600)
+    cache.put("cached-domain.test", [("favicon", "/static/favicon.ico")])
+    page = MagicMock()
+    page.text = '<html><head><title>Page</title><link rel="icon" href="/favicon.ico"></head></html>'
+    scraper = MagicMock()
+    scraper.get.return_value = page
+
+    with patch("app.services.metadata_fetcher.domain_icon_cache", cache), \
+            patch("app.services.metadata_fetcher.cloudscraper.create_scraper", return_value=scraper):
+        result = fetch_metadata_combined("https://cached-domain.test/some/page")
+
+    assert result["icon_candidates"] == ["/static/favicon.ico"]
+    assert result["webicon"] == "/static/favicon.ico"
+    # Only the page itself is fetched; no icon downloads
+    assert scraper.get.call_count == 1
+
+
+def test_domain_icon_cache_expires_entries(tmp_path):
+    from app.services.domain_icon_cache import DomainIconCache
+
+    cache = DomainIconCache(path=tmp_path / "domain_icons.json", ttl=-1)
+    cache.put("expired.test", [("favicon", "/static/favicon.ico")])
+    assert cache.get("expired.test") is None
+
+
+def test_domain_icon_cache_merges_writes_from_other_processes(tmp_path):
+    import json
+    from app.services.domain_icon_cache import DomainIconCache
+
+    path = tmp_path / "domain_icons.json"
+    api, worker = DomainIconCache(path=path, ttl=3600), DomainIconCache(path=path, ttl=3600)
+    api.put("api.test", [("favicon", "/static/favicon.ico")])
+    worker.put("worker.test", [("favicon", "/static/favicon.ico")])
+    api.put("api2.test", [("favicon", "/static/favicon.ico")])
+    assert set(json.loads(path.read_text())) == {"api.test", "worker.test", "api2.test"}
+    assert worker.get("api2.test") == [("favicon", "/static/favicon.ico")]
+    # No temp files left behind
+    assert set(tmp_path.iterdir()) == {path, tmp_path / "domain_icons.json.lock"}
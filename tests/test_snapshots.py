@@ -0,0 +1,75 @@
+import uuid
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.models import Base, Bookmark, PageSnapshot, SnapshotBlob
+from app.services.embeddings import with_page_text
+from app.services.snapshots import SnapshotStore, extract_main_text
+from app.worker import Worker
+from benchmarks.synthetic import page_html
+
+client = TestClient(app)
+
+
+def test_extracts_the_article_without_boilerplate():
+    html = page_html(3)
+    text = extract_main_text(html)
+    assert "Copyright" not in text and "site3.js" not in text and "display:flex" not in text
+    assert text.splitlines()[0] in html  # The article heading
+    article = "<nav>Menu</nav><article><h1>Title</h1><p>Body text</p></article><aside>Ads</aside>"
+    assert extract_main_text(article) == "Title\nBody text"
+
+
+def test_store_deduplicates_trains_a_dictionary_and_collects_garbage(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'snapshots.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    store = SnapshotStore(enabled=True, keep_html=True, codec="zlib", min_samples=10)
+    for i in range(30):
+        if i == 15:
+            assert store.train_dictionaries(db)  # The scheduled job; saving never trains
+        snapshot = store.capture(page_html(i))
+        store.save(db, f"https://site.example/{i}", f"https://site.example/{i}", snapshot["text"], snapshot["html"])
+        db.commit()
+    assert store.train_dictionaries(db) == []  # Not grown enough to retrain
+    # The same page under a second URL shares its blobs
+    store.save(db, "https://mirror.example/0", "https://mirror.example/0", extract_main_text(page_html(0)), page_html(0))
+    db.commit()
+    assert db.query(SnapshotBlob).count() == 60
+    assert db.query(SnapshotBlob).filter(SnapshotBlob.dictionary_id.is_not(None)).count() > 0
+
+    fresh = SnapshotStore(codec="zlib")  # Reads dictionaries back from the database
+    snapshot = fresh.get(db, "https://site.example/29")
+    assert fresh.read(db, snapshot.html_hash) == page_html(29)
+    assert fresh.read(db, snapshot.text_hash) == extract_main_text(page_html(29))
+    stats = fresh.stats(db)
+    assert stats["stored_bytes"] < stats["raw_bytes"] / 2
+
+    db.add(Bookmark(id=1, url="https://site.example/5", canonical_url="https://site.example/5"))
+    db.commit()
+    assert fresh.excerpts([1, 2], chars=20, db=db) == {1: extract_main_text(page_html(5))[:20]}
+    assert fresh.collect_garbage(db) == 30
+    db.commit()
+    assert [s.canonical_url for s in db.query(PageSnapshot)] == ["https://site.example/5"]
+    assert db.query(SnapshotBlob).count() == 2
+
+
+@patch("app.services.enrichment.fetch_metadata_combined")
+def test_snapshot_is_saved_with_the_bookmark_and_feeds_the_index(mock_fetch):
+    html = page_html(7)
+    mock_fetch.return_value = {
+        "webicon": "/static/favicon.ico",
+        "snapshot": {"text": extract_main_text(html), "html": None},
+    }
+    created = client.post("/bookmarks", json={"url": f"https://example.com/{uuid.uuid4().hex}"}).json()
+    Worker().drain()
+    response = client.get(f"/bookmarks/{created['id']}/snapshot")
+    assert response.status_code == 200
+    assert response.text == extract_main_text(html)
+    assert client.get(f"/bookmarks/{created['id']}/snapshot?format=html").status_code == 404
+    assert extract_main_text(html)[:50] in with_page_text([(created["id"], "title")])[0][1]
+    client.delete(f"/bookmarks/{created['id']}")
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Modules that must stay out of `import app.main`; they are loaded lazily on first use
+HEAVY_MODULES = {"sklearn", "scipy", "selenium", "PIL", "cloudscraper", "magic", "bs4", "torch", "transformers"}
+# Cumulative import time budget for app.main, in microseconds
+IMPORT_TIME_BUDGET_US = int(os.getenv("IMPORT_TIME_BUDGET_US", 2_000_000))
+
+
+def import_times():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_app_import_skips_heavy_modules_and_meets_budget():
+    times = import_times()
+    loaded = {name.split(".")[0] for name in times} & HEAVY_MODULES
+    assert not loaded, f"Heavy modules imported at startup: {sorted(loaded)}"
+    assert times["app.main"] < IMPORT_TIME_BUDGET_US
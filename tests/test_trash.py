@@ -0,0 +1,123 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.models import Base, Bookmark, SessionLocal, TrashedBookmark
+from app.services import trash
+
+client = TestClient(app)
+
+
+def add_bookmark(url=None, **fields):
+    url = url or f"http://example.com/trash-{uuid.uuid4().hex}"
+    with patch("app.routes.bookmarks.fetch_metadata_combined", return_value={"webicon": "/static/favicon.ico"}):
+        return client.post("/bookmarks", json={"url": url, **fields}).json()
+
+
+def trash_entry_for(bookmark):
+    items = client.get("/trash?limit=500").json()["items"]
+    return next(item for item in items if item["url"] == bookmark["url"])
+
+
+def test_delete_moves_to_trash_and_restore_brings_it_back():
+    bookmark = add_bookmark(title="Keep me", tags=["python"])
+    assert client.delete(f"/bookmarks/{bookmark['id']}").status_code == 200
+
+    listing = client.get("/trash?limit=1&offset=-5").json()
+    assert listing["total"] >= 1 and listing["offset"] == 0
+    assert listing["items"][0]["url"] == bookmark["url"]
+
+    entry = trash_entry_for(bookmark)
+    response = client.post(f"/trash/{entry['id']}/restore")
+    assert response.status_code == 200
+    restored = response.json()
+    assert restored["id"] == bookmark["id"]
+    assert restored["title"] == "Keep me"
+    assert restored["tags"] == ["python"]
+    assert client.post(f"/trash/{entry['id']}/restore").status_code == 404
+    client.delete(f"/bookmarks/{bookmark['id']}")
+
+
+def test_restore_conflicts_with_a_re_added_url():
+    bookmark = add_bookmark()
+    client.delete(f"/bookmarks/{bookmark['id']}")
+    entry = trash_entry_for(bookmark)
+    again = add_bookmark(bookmark["url"])
+    assert client.post(f"/trash/{entry['id']}/restore").status_code == 409
+    client.delete(f"/bookmarks/{again['id']}")
+
+
+def test_purge_removes_expired_entries_and_unshared_icons(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    icon_dir = tmp_path / "app/static/icons/example_com"
+    icon_dir.mkdir(parents=True)
+    (icon_dir / "own.png").write_bytes(b"png")
+    (icon_dir / "shared.png").write_bytes(b"png")
+    engine = create_engine(f"sqlite:///{tmp_path / 'trash.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Bookmark(id=1, url="http://example.com/live", webicon="/static/icons/example_com/shared.png"))
+    now = datetime(2024, 6, 1)
+    trash.trash_bookmarks(db, [{
+        "id": 2, "url": "http://example.com/old", "webicon": "/static/icons/example_com/own.png",
+        "icon_candidates": "/static/icons/example_com/own.png,/static/icons/example_com/shared.png",
+    }], deleted_at=now - timedelta(days=40))
+    trash.trash_bookmarks(db, [{"id": 3, "url": "http://example.com/recent"}], deleted_at=now - timedelta(days=1))
+    db.commit()
+
+    assert trash.purge_expired(db, retention_days=30, now=now) == 1
+    assert [entry.bookmark_id for entry in db.query(TrashedBookmark)] == [3]
+    assert not (icon_dir / "own.png").exists()
+    assert (icon_dir / "shared.png").exists()
+
+
+def test_orphaned_icons_are_collected_after_the_grace_period(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    icon_dir = tmp_path / "app/static/icons/example_com"
+    icon_dir.mkdir(parents=True)
+    for name in ("used.png", "trashed.png", "cached.png", "orphan.png"):
+        (icon_dir / name).write_bytes(b"png")
+    engine = create_engine(f"sqlite:///{tmp_path / 'icons.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Bookmark(id=1, url="http://example.com/live", webicon="/static/icons/example_com/used.png"))
+    trash.trash_bookmarks(db, [{"id": 2, "url": "http://example.com/old", "webicon": "/static/icons/example_com/trashed.png"}])
+    db.commit()
+
+    cached = {"/static/icons/example_com/cached.png"}
+    with patch.object(trash.domain_icon_cache, "icon_paths", return_value=cached):
+        assert trash.collect_orphan_icons(db) == 0  # Too new: may belong to a bookmark being saved
+        assert trash.collect_orphan_icons(db, grace_hours=0) == 1
+    assert sorted(path.name for path in icon_dir.iterdir()) == ["cached.png", "trashed.png", "used.png"]
+
+
+def test_legacy_recycle_files_are_imported(tmp_path):
+    url = f"http://example.com/legacy-{uuid.uuid4().hex}"
+    (tmp_path / "7_20240101_000000.json").write_text(json.dumps({
+        "id": 7, "url": url, "title": "Old", "tags": ["a", "b"], "icon_candidates": [],
+        "deleted_at": "2024-01-01T00:00:00",
+    }))
+    # Another process starting at the same time has claimed the second file
+    (tmp_path / "8_20240101_000000.json").write_text(json.dumps({"id": 8, "url": url + "/other"}))
+    assert trash._claim_legacy_file(tmp_path / "8_20240101_000000.json") is not None
+    assert trash.import_legacy_recycle_bin(tmp_path) == 1
+    assert not list(tmp_path.glob("*.json"))
+    assert len(list(tmp_path.glob("8_*.json.importing-*"))) == 1
+    db = SessionLocal()
+    try:
+        entry = db.query(TrashedBookmark).filter(TrashedBookmark.url == url).one()
+        assert entry.deleted_at == datetime(2024, 1, 1)
+        bookmark = trash.restore(db, entry.id)
+        assert bookmark.tags == "a,b"
+        assert bookmark.webicon == "/static/favicon.ico"
+        db.rollback()
+        db.delete(db.query(TrashedBookmark).filter(TrashedBookmark.url == url).one())
+        db.commit()
+    finally:
+        db.close()